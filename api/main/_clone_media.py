@@ -0,0 +1,80 @@
+# This file is outside the `api/main/rest/` folder to avoid the imports in that module's __init__.py
+import os
+import logging
+
+try:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tator_online.settings")
+    django.setup()
+except Exception:
+    pass
+
+from django.db import connection, transaction
+
+from main.models import Media, Resource
+
+logger = logging.getLogger(__name__)
+
+
+def _clone_media(media_ids, new_ids, dest_project, dest_type, section_uuid=None):
+    """Copies media rows and their resource links with one INSERT ... SELECT each.
+
+    :param media_ids: IDs of the media to clone.
+    :param new_ids: IDs reserved for the clones, in the same order as `media_ids`.
+    :param dest_project: ID of the destination project.
+    :param dest_type: ID of the destination media type.
+    :param section_uuid: Optional `tator_user_sections` value the clones are placed in.
+    """
+    qn = connection.ops.quote_name
+    copied = []
+    timestamps = []
+    for field in Media._meta.concrete_fields:
+        if field.name in ["id", "project", "type", "attributes"]:
+            continue
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+            timestamps.append(qn(field.column))
+        else:
+            copied.append(qn(field.column))
+    attributes = "m.attributes"
+    params = [dest_project, dest_type]
+    if section_uuid is not None:
+        attributes = (
+            "jsonb_set(COALESCE(m.attributes, '{}'::jsonb), '{tator_user_sections}', "
+            "to_jsonb(%s::text))"
+        )
+        params.append(section_uuid)
+    params += [list(media_ids), list(new_ids)]
+    ids = "unnest(%s::integer[], %s::integer[]) AS ids(old_id, new_id)"
+
+    links = Resource.media.through._meta
+    resource_column = qn(links.get_field("resource").column)
+    media_column = qn(links.get_field("media").column)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {qn(Media._meta.db_table)} (
+                id, {qn(Media._meta.get_field("project").column)},
+                {qn(Media._meta.get_field("type").column)},
+                {qn(Media._meta.get_field("attributes").column)},
+                {", ".join(timestamps + copied)}
+            )
+            SELECT ids.new_id, %s, %s, {attributes}, {", ".join("now()" for _ in timestamps)},
+                {", ".join(f"m.{column}" for column in copied)}
+            FROM {ids}
+            JOIN {qn(Media._meta.db_table)} m ON m.id = ids.old_id
+            """,
+            params,
+        )
+        num_media = cursor.rowcount
+        cursor.execute(
+            f"""
+            INSERT INTO {qn(links.db_table)} ({resource_column}, {media_column})
+            SELECT links.{resource_column}, ids.new_id
+            FROM {ids}
+            JOIN {qn(links.db_table)} links ON links.{media_column} = ids.old_id
+            """,
+            [list(media_ids), list(new_ids)],
+        )
+    logger.info(f"Cloned {num_media} media into project {dest_project}")
+    return num_media
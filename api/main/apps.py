@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     name = "main"
+
+    def ready(self):
+        from .connections import connect_signals  # pylint: disable=import-outside-toplevel
+
+        connect_signals()
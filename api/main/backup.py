@@ -1,18 +1,20 @@
 from collections import defaultdict
+from concurrent.futures import as_completed, ThreadPoolExecutor
 from ctypes import CDLL, c_char_p, c_int, Structure
 from enum import auto, Enum
+from itertools import chain, islice
 import logging
 import json
 import os
 import math
 import requests
 from uuid import uuid4
-from time import sleep
+from time import monotonic, sleep
 from typing import Generator, Tuple
 
 from django.db import transaction
 
-from main.store import get_tator_store
+from main.store import get_tator_store, ObjectStore
 
 
 logger = logging.getLogger(__name__)
@@ -27,6 +29,11 @@ class StoreType(Enum):
 
 class TatorBackupManager:
     chunk_size = 10 * 1024 * 1024  # Must be a multiple of 256Kb for GCP support
+    object_workers = 8  # Objects backed up concurrently
+    part_workers = 16  # Parts of multipart uploads transferred concurrently, across all objects
+    batch_size = 500  # Resources whose sizes are checked together
+    checkpoint_size = 500  # Backed up resources recorded at least this often...
+    checkpoint_interval = 60  # ...or this many seconds
     __Project = None
 
     @classmethod
@@ -82,6 +89,48 @@ class TatorBackupManager:
 
         return parts
 
+    @classmethod
+    def _upload_part(cls, file_size, upload_url, upload_id, part_number, download_url):
+        first_byte = (part_number - 1) * cls.chunk_size
+        last_byte = min(first_byte + cls.chunk_size, file_size) - 1
+        for attempt in range(MAX_RETRIES):
+            try:
+                response = requests.get(
+                    download_url, headers={"Range": f"bytes={first_byte}-{last_byte}"}
+                )
+                response.raise_for_status()
+                response = requests.put(upload_url, data=response.content)
+                etag_str = response.headers.get("ETag")
+                if etag_str == None:
+                    raise RuntimeError("No ETag in response!")
+                return {"ETag": etag_str, "PartNumber": part_number}
+            except Exception as e:
+                logger.warning(
+                    f"Upload of {upload_id} chunk {part_number - 1} failed ({e})! Attempt "
+                    f"{attempt + 1}/{MAX_RETRIES}"
+                )
+                if attempt == MAX_RETRIES - 1:
+                    raise RuntimeError(f"Upload of {upload_id} failed!")
+                else:
+                    sleep(10 * attempt)
+                    logger.warning(f"Backing off for {10 * attempt} seconds...")
+
+    @classmethod
+    def _parallel_multipart_upload(cls, file_size, upload_urls, upload_id, download_url, pool):
+        """
+        Uploads the parts of a multipart upload concurrently on `pool`, reading each part from
+        `download_url` with a range request.
+        """
+        futures = [
+            pool.submit(cls._upload_part, file_size, url, upload_id, idx + 1, download_url)
+            for idx, url in enumerate(upload_urls)
+        ]
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+
     @staticmethod
     def _single_upload(path, upload_url, stream):
         data = stream.read()
@@ -116,9 +165,20 @@ class TatorBackupManager:
         return cls._single_upload(path, urls[0], stream)
 
     @classmethod
-    def _upload_from_url(cls, store, path, url, size, domain):
-        with requests.get(url, stream=True).raw as stream:
-            return cls._upload_from_stream(store, path, stream, size, domain)
+    def _upload_from_url(cls, store, path, url, size, domain, part_pool=None):
+        num_chunks = math.ceil(size / cls.chunk_size)
+        # GCP resumable uploads must receive their parts in order.
+        if part_pool is None or num_chunks < 2 or store.server is ObjectStore.GCP:
+            with requests.get(url, stream=True).raw as stream:
+                return cls._upload_from_stream(store, path, stream, size, domain)
+
+        urls, upload_id = store.get_upload_urls(path, 3600, num_chunks, domain)
+        if not urls:
+            logger.warning(f"Could not get upload urls for key '{path}'")
+            return False
+
+        parts = cls._parallel_multipart_upload(size, urls, upload_id, url, part_pool)
+        return store.complete_multipart_upload(path, parts, upload_id)
 
     @classmethod
     def _upload_from_file(cls, store, path, filepath, size, domain):
@@ -199,7 +259,43 @@ class TatorBackupManager:
         return bool(project_store_info), project_store_info
 
     @classmethod
-    def backup_resources(cls, project_qs, resource_qs, domain) -> Generator[tuple, None, None]:
+    def _backup_resource(cls, live_store, backup_store, path, size, domain, part_pool) -> bool:
+        """
+        Copies one object from the live store to the backup store, server-side if the stores are
+        in the same provider and by streaming it through this process otherwise.
+        """
+        if size < 0:
+            logger.warning(f"Resource '{path}' not found in live store, cannot back it up")
+            return False
+        try:
+            if backup_store.copy_from(live_store, path):
+                return True
+        except Exception:
+            logger.warning(f"Server-side copy of '{path}' failed, streaming it", exc_info=True)
+
+        # Get presigned url from the live bucket, set to expire in 1h
+        download_url = live_store.get_download_url(path, 3600)
+        try:
+            success = cls._upload_from_url(
+                backup_store, path, download_url, size, domain, part_pool
+            )
+        except Exception:
+            success = False
+            logger.error(f"Exception while backing up resource '{path}'", exc_info=True)
+        if not success:
+            logger.error(f"Backing up resource '{path}' with presigned url {download_url} failed")
+        return success
+
+    @staticmethod
+    def _mark_backed_up(Resource, resource_ids, backup_store):
+        with transaction.atomic():
+            update_qs = Resource.objects.select_for_update().filter(pk__in=resource_ids)
+            update_qs.update(backed_up=True, backup_bucket=backup_store.bucket)
+
+    @classmethod
+    def backup_resources(
+        cls, project_qs, resource_qs, domain, object_workers=None, part_workers=None
+    ) -> Generator[tuple, None, None]:
         """
         Creates a generator that copies the resources in the given queryset from the live store to
         the backup store for their respective projects. Yields a tuple with the first element being
@@ -207,6 +303,12 @@ class TatorBackupManager:
         the resource in question, so the calling function can iterate over the queryset and keep
         track of its progress.
 
+        Resources are backed up concurrently and yielded as they finish. Sizes in both stores are
+        listed in batches, and resources whose backup already matches the live object, such as
+        those copied by an interrupted run, are not copied again. Successful backups are recorded
+        at least every `checkpoint_size` resources or `checkpoint_interval` seconds, so an
+        interrupted run resumes close to where it stopped.
+
         If there is no backup bucket for the given project (or a site-wide default), this will
         yield `(False, resource)`.
 
@@ -216,60 +318,94 @@ class TatorBackupManager:
         :type project_qs: Queryset
         :param domain: The domain from which the request is originating, needed by GCP
         :type domain: str
+        :param object_workers: The number of objects to back up concurrently
+        :type object_workers: int
+        :param part_workers: The number of parts of multipart uploads to transfer concurrently
+        :type part_workers: int
         :rtype: Generator[tuple, None, None]
         """
-        Resource = type(resource_qs.first())
-        for project in project_qs.iterator():
-            successful_backups = set()
-            resource_project_qs = resource_qs.filter(media__project=project)
-            num_backups = resource_project_qs.count()
-            logger.info(f"Backing up {num_backups} resources in project {project}...")
-            success, store_info = cls.get_store_info(project)
-
-            # If unable to get backup store info, skip all resources in this project
-            if not success:
-                continue
-
-            backup_info = store_info[StoreType.BACKUP]
-            backup_store = backup_info["store"]
-
-            for resource in resource_project_qs.iterator():
-                path = resource.path
-                live_store = get_tator_store(resource.bucket)
-                backup_size = backup_store.get_size(path)
-                live_size = live_store.get_size(path)
-                if backup_size < 0 or live_size != backup_size:
-                    # Get presigned url from the live bucket, set to expire in 1h
-                    download_url = live_store.get_download_url(path, 3600)
-                    success = cls._upload_from_url(
-                        backup_store, path, download_url, live_size, domain
-                    )
-
-                    if success == False:
-                        logger.error(
-                            f"Backing up resource '{path}' with presigned url {download_url} failed",
-                            exc_info=True,
-                        )
-
-                if success:
-                    successful_backups.add(resource.id)
-
-                if len(successful_backups) > 500:
-                    with transaction.atomic():
-                        update_qs = Resource.objects.select_for_update().filter(
-                            pk__in=successful_backups
+        Resource = resource_qs.model
+        object_pool = ThreadPoolExecutor(object_workers or cls.object_workers)
+        part_pool = ThreadPoolExecutor(part_workers or cls.part_workers)
+        with object_pool, part_pool:
+            for project in project_qs.iterator():
+                resource_project_qs = (
+                    resource_qs.filter(media__project=project)
+                    .select_related("bucket")
+                    .distinct()
+                    .order_by("id")
+                )
+                num_backups = resource_project_qs.count()
+                logger.info(f"Backing up {num_backups} resources in project {project}...")
+                success, store_info = cls.get_store_info(project)
+
+                # If unable to get backup store info, skip all resources in this project
+                if not success:
+                    continue
+
+                backup_info = store_info[StoreType.BACKUP]
+                backup_store = backup_info["store"]
+                successful_backups = set()
+                last_checkpoint = monotonic()
+                resources = resource_project_qs.iterator(chunk_size=cls.batch_size)
+                while True:
+                    batch = list(islice(resources, cls.batch_size))
+                    if not batch:
+                        break
+
+                    # Check sizes in bulk, per live store.
+                    live_stores = {}
+                    for resource in batch:
+                        if resource.bucket_id not in live_stores:
+                            live_stores[resource.bucket_id] = get_tator_store(resource.bucket)
+                    live_sizes = {}
+                    for bucket_id, live_store in live_stores.items():
+                        live_sizes.update(
+                            live_store.get_sizes(
+                                [r.path for r in batch if r.bucket_id == bucket_id]
+                            )
                         )
-                        update_qs.update(backed_up=True, backup_bucket=backup_store.bucket)
-                    successful_backups.clear()
-
-                yield success, resource
-
-            if successful_backups:
-                with transaction.atomic():
-                    update_qs = Resource.objects.select_for_update().filter(
-                        pk__in=successful_backups
+                    backup_sizes = backup_store.get_sizes([r.path for r in batch])
+
+                    futures = {}
+                    backed_up = []
+                    for resource in batch:
+                        path = resource.path
+                        live_size = live_sizes[path]
+                        if live_size < 0 or live_size != backup_sizes[path]:
+                            future = object_pool.submit(
+                                cls._backup_resource,
+                                live_stores[resource.bucket_id],
+                                backup_store,
+                                path,
+                                live_size,
+                                domain,
+                                part_pool,
+                            )
+                            futures[future] = resource
+                        else:
+                            backed_up.append((True, resource))
+
+                    results = chain(
+                        backed_up,
+                        ((future.result(), futures[future]) for future in as_completed(futures)),
                     )
-                    update_qs.update(backed_up=True, backup_bucket=backup_store.bucket)
+                    for success, resource in results:
+                        if success:
+                            successful_backups.add(resource.id)
+
+                        if len(successful_backups) >= cls.checkpoint_size or (
+                            successful_backups
+                            and monotonic() - last_checkpoint > cls.checkpoint_interval
+                        ):
+                            cls._mark_backed_up(Resource, successful_backups, backup_store)
+                            successful_backups.clear()
+                            last_checkpoint = monotonic()
+
+                        yield success, resource
+
+                if successful_backups:
+                    cls._mark_backed_up(Resource, successful_backups, backup_store)
 
     @classmethod
     def request_restore_resource(cls, path, project, min_exp_days) -> bool:
@@ -1,45 +1,86 @@
-import redis
 import json
-import os
 import logging
+import time
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 
+from .worker import get_redis
+
 logger = logging.getLogger(__name__)
 
 EXPIRE_TIME = 60 * 60 * 24 * 30
 
+# Permissions expire from redis after this many seconds. Stale entries are never read, as
+# invalidation changes the key, so this only bounds memory.
+CRED_EXPIRE_TIME = 60 * 60
+
+# Permissions are also cached in process memory for this many seconds.
+CRED_LOCAL_TTL = 10
+CRED_LOCAL_MAX_SIZE = 100000
+
+# Number of versions of leaf changes kept for incremental updates of suggestion indexes.
+LEAF_CHANGES_KEPT = 1000
+
 
 class TatorCache:
     """Interface for caching responses."""
 
+    _local_creds = {}
+
     @classmethod
     def setup_redis(cls):
-        cls.rds = redis.Redis(
-            host=os.getenv("REDIS_HOST"),
-            health_check_interval=30,
-        )
+        cls.rds = get_redis()
+
+    def get_cred_version(self, project_id):
+        """Returns the version of cached permissions in a project, which changes whenever they
+        are invalidated. Read it before querying a membership and pass it to `set_cred_cache`,
+        so a level read before a change can not be cached after the change is invalidated.
+        """
+        version = self.rds.get(f"perm_version_{project_id}")
+        return 0 if version is None else int(version)
 
     def get_cred_cache(self, user_id, project_id):
-        group = f"creds_{project_id}"
-        key = f"creds_{project_id}_{user_id}"
-        val = None
-        if self.rds.hexists(group, key):
-            val = self.rds.hget(group, key)
-            if val == "True":
-                val = True
-            else:
-                val = False
+        """Retrieves the cached membership permission value of a user in a project. Returns
+        None if nothing is cached and an empty string if the user is not a member. Values
+        are kept in process memory for CRED_LOCAL_TTL seconds in front of redis.
+        """
+        local_key = (user_id, project_id)
+        now = time.monotonic()
+        local = self._local_creds.get(local_key)
+        if local is not None and local[1] > now:
+            return local[0]
+        version = self.get_cred_version(project_id)
+        val = self.rds.get(f"perm_{project_id}_{version}_{user_id}")
+        if val is not None:
+            val = val.decode()
+            self._set_local_cred(local_key, val, now)
         return val
 
-    def set_cred_cache(self, user_id, project_id, val):
-        group = f"creds_{project_id}"
-        key = f"creds_{project_id}_{user_id}"
-        self.rds.hset(group, key, str(val))
+    def set_cred_cache(self, user_id, project_id, val, version):
+        """Stores the membership permission value of a user in a project under the permission
+        version read before the value was queried.
+        """
+        key = f"perm_{project_id}_{version}_{user_id}"
+        self.rds.set(key, str(val), ex=CRED_EXPIRE_TIME)
+        if version == self.get_cred_version(project_id):
+            self._set_local_cred((user_id, project_id), str(val), time.monotonic())
+
+    def invalidate_cred_cache(self, project_id, user_id=None):
+        """Invalidates cached permissions in a project by bumping its permission version.
+        Other processes drop their in-memory copies within CRED_LOCAL_TTL seconds.
+        """
+        self.rds.incr(f"perm_version_{project_id}")
+        if user_id is None:
+            for local_key in list(self._local_creds):
+                if local_key[1] == project_id:
+                    self._local_creds.pop(local_key, None)
+        else:
+            self._local_creds.pop((user_id, project_id), None)
 
-    def invalidate_cred_cache(self, project_id):
-        group = f"creds_{project_id}"
-        self.rds.delete(group)
+    def _set_local_cred(self, local_key, val, now):
+        if len(self._local_creds) >= CRED_LOCAL_MAX_SIZE:
+            self._local_creds.clear()
+        self._local_creds[local_key] = (val, now + CRED_LOCAL_TTL)
 
     def get_keycloak_public_key(self):
         public_key = self.rds.get("keycloak_public_key")
@@ -123,12 +164,92 @@ class TatorCache:
             url = url.decode()
         return url
 
+    def get_presigned_many(self, user, keys):
+        """Retrieves presigned urls for several keys with one round trip. Returns a dict
+        mapping each key to its url, or None if it is not cached.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        urls = self.rds.mget([f"{user}__{key}" for key in keys])
+        return {key: url.decode() if url is not None else None for key, url in zip(keys, urls)}
+
+    def set_presigned_many(self, user, urls, ttl=3600):
+        """Stores presigned urls given as a dict mapping keys to urls with one round trip."""
+        if not urls:
+            return
+        pipe = self.rds.pipeline(transaction=False)
+        for key, url in urls.items():
+            pipe.set(f"{user}__{key}", url, ex=ttl)
+        pipe.execute()
+
+    def get_schema_version(self, project_id):
+        """Retrieves the attribute schema version of a project. The version is
+        incremented whenever an entity type in the project is saved or deleted.
+        """
+        version = self.rds.get(f"schema_version_{project_id}")
+        if version is None:
+            version = 0
+        return int(version)
+
+    def bump_schema_version(self, project_id):
+        """Increments the attribute schema version of a project."""
+        return self.rds.incr(f"schema_version_{project_id}")
+
+    def get_leaf_version(self, type_id):
+        """Retrieves the version of the leaves of a leaf type. The version is incremented
+        whenever leaves of the type change.
+        """
+        version = self.rds.get(f"leaf_version_{type_id}")
+        if version is None:
+            version = 0
+        return int(version)
+
+    def push_leaf_changes(self, type_id, leaf_ids):
+        """Increments the leaf version of a leaf type and records the IDs of the changed
+        leaves under the new version. Only the last LEAF_CHANGES_KEPT versions are kept.
+        """
+        version = self.rds.incr(f"leaf_version_{type_id}")
+        group = f"leaf_changes_{type_id}"
+        pipe = self.rds.pipeline()
+        pipe.hset(group, version, ",".join(str(leaf_id) for leaf_id in leaf_ids))
+        pipe.hdel(group, version - LEAF_CHANGES_KEPT)
+        pipe.expire(group, EXPIRE_TIME)
+        pipe.execute()
+        return version
+
+    def get_leaf_changes(self, type_id, first_version, last_version):
+        """Retrieves the IDs of leaves changed in the given range of versions of a leaf
+        type. Returns None if any of the versions is no longer recorded.
+        """
+        versions = list(range(first_version, last_version + 1))
+        changes = self.rds.hmget(f"leaf_changes_{type_id}", versions)
+        if any(ids is None for ids in changes):
+            return None
+        return {int(leaf_id) for ids in changes for leaf_id in ids.decode().split(",") if leaf_id}
+
+    def get_checkpoint(self, name):
+        """Retrieves the checkpoint saved by a resumable management command, or None."""
+        checkpoint = self.rds.get(f"checkpoint_{name}")
+        if checkpoint is not None:
+            checkpoint = json.loads(checkpoint)
+        return checkpoint
+
+    def set_checkpoint(self, name, checkpoint):
+        """Saves the progress of a resumable management command."""
+        self.rds.set(f"checkpoint_{name}", json.dumps(checkpoint), ex=EXPIRE_TIME)
+
+    def clear_checkpoint(self, name):
+        """Removes the checkpoint of a management command that ran to completion."""
+        self.rds.delete(f"checkpoint_{name}")
+
     def invalidate_all(self):
         """Invalidates all caches."""
-        for prefix in ["creds_"]:
+        for prefix in ["creds_", "perm_"]:
             for key in self.rds.scan_iter(match=prefix + "*"):
                 logger.info(f"Deleting cache key {key}...")
                 self.rds.delete(key)
+        self._local_creds.clear()
         self.rds.delete("keycloak_public_key")
         logger.info("Cache cleared!")
 
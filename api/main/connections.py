@@ -0,0 +1,56 @@
+""" Health checks and metrics of persistent database connections. """
+
+from collections import Counter, defaultdict
+import logging
+
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from tator_online.middleware import statsd
+
+logger = logging.getLogger(__name__)
+
+_connection_stats = defaultdict(Counter)
+
+
+def record_connection_event(event, alias="default"):
+    """Counts a connection event of this process and sends it to statsd."""
+    _connection_stats[alias][event] += 1
+    statsd.increment(
+        "db_connection_events", tags=["service:tator", f"event:{event}", f"db:{alias}"]
+    )
+
+
+def get_connection_stats():
+    """Returns counts of connection events in this process by database alias and event. Events
+    are `created` for new connections, `reused` for open connections used again and `unusable`
+    for open connections that failed their health check. Connections to index databases opened by
+    `main.search` are counted under `search`.
+    """
+    return {alias: dict(counts) for alias, counts in _connection_stats.items()}
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    record_connection_event("created", connection.alias)
+
+
+def check_connections(**kwargs):
+    """Closes persistent connections that are no longer usable at the start of a request, so
+    the request opens a new connection instead of failing on a dropped one. Stands in for the
+    `CONN_HEALTH_CHECKS` database setting of later Django versions.
+    """
+    for conn in connections.all():
+        if conn.connection is None:
+            continue
+        if conn.settings_dict.get("CONN_HEALTH_CHECKS") and not conn.is_usable():
+            logger.warning(f"Closing unusable connection to database {conn.alias}")
+            record_connection_event("unusable", conn.alias)
+            conn.close()
+        else:
+            record_connection_event("reused", conn.alias)
+
+
+def connect_signals():
+    request_started.connect(check_connections, dispatch_uid="check_connections")
+    connection_created.connect(_on_connection_created, dispatch_uid="record_connection_created")
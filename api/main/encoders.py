@@ -1,5 +1,19 @@
+import json
+import re
+
 from django.core.serializers.json import DjangoJSONEncoder
 from django_ltree.fields import PathValue
+import orjson
+
+# Floats that orjson may format differently from `json`, which writes magnitudes below 1e-4 and
+# from 1e16 up in exponent notation with a signed exponent.
+_DIVERGENT_FLOAT = re.compile(rb"(?:^|[:\[,])-?(?:\d+(?:\.\d+)?e[-+]?\d+(?:[,\]}]|$)|0\.0000)")
+_MASK_DIGITS = bytes.maketrans(b"123456789", b"000000000")
+
+# Datetimes are passed to `TatorJSONEncoder.default`, as orjson does not truncate them to
+# milliseconds like `DjangoJSONEncoder` does. Non-str keys are rejected by orjson, so dicts
+# with such keys fall back to `json`, which formats float keys like float values.
+_ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
 
 
 class TatorJSONEncoder(DjangoJSONEncoder):
@@ -7,3 +21,51 @@ class TatorJSONEncoder(DjangoJSONEncoder):
         if isinstance(obj, PathValue):
             return str(obj)
         return super().default(obj)
+
+
+_encoder = TatorJSONEncoder()
+
+
+def _is_divergent(ret):
+    """Returns whether orjson output may contain a float that `json` formats differently.
+    Exponents are searched for with digits masked, so a regular expression only runs where a
+    digit is followed by an exponent marker, which is mostly inside hex strings such as UUIDs.
+    """
+    if b"0.0000" in ret and _DIVERGENT_FLOAT.search(ret):
+        return True
+    masked = ret.translate(_MASK_DIGITS)
+    pos = masked.find(b"0e")
+    while pos >= 0:
+        # Tokens are short, so their start is searched for just before the exponent.
+        low = max(pos - 32, 0)
+        start = max(ret.rfind(b":", low, pos), ret.rfind(b",", low, pos), ret.rfind(b"[", low, pos))
+        if _DIVERGENT_FLOAT.match(ret, max(start, 0)):
+            return True
+        pos = masked.find(b"0e", pos + 2)
+    return False
+
+
+def _dumps_one(data, allow_nan):
+    try:
+        ret = orjson.dumps(data, default=_encoder.default, option=_ORJSON_OPTIONS)
+        if not _is_divergent(ret):
+            return ret
+    except orjson.JSONEncodeError:
+        pass
+    return json.dumps(
+        data, cls=TatorJSONEncoder, ensure_ascii=False, separators=(",", ":"), allow_nan=allow_nan
+    ).encode()
+
+
+def dumps_compact(data, allow_nan=True):
+    """Serializes data to the same bytes as `json.dumps` with `TatorJSONEncoder`,
+    `ensure_ascii=False` and compact separators, encoded as utf-8. Data is serialized with
+    orjson where it produces identical output and with `json` otherwise. Elements of a list
+    are serialized one by one, so only the elements that orjson would serialize differently
+    go through `json`.
+
+    :param allow_nan: Passed to `json.dumps` for data serialized with `json`.
+    """
+    if isinstance(data, list):
+        return b"[" + b",".join(_dumps_one(element, allow_nan) for element in data) + b"]"
+    return _dumps_one(data, allow_nan)
@@ -0,0 +1,37 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from main.models import STATE_LOCALIZATION_IDS_SQL, STATE_MEDIA_IDS_SQL
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Fills in denormalized media and localization IDs of states created before they existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch_size", type=int, default=10000)
+
+    def handle(self, **options):
+        num_updated = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    UPDATE main_state SET
+                        media_ids = {STATE_MEDIA_IDS_SQL},
+                        localization_ids = {STATE_LOCALIZATION_IDS_SQL}
+                    WHERE main_state.id IN (
+                        SELECT id FROM main_state
+                        WHERE media_ids IS NULL OR localization_ids IS NULL
+                        LIMIT %s
+                    )
+                    """,
+                    [options["batch_size"]],
+                )
+                if cursor.rowcount == 0:
+                    break
+                num_updated += cursor.rowcount
+            logger.info(f"Backfilled a total of {num_updated} states...")
+        logger.info(f"Backfilled a total of {num_updated} states!")
@@ -19,6 +19,20 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Backs up any resource objects with `backed_up==False`."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--object_workers",
+            type=int,
+            default=TatorBackupManager.object_workers,
+            help="Number of objects to back up concurrently.",
+        )
+        parser.add_argument(
+            "--part_workers",
+            type=int,
+            default=TatorBackupManager.part_workers,
+            help="Number of parts of multipart uploads to transfer concurrently.",
+        )
+
     def handle(self, **options):
         resource_qs = Resource.objects.filter(media__deleted=False, backed_up=False)
 
@@ -51,7 +65,13 @@ class Command(BaseCommand):
         successful_backups = set()
         domain = os.getenv("MAIN_HOST", "MAIN_HOST")
         for idx, (success, resource) in enumerate(
-            tbm.backup_resources(projects_needing_backup, resource_qs, domain)
+            tbm.backup_resources(
+                projects_needing_backup,
+                resource_qs,
+                domain,
+                options["object_workers"],
+                options["part_workers"],
+            )
         ):
             if success:
                 successful_backups.add(resource.id)
@@ -59,7 +79,7 @@ class Command(BaseCommand):
                 project_id, media_id = resource.path.split("/")[1:3]
                 failed_backups[project_id].add(media_id)
 
-            if idx + 1 % 1000 == 0:
+            if (idx + 1) % 1000 == 0:
                 logger.info(f"Processed {idx + 1} of {total_to_back_up} resources")
 
         logger.info(
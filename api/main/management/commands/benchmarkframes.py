@@ -0,0 +1,38 @@
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from main.models import Media
+from main.rest._media_util import MediaUtil
+
+
+class Command(BaseCommand):
+    help = "Compares frame rendering with one ffmpeg input per frame against the decoder pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("media_id", type=int)
+        parser.add_argument("--num-frames", type=int, default=30)
+        parser.add_argument("--repeats", type=int, default=3)
+        parser.add_argument("--format", type=str, default="jpg", choices=["jpg", "png"])
+
+    def handle(self, **options):
+        video = Media.objects.get(pk=options["media_id"])
+        num_frames = min(options["num_frames"], video.num_frames)
+        frames = sorted(random.sample(range(video.num_frames), num_frames))
+        times = {}
+        for pooled in [False, True]:
+            elapsed = 0
+            for _ in range(options["repeats"]):
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    media_util = MediaUtil(video, temp_dir)
+                    start = time.perf_counter()
+                    media_util._generate_frame_images(
+                        frames, render_format=options["format"], pooled=pooled, use_cache=False
+                    )
+                    elapsed += time.perf_counter() - start
+            times[pooled] = elapsed / (options["repeats"] * num_frames)
+
+        print(f"ffmpeg inputs: {times[False] * 1e3:.1f} ms/frame")
+        print(f"decoder pool:  {times[True] * 1e3:.1f} ms/frame")
+        print(f"speedup: {times[False] / times[True]:.1f}x")
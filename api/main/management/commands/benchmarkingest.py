@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import LocalizationType, Media, User
+from main.rest.localization import LocalizationListAPI
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+
+def _attribute_value(attribute_type):
+    dtype = attribute_type["dtype"]
+    if dtype == "bool":
+        return random.random() > 0.5
+    if dtype == "int":
+        return random.randint(0, 100)
+    if dtype == "float":
+        return random.random() * 100
+    if dtype in ["string", "blob"]:
+        return "benchmark"
+    if dtype == "enum":
+        return attribute_type["choices"][0]
+    if dtype == "datetime":
+        return datetime.now(timezone.utc).isoformat()
+    if dtype == "geopos":
+        return [random.uniform(-180, 180), random.uniform(-90, 90)]
+    return None
+
+
+class Command(BaseCommand):
+    help = "Compares localization creation rates with and without the ingest mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument("media_id", type=int)
+        parser.add_argument("username", type=str)
+        parser.add_argument("--type", type=int, default=None)
+        parser.add_argument("--num-localizations", type=int, default=500)
+        parser.add_argument("--repeats", type=int, default=3)
+
+    def handle(self, **options):
+        media = Media.objects.get(pk=options["media_id"])
+        user = User.objects.get(username=options["username"])
+        if options["type"] is None:
+            loc_type = LocalizationType.objects.filter(
+                project=media.project, media=media.type, dtype="box"
+            )[0]
+        else:
+            loc_type = LocalizationType.objects.get(pk=options["type"])
+        specs = []
+        for _ in range(options["num_localizations"]):
+            spec = {
+                "type": loc_type.id,
+                "media_id": media.id,
+                "frame": random.randint(0, max(0, (media.num_frames or 1) - 1)),
+                "x": random.random() / 2,
+                "y": random.random() / 2,
+                "width": random.random() / 2,
+                "height": random.random() / 2,
+            }
+            spec["attributes"] = {}
+            for attribute_type in loc_type.attribute_types or []:
+                value = _attribute_value(attribute_type)
+                if value is not None:
+                    spec["attributes"][attribute_type["name"]] = value
+            specs.append(spec)
+
+        # Requests go through the view, including schema validation, and are rolled back.
+        factory = APIRequestFactory()
+        host = settings.ALLOWED_HOSTS[0]
+        view = LocalizationListAPI.as_view()
+        path = f"/rest/Localizations/{media.project.id}"
+        rates = {}
+        for ingest in [False, True]:
+            url = f"{path}?ingest=1" if ingest else path
+            elapsed = 0
+            for _ in range(options["repeats"]):
+                request = factory.post(url, specs, format="json", HTTP_HOST=host)
+                force_authenticate(request, user=user)
+                with transaction.atomic():
+                    start = time.perf_counter()
+                    response = view(request, project=media.project.id)
+                    elapsed += time.perf_counter() - start
+                    transaction.set_rollback(True)
+                if response.status_code != 201:
+                    raise RuntimeError(f"Request failed: {response.data}")
+                if response.data.get("errors"):
+                    raise RuntimeError(f"Ingest rejected rows: {response.data['errors'][:5]}")
+            rates[ingest] = options["repeats"] * len(specs) / elapsed
+
+        print(f"default: {rates[False]:.0f} localizations/s")
+        print(f"ingest:  {rates[True]:.0f} localizations/s")
+        print(f"speedup: {rates[True] / rates[False]:.1f}x")
@@ -0,0 +1,54 @@
+from datetime import datetime
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management.base import BaseCommand
+from main.store import SIGV4_TIMESTAMP, _get_local_presigner, get_tator_store
+
+
+class Command(BaseCommand):
+    help = "Compares local presigning against boto for the default live bucket."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--num-urls", type=int, default=10000)
+        parser.add_argument("--expiration", type=int, default=86400)
+
+    def handle(self, **options):
+        store = get_tator_store()
+        presigner = _get_local_presigner(store.client, store.bucket_name)
+        if presigner is None:
+            print("Local presigning is not available for this bucket, boto is used.")
+            return
+        keys = [f"1/2/{idx}/streaming_{idx}.mp4" for idx in range(options["num_urls"])]
+        expiration = options["expiration"]
+
+        start = time.perf_counter()
+        boto_urls = [
+            store.client.generate_presigned_url(
+                ClientMethod="get_object",
+                Params={"Bucket": store.bucket_name, "Key": key},
+                ExpiresIn=expiration,
+            )
+            for key in keys
+        ]
+        boto_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for key in keys:
+            presigner.presign(key, expiration)
+        local_time = time.perf_counter() - start
+
+        # Compare outputs using the signing time of each boto url.
+        mismatches = 0
+        for key, url in zip(keys, boto_urls):
+            query = parse_qs(urlsplit(url).query)
+            if "X-Amz-Date" in query:
+                now = datetime.strptime(query["X-Amz-Date"][0], SIGV4_TIMESTAMP)
+            else:
+                now = int(query["Expires"][0]) - expiration
+            mismatches += presigner.presign(key, expiration, now) != url
+
+        num_urls = len(keys)
+        print(f"boto:  {boto_time / num_urls * 1e6:.1f} us/url")
+        print(f"local: {local_time / num_urls * 1e6:.1f} us/url")
+        print(f"speedup: {boto_time / local_time:.1f}x, mismatches: {mismatches}/{num_urls}")
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django_ltree.fields import PathValue
+from main.encoders import TatorJSONEncoder
+from main.renderers import TatorRenderer
+from rest_framework.renderers import JSONRenderer
+
+
+class _JSONRenderer(JSONRenderer):
+    encoder_class = TatorJSONEncoder
+
+
+def _attributes(rng):
+    return {
+        "Species": rng.choice(["Fish", "Crab", "Starfish", "Eel   (unconfirmed)"]),
+        "Confidence": rng.random(),
+        "Length": rng.uniform(0.00001, 1000.0),
+        "Count": rng.randint(0, 100000),
+        "Verified": rng.random() > 0.5,
+        "Notes": "Überprüft 確認済み" if rng.random() > 0.9 else "",
+        "Observed": datetime(2024, 1, 1, tzinfo=timezone.utc)
+        + timedelta(seconds=rng.uniform(0, 1e7)),
+    }
+
+
+def _common(rng, idx):
+    return {
+        "id": idx,
+        "project": 1,
+        "created_datetime": datetime.now(timezone.utc),
+        "modified_datetime": datetime.now(timezone.utc),
+        "created_by": 1,
+        "modified_by": 1,
+        "elemental_id": uuid.uuid4(),
+        "mark": 0,
+        "latest_mark": 0,
+        "attributes": _attributes(rng),
+    }
+
+
+def _media(rng, idx):
+    return {
+        **_common(rng, idx),
+        "type": 1,
+        "name": f"dive_{idx}.mp4",
+        "md5": "d41d8cd98f00b204e9800998ecf8427e",
+        "num_frames": rng.randint(1000, 100000),
+        "fps": 29.97,
+        "width": 1920,
+        "height": 1080,
+        "media_files": {
+            "streaming": [
+                {
+                    "path": f"1/1/{idx}/720.mp4",
+                    "segment_info": f"1/1/{idx}/720.json",
+                    "resolution": [720, 1280],
+                    "codec": "h264",
+                    "bit_rate": 2500000,
+                }
+            ],
+        },
+    }
+
+
+def _localization(rng, idx):
+    return {
+        **_common(rng, idx),
+        "type": 2,
+        "media": rng.randint(1, 1000),
+        "version": 1,
+        "frame": rng.randint(0, 100000),
+        "x": rng.random(),
+        "y": rng.random(),
+        "width": rng.random() / 10,
+        "height": rng.random() / 10,
+        "points": None,
+        "parent": None,
+        "variant_deleted": False,
+        "is_useful": True,
+    }
+
+
+def _state(rng, idx):
+    return {
+        **_common(rng, idx),
+        "type": 3,
+        "media": [rng.randint(1, 1000)],
+        "localizations": [rng.randint(1, 1000000) for _ in range(rng.randint(1, 20))],
+        "segments": [[0, rng.randint(1, 1000)]],
+        "version": 1,
+        "frame": rng.randint(0, 100000),
+        "parent": None,
+        "variant_deleted": False,
+    }
+
+
+def _leaf(rng, idx):
+    return {
+        "id": idx,
+        "project": 1,
+        "type": 4,
+        "name": f"Leaf{idx}",
+        "path": PathValue(f"Tree.Branch{idx % 10}.Leaf{idx}"),
+        "parent": None,
+        "attributes": _attributes(rng),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compares orjson and json rendering of representative list responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--num-objects", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, **options):
+        rng = random.Random(options["seed"])
+        num_objects = options["num_objects"]
+        fast = TatorRenderer()
+        slow = _JSONRenderer()
+        for name, make in [
+            ("Media", _media),
+            ("Localization", _localization),
+            ("State", _state),
+            ("Leaf", _leaf),
+        ]:
+            data = [make(rng, idx) for idx in range(num_objects)]
+            times = {}
+            for label, renderer in [("json", slow), ("orjson", fast)]:
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    renderer.render(data)
+                times[label] = (time.perf_counter() - start) / options["repeat"]
+            expected = slow.render(data)
+            # Compare rows individually as well, so a mismatch in one is counted once.
+            mismatches = sum(fast.render(row) != slow.render(row) for row in data)
+            mismatches += fast.render(data) != expected
+            print(
+                f"{name}: json {times['json'] * 1e3:.1f} ms, orjson {times['orjson'] * 1e3:.1f} ms, "
+                f"{len(expected) / 1e6:.1f} MB, speedup: {times['json'] / times['orjson']:.1f}x, "
+                f"mismatches: {mismatches}/{num_objects + 1}"
+            )
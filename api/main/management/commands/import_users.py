@@ -4,6 +4,7 @@ import csv
 
 from django.core.management.base import BaseCommand
 from django.utils.crypto import get_random_string
+from main.cache import TatorCache
 from main.models import User
 from main.models import Affiliation
 from main.models import Membership
@@ -175,6 +176,10 @@ def _create_memberships(options, existing, num_new, users):
             f"Incorrect number of memberships to be created (got {len(new)}, expected {num_new}!"
         )
     created = Membership.objects.bulk_create(new)
+    # bulk_create does not send post_save, so drop cached permissions for these projects here.
+    cache = TatorCache()
+    for project_id in {mem.project_id for mem in created}:
+        cache.invalidate_cred_cache(project_id)
     print(f"Created {len(created)} new memberships!")
     return list(created)
 
@@ -0,0 +1,75 @@
+import io
+import json
+import logging
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.models import Media, Resource
+from main.segment_index import make_segment_index
+from main.store import get_storage_lookup
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Writes binary segment indices for streaming files that only have segment info json."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, default=None)
+        parser.add_argument("--batch_size", type=int, default=100)
+
+    def handle(self, **options):
+        qs = Media.objects.filter(deleted=False, media_files__has_key="streaming")
+        if options["project"] is not None:
+            qs = qs.filter(project=options["project"])
+        num_written = 0
+        last_id = 0
+        while True:
+            media_ids = list(
+                qs.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not media_ids:
+                break
+            last_id = media_ids[-1]
+            for media_id in media_ids:
+                num_written += self._index_media(media_id)
+            logger.info(f"Wrote a total of {num_written} segment indices up to media {last_id}...")
+        logger.info(f"Wrote a total of {num_written} segment indices!")
+
+    @staticmethod
+    def _index_media(media_id):
+        media = Media.objects.get(pk=media_id)
+        store_lookup = get_storage_lookup(Resource.objects.filter(media=media))
+        indices = {}
+        for media_def in media.media_files["streaming"]:
+            segment_file = media_def.get("segment_info")
+            if media_def.get("segment_index") or not segment_file:
+                continue
+            if segment_file not in store_lookup:
+                logger.warning(f"No resource for {segment_file} of media {media_id}!")
+                continue
+            store = store_lookup[segment_file]
+            index_file = f"{os.path.splitext(segment_file)[0]}.index"
+            try:
+                f_p = io.BytesIO()
+                store.download_fileobj(segment_file, f_p)
+                store.put_string(index_file, make_segment_index(json.loads(f_p.getvalue())))
+            except Exception:  # pylint: disable=broad-except
+                logger.warning(f"Failed to index {segment_file} of media {media_id}", exc_info=True)
+                continue
+            indices[segment_file] = index_file
+        if not indices:
+            return 0
+
+        with transaction.atomic():
+            media = Media.objects.select_for_update().get(pk=media_id)
+            for media_def in media.media_files.get("streaming", []):
+                if media_def.get("segment_info") in indices:
+                    media_def["segment_index"] = indices[media_def["segment_info"]]
+            Media.objects.filter(pk=media_id).update(media_files=media.media_files)
+        for index_file in indices.values():
+            Resource.add_resource(index_file, media)
+        return len(indices)
@@ -3,7 +3,9 @@ import logging
 import os
 
 from django.core.management.base import BaseCommand
+from django.db.models import Q
 from main.models import Localization
+from main.prune import prune
 
 logger = logging.getLogger(__name__)
 
@@ -20,38 +22,32 @@ class Command(BaseCommand):
             default=int(os.getenv("EXPIRATION_AGE_DAYS", 30)),
             help="Minimum age in days of localization objects for deletion.",
         )
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=10000,
+            help="Size of the ranges of IDs scanned and deleted in one transaction.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start from the lowest ID instead of resuming an interrupted run.",
+        )
 
     def handle(self, **options):
-        BATCH_SIZE = 1000
-        num_deleted = 0
         min_delta = datetime.timedelta(days=options["min_age_days"])
         max_datetime = datetime.datetime.now(datetime.timezone.utc) - min_delta
-        while True:
-            # We cannot delete with a LIMIT query, so make a separate query
-            # using IDs.
-            deleted = Localization.objects.filter(deleted=True, modified_datetime__lte=max_datetime)
-            null_project = Localization.objects.filter(
-                project__isnull=True, modified_datetime__lte=max_datetime
-            )
-            null_type = Localization.objects.filter(
-                type__isnull=True, modified_datetime__lte=max_datetime
-            )
-            null_version = Localization.objects.filter(
-                version__isnull=True, modified_datetime__lte=max_datetime
-            )
-            null_media = Localization.objects.filter(
-                media__isnull=True, modified_datetime__lte=max_datetime
-            )
-            loc_ids = (
-                (deleted | null_project | null_type | null_version | null_media)
-                .distinct()
-                .values_list("pk", flat=True)[:BATCH_SIZE]
-            )
-            localizations = Localization.objects.filter(pk__in=loc_ids)
-            num_localizations = localizations.count()
-            if num_localizations == 0:
-                break
-            localizations.delete()
-            num_deleted += num_localizations
-            logger.info(f"Deleted a total of {num_deleted} localizations...")
-        logger.info(f"Deleted a total of {num_deleted} localizations!")
+        condition = Q(modified_datetime__lte=max_datetime) & (
+            Q(deleted=True)
+            | Q(project__isnull=True)
+            | Q(type__isnull=True)
+            | Q(version__isnull=True)
+            | Q(media__isnull=True)
+        )
+        prune(
+            Localization,
+            condition,
+            "prunelocalizations",
+            options["chunk_size"],
+            options["restart"],
+        )
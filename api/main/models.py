@@ -36,7 +36,7 @@ from django.core.validators import MinValueValidator
 from django.core.validators import RegexValidator
 from django.db.models import JSONField
 from django.db.models import FloatField, Transform, UUIDField
-from django.db.models.signals import m2m_changed, pre_delete, pre_save, post_delete, post_save
+from django.db.models.signals import pre_delete, pre_save, post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.forms.models import model_to_dict
@@ -53,12 +53,14 @@ from .download import download_file
 from .encoders import TatorJSONEncoder
 from .store import (
     get_tator_store,
+    invalidate_tator_store,
     ObjectStore,
     get_storage_lookup,
     DEFAULT_STORAGE_CLASSES,
     VALID_STORAGE_CLASSES,
 )
 from .cognito import TatorCognito
+from .cache import TatorCache
 
 from collections import UserDict
 from urllib.parse import urlparse
@@ -93,6 +95,88 @@ EXECUTE format('UPDATE %I.%I SET latest_mark=%s WHERE elemental_id=%L AND versio
 RETURN NEW;
 """
 
+# Denormalized state links, recomputed for the states referenced by a transition table.
+STATE_MEDIA_IDS_SQL = """
+COALESCE((
+    SELECT array_agg(sm.media_id ORDER BY sm.media_id)
+    FROM main_state_media sm WHERE sm.state_id = main_state.id
+), '{}')
+"""
+
+STATE_LOCALIZATION_IDS_SQL = """
+COALESCE((
+    SELECT array_agg(sl.localization_id ORDER BY sl.localization_id)
+    FROM main_state_localizations sl WHERE sl.state_id = main_state.id
+), '{}')
+"""
+
+# Runs of consecutive frames share the same frame - row_number() value.
+STATE_SEGMENTS_SQL = """
+(
+    SELECT jsonb_agg(jsonb_build_array(seg.start, seg.stop) ORDER BY seg.start, seg.stop)
+    FROM (
+        SELECT MIN(f.frame) AS start, MAX(f.frame) AS stop
+        FROM (
+            SELECT l.frame, l.frame - ROW_NUMBER() OVER (ORDER BY l.frame) AS run
+            FROM main_state_localizations sl
+            JOIN main_localization l ON l.id = sl.localization_id
+            WHERE sl.state_id = main_state.id AND l.frame IS NOT NULL
+        ) AS f
+        GROUP BY f.run
+    ) AS seg
+)
+"""
+
+# Links of a state are always created after the state itself, including for copies made
+# by non in-place edits. Rows that predate this trigger stay null until backfilled.
+STATE_LINKS_INIT_TRIGGER_FUNC = """
+NEW.media_ids = '{}';
+NEW.localization_ids = '{}';
+NEW.segments = NULL;
+RETURN NEW;
+"""
+
+STATE_MEDIA_TRIGGER_FUNC = f"""
+UPDATE main_state SET media_ids = {STATE_MEDIA_IDS_SQL}
+WHERE main_state.id IN (SELECT state_id FROM changed_links);
+RETURN NULL;
+"""
+
+# Media of added localizations are linked to the state.
+STATE_LOCALIZATION_INSERT_TRIGGER_FUNC = f"""
+UPDATE main_state SET
+    localization_ids = {STATE_LOCALIZATION_IDS_SQL},
+    segments = {STATE_SEGMENTS_SQL}
+WHERE main_state.id IN (SELECT state_id FROM changed_links);
+INSERT INTO main_state_media (state_id, media_id)
+SELECT DISTINCT cl.state_id, l.media
+FROM changed_links cl JOIN main_localization l ON l.id = cl.localization_id
+WHERE l.media IS NOT NULL
+ON CONFLICT DO NOTHING;
+RETURN NULL;
+"""
+
+# Media of removed localizations are unlinked unless another localization of the state
+# is on the same media.
+STATE_LOCALIZATION_DELETE_TRIGGER_FUNC = f"""
+UPDATE main_state SET
+    localization_ids = {STATE_LOCALIZATION_IDS_SQL},
+    segments = {STATE_SEGMENTS_SQL}
+WHERE main_state.id IN (SELECT state_id FROM changed_links);
+DELETE FROM main_state_media sm
+USING (
+    SELECT DISTINCT cl.state_id, l.media
+    FROM changed_links cl JOIN main_localization l ON l.id = cl.localization_id
+) AS removed
+WHERE sm.state_id = removed.state_id AND sm.media_id = removed.media
+AND NOT EXISTS (
+    SELECT 1 FROM main_state_localizations sl
+    JOIN main_localization l ON l.id = sl.localization_id
+    WHERE sl.state_id = sm.state_id AND l.media = sm.media_id
+);
+RETURN NULL;
+"""
+
 
 class ModelDiffMixin(object):
     """
@@ -126,16 +210,15 @@ class ModelDiffMixin(object):
         Returns the dictionary representation of the model for comparison.
         """
         model_fields = [field.name for field in self._meta.fields]
-        model_dict = model_to_dict(self, fields=model_fields)
-        for field in model_fields:
-            if (
-                field in model_dict
-                and self._meta.get_field(field).get_internal_type() == "JSONField"
-            ):
-                model_dict[field] = dict(model_dict[field]) if model_dict[field] else {}
-        for k, v in model_dict.items():
-            if type(v) == datetime.datetime:
-                model_dict[k] = v.strftime("%Y_%m_%d__%H_%M_%S")
+        return self._normalize_model_dict(model_to_dict(self, fields=model_fields))
+
+    @classmethod
+    def _normalize_model_dict(cls, model_dict):
+        for field, value in model_dict.items():
+            if cls._meta.get_field(field).get_internal_type() == "JSONField":
+                model_dict[field] = dict(value) if value else {}
+            elif type(value) == datetime.datetime:
+                model_dict[field] = value.strftime("%Y_%m_%d__%H_%M_%S")
         return model_dict
 
     @staticmethod
@@ -179,13 +262,27 @@ class ModelDiffMixin(object):
         Returns the dictionary that is stored in the `description_of_change` field of the ChangeLog
         table when a row is created.
         """
-        change_dict = self._init_change_dict()
+        return self._create_dict(self.model_dict)
+
+    @classmethod
+    def create_dict_from_values(cls, values):
+        """
+        Returns the `create_dict` of a row that is inserted without a model instance, given its
+        field values keyed by field name with related objects given by primary key.
+        """
+        model_dict = {
+            field.name: values.get(field.name) for field in cls._meta.fields if field.editable
+        }
+        return cls._create_dict(cls._normalize_model_dict(model_dict))
+
+    @classmethod
+    def _create_dict(cls, new):
+        change_dict = cls._init_change_dict()
 
-        new = self.model_dict
         old = {key: None for key in new.keys() if key != "attributes"}
         old["attributes"] = {key: None for key in new.get("attributes", {})}
 
-        for name, old_val, new_val in self._diff(old, new):
+        for name, old_val, new_val in cls._diff(old, new):
             change_dict["old"].append({"name": name, "value": old_val})
             change_dict["new"].append({"name": name, "value": new_val})
 
@@ -651,6 +748,13 @@ class Bucket(Model):
         return new_params
 
 
+@receiver(post_save, sender=Bucket)
+@receiver(post_delete, sender=Bucket)
+def bucket_change(sender, instance, **kwargs):
+    """Drops pooled stores of a changed bucket."""
+    invalidate_tator_store(instance.id)
+
+
 class Project(Model):
     name = CharField(max_length=128)
     creator = ForeignKey(User, on_delete=PROTECT, related_name="creator", db_column="creator")
@@ -842,8 +946,17 @@ class Membership(Model):
         return f"{self.user} | {self.permission} | {self.project}"
 
 
+def _invalidate_membership_cache(membership):
+    user_id = membership.user_id
+    project_id = membership.project_id
+    TatorCache().invalidate_cred_cache(project_id, user_id)
+    # Also drop entries cached by concurrent requests before the change was committed.
+    transaction.on_commit(lambda: TatorCache().invalidate_cred_cache(project_id, user_id))
+
+
 @receiver(post_save, sender=Membership)
 def membership_save(sender, instance, created, **kwargs):
+    _invalidate_membership_cache(instance)
     email_service = get_email_service()
     if email_service:
         project = instance.project
@@ -868,6 +981,7 @@ def membership_save(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=Membership)
 def membership_delete(sender, instance, using, **kwargs):
+    _invalidate_membership_cache(instance)
     email_service = get_email_service()
     if email_service:
         user = instance.user
@@ -881,7 +995,14 @@ def getVideoDefinition(path, codec, resolution, **kwargs):
     """Convenience function to generate video definiton dictionary"""
     obj = {"path": path, "codec": codec, "resolution": resolution}
     for arg in kwargs:
-        if arg in ["segment_info", "host", "http_auth", "codec_meme", "codec_description"]:
+        if arg in [
+            "segment_info",
+            "segment_index",
+            "host",
+            "http_auth",
+            "codec_meme",
+            "codec_description",
+        ]:
             obj[arg] = kwargs[arg]
         else:
             raise TypeError(f"Invalid argument '{arg}' supplied")
@@ -1279,6 +1400,11 @@ class Media(Model, ModelDiffMixin):
                                   # MSE playback with seek support for streaming files.
                                   segment_info = <path_to_json>
 
+                                  # Path to the binary segment index for streaming files,
+                                  # see `main.segment_index`. Used in place of segment_info
+                                  # when rendering frames and clips if present.
+                                  segment_index = <path_to_index>
+
                                   # If supplied will use this instead of currently
                                   # connected host. e.g. https://example.com
                                   "host": <host url>
@@ -1411,6 +1537,11 @@ class Media(Model, ModelDiffMixin):
                     total_size += TatorBackupManager().get_size(
                         Resource.objects.get(path=json_path)
                     )
+                index_path = media_def.get("segment_index")
+                if index_path:
+                    total_size += TatorBackupManager().get_size(
+                        Resource.objects.get(path=index_path)
+                    )
 
         return (total_size, download_size)
 
@@ -1484,6 +1615,8 @@ class Media(Model, ModelDiffMixin):
 
             if key == "streaming":
                 yield media_def["segment_info"]
+                if media_def.get("segment_index"):
+                    yield media_def["segment_index"]
 
 
 class FileType(Model):
@@ -1512,6 +1645,24 @@ def file_type_save(sender, instance, **kwargs):
     TatorSearch().create_mapping(instance)
 
 
+@receiver(post_save, sender=MediaType)
+@receiver(post_save, sender=LocalizationType)
+@receiver(post_save, sender=StateType)
+@receiver(post_save, sender=LeafType)
+@receiver(post_save, sender=FileType)
+@receiver(post_delete, sender=MediaType)
+@receiver(post_delete, sender=LocalizationType)
+@receiver(post_delete, sender=StateType)
+@receiver(post_delete, sender=LeafType)
+@receiver(post_delete, sender=FileType)
+@receiver(post_save, sender=Project)
+def entity_type_schema_change(sender, instance, **kwargs):
+    """Invalidates compiled attribute queries when a project's schema changes."""
+    project_id = instance.pk if sender == Project else instance.project_id
+    if project_id is not None:
+        TatorCache().bump_schema_version(project_id)
+
+
 class File(Model, ModelDiffMixin):
     """Non-media generic file stored within a project"""
 
@@ -1853,6 +2004,12 @@ class State(Model, ModelDiffMixin):
                 declare=[("_var", "integer")],
                 func=AFTER_MARK_TRIGGER_FUNC,
             ),
+            pgtrigger.Trigger(
+                name="state_links_init_trigger",
+                operation=pgtrigger.Insert,
+                when=pgtrigger.Before,
+                func=STATE_LINKS_INIT_TRIGGER_FUNC,
+            ),
         ]
 
     project = ForeignKey(Project, on_delete=SET_NULL, null=True, blank=True, db_column="project")
@@ -1887,6 +2044,13 @@ class State(Model, ModelDiffMixin):
     media = ManyToManyField(Media, related_name="media")
     localizations = ManyToManyField(Localization)
     segments = JSONField(null=True, blank=True)
+    """ Maintained by triggers on the localizations table of the state. """
+    media_ids = ArrayField(IntegerField(), null=True, blank=True)
+    """ Denormalized IDs of associated media, maintained by triggers. Null if the state
+        predates the triggers and has not been backfilled. """
+    localization_ids = ArrayField(IntegerField(), null=True, blank=True)
+    """ Denormalized IDs of associated localizations, maintained by triggers. Null if the
+        state predates the triggers and has not been backfilled. """
     color = CharField(null=True, blank=True, max_length=8)
     frame = PositiveIntegerField(null=True, blank=True)
     extracted = ForeignKey(
@@ -1908,40 +2072,72 @@ class State(Model, ModelDiffMixin):
     latest_mark = PositiveIntegerField(default=0, blank=True, null=True)
     """ Mark represents the latest revision number of the element  """
 
+    TRIGGER_FIELDS = ["segments", "media_ids", "localization_ids"]
+    """ Fields written by triggers, excluded when saving existing states. """
+
+    def save(self, *args, **kwargs):
+        updating = self.pk is not None and not self._state.adding
+        if updating and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TRIGGER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @staticmethod
     def selectOnMedia(media_id):
         return State.objects.filter(media__in=media_id)
 
 
-@receiver(m2m_changed, sender=State.localizations.through)
-def calc_segments(sender, **kwargs):
-    instance = kwargs["instance"]
-    sortedLocalizations = Localization.objects.filter(pk__in=instance.localizations.all()).order_by(
-        "frame"
-    )
+class StateMediaLinks(State.media.through):
+    """Maintains denormalized media IDs of states."""
 
-    # Bring up related media to association
-    instance.media.set(sortedLocalizations.all().values_list("media", flat=True))
-    segmentList = []
-    current = [None, None]
-    last = None
-    for localization in sortedLocalizations:
-        if current[0] is None:
-            current[0] = localization.frame
-            last = current[0]
-        else:
-            if localization.frame - 1 == last:
-                last = localization.frame
-            else:
-                current[1] = last
-                segmentList.append(current.copy())
-                current[0] = localization.frame
-                current[1] = None
-                last = localization.frame
-    if current[1] is None:
-        current[1] = last
-        segmentList.append(current)
-    instance.segments = segmentList
+    class Meta:
+        proxy = True
+        triggers = [
+            pgtrigger.Trigger(
+                name="state_media_insert_trigger",
+                operation=pgtrigger.Insert,
+                when=pgtrigger.After,
+                level=pgtrigger.Statement,
+                referencing=pgtrigger.Referencing(new="changed_links"),
+                func=STATE_MEDIA_TRIGGER_FUNC,
+            ),
+            pgtrigger.Trigger(
+                name="state_media_delete_trigger",
+                operation=pgtrigger.Delete,
+                when=pgtrigger.After,
+                level=pgtrigger.Statement,
+                referencing=pgtrigger.Referencing(old="changed_links"),
+                func=STATE_MEDIA_TRIGGER_FUNC,
+            ),
+        ]
+
+
+class StateLocalizationLinks(State.localizations.through):
+    """Maintains denormalized localization IDs, segments and derived media links of states."""
+
+    class Meta:
+        proxy = True
+        triggers = [
+            pgtrigger.Trigger(
+                name="state_localization_insert_trigger",
+                operation=pgtrigger.Insert,
+                when=pgtrigger.After,
+                level=pgtrigger.Statement,
+                referencing=pgtrigger.Referencing(new="changed_links"),
+                func=STATE_LOCALIZATION_INSERT_TRIGGER_FUNC,
+            ),
+            pgtrigger.Trigger(
+                name="state_localization_delete_trigger",
+                operation=pgtrigger.Delete,
+                when=pgtrigger.After,
+                level=pgtrigger.Statement,
+                referencing=pgtrigger.Referencing(old="changed_links"),
+                func=STATE_LOCALIZATION_DELETE_TRIGGER_FUNC,
+            ),
+        ]
 
 
 class Leaf(Model, ModelDiffMixin):
@@ -2006,6 +2202,16 @@ class Leaf(Model, ModelDiffMixin):
         return pathStr
 
 
+@receiver(post_save, sender=Leaf)
+@receiver(post_delete, sender=Leaf)
+def leaf_change(sender, instance, **kwargs):
+    """Records changed leaves for suggestion indexes."""
+    type_id = instance.type_id
+    leaf_id = instance.id
+    if type_id is not None:
+        transaction.on_commit(lambda: TatorCache().push_leaf_changes(type_id, [leaf_id]))
+
+
 class Section(Model):
     project = ForeignKey(Project, on_delete=CASCADE, db_column="project")
     name = CharField(max_length=128)
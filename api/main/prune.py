@@ -0,0 +1,171 @@
+""" Set-based deletion of objects, one primary key range at a time. """
+
+import logging
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import CASCADE, DO_NOTHING, PROTECT, RESTRICT, SET_NULL, Max, Min
+
+from .cache import TatorCache
+from .models import ChangeToObject, Localization, Media, safe_delete
+
+logger = logging.getLogger(__name__)
+
+
+def _mark_thumbnails_deleted(ids):
+    """Marks thumbnails of localizations for deletion, in place of the `pre_delete` signal."""
+    thumbnails = Localization.objects.filter(pk__in=ids, thumbnail_image__isnull=False)
+    Media.objects.filter(pk__in=thumbnails.values("thumbnail_image")).update(deleted=True)
+
+
+def _delete_media_files(ids):
+    """Deletes files of media once they are deleted, in place of the `post_delete` signal."""
+    paths = [
+        (path, media.project_id)
+        for media in Media.objects.filter(pk__in=ids).only("id", "project", "media_files")
+        for path in media.path_iterator()
+    ]
+
+    def _delete():
+        for path, project_id in paths:
+            safe_delete(path, project_id)
+
+    if paths:
+        transaction.on_commit(_delete)
+
+
+# Replace model signals for rows deleted with `delete_rows`, called before rows are deleted.
+_BEFORE_DELETE = {
+    Localization: _mark_thumbnails_deleted,
+    Media: _delete_media_files,
+}
+
+
+def delete_rows(model, ids):
+    """Deletes rows of a model along with rows that depend on them using one statement per
+    table, without loading model instances. Rows referencing the deleted rows are deleted or
+    nulled according to `on_delete`, many to many links and change records are removed, and
+    rows referenced with `PROTECT` are kept.
+
+    :param model: Model of the rows.
+    :param ids: Primary keys of the rows.
+    :returns: List of primary keys of the deleted rows.
+    """
+    qn = connection.ops.quote_name
+    ids = list(ids)
+    relations = model._meta.related_objects
+    for rel in relations:
+        if not rel.many_to_many and rel.on_delete in (PROTECT, RESTRICT):
+            protected = set(
+                rel.related_model._base_manager.filter(**{f"{rel.field.name}__in": ids})
+                .values_list(rel.field.attname, flat=True)
+                .distinct()
+            )
+            if protected:
+                logger.info(f"Keeping {len(protected)} protected {model._meta.verbose_name_plural}")
+                ids = [pk for pk in ids if pk not in protected]
+    if not ids:
+        return ids
+
+    before_delete = _BEFORE_DELETE.get(model)
+    if before_delete is not None:
+        before_delete(ids)
+
+    with connection.cursor() as cursor:
+        links = [
+            (field.remote_field.through, field.m2m_field_name())
+            for field in model._meta.many_to_many
+        ]
+        links += [
+            (rel.through, rel.field.m2m_reverse_field_name())
+            for rel in relations
+            if rel.many_to_many
+        ]
+        for through, name in links:
+            cursor.execute(
+                f"DELETE FROM {qn(through._meta.db_table)} "
+                f"WHERE {qn(through._meta.get_field(name).column)} = ANY(%s)",
+                [ids],
+            )
+        for rel in relations:
+            if rel.many_to_many or rel.on_delete in (DO_NOTHING, PROTECT, RESTRICT):
+                continue
+            table = qn(rel.related_model._meta.db_table)
+            column = qn(rel.field.column)
+            if rel.on_delete is CASCADE:
+                pk_column = qn(rel.related_model._meta.pk.column)
+                cursor.execute(f"SELECT {pk_column} FROM {table} WHERE {column} = ANY(%s)", [ids])
+                related_ids = [row[0] for row in cursor.fetchall()]
+                if rel.related_model is model:
+                    related_ids = list(set(related_ids) - set(ids))
+                if related_ids:
+                    delete_rows(rel.related_model, related_ids)
+            elif rel.on_delete is SET_NULL:
+                cursor.execute(
+                    f"UPDATE {table} SET {column} = NULL WHERE {column} = ANY(%s)", [ids]
+                )
+            else:
+                raise ValueError(f"Unsupported on_delete for {rel.field} in delete_rows!")
+        cursor.execute(
+            f"DELETE FROM {qn(ChangeToObject._meta.db_table)} "
+            f"WHERE {qn(ChangeToObject._meta.get_field('ref_table').column)} = %s "
+            f"AND {qn(ChangeToObject._meta.get_field('ref_id').column)} = ANY(%s)",
+            [ContentType.objects.get_for_model(model).id, ids],
+        )
+        cursor.execute(
+            f"DELETE FROM {qn(model._meta.db_table)} WHERE {qn(model._meta.pk.column)} = ANY(%s)",
+            [ids],
+        )
+    return ids
+
+
+def prune(model, condition, name, chunk_size=10000, restart=False):
+    """Deletes objects matching a condition with `delete_rows`, scanning primary keys in ranges
+    of `chunk_size`. Each range is deleted in its own transaction and checkpointed, so an
+    interrupted run resumes after the last completed range unless `restart` is set.
+
+    :param model: Model of the objects.
+    :param condition: Q object selecting the objects to delete.
+    :param name: Name the checkpoint is saved under.
+    :returns: Total number of deleted objects, including those of resumed runs.
+    """
+    cache = TatorCache()
+    label = model._meta.verbose_name_plural
+    bounds = model.objects.aggregate(min_id=Min("pk"), max_id=Max("pk"))
+    if bounds["max_id"] is None:
+        return 0
+    start = bounds["min_id"]
+    num_deleted = 0
+    checkpoint = None if restart else cache.get_checkpoint(name)
+    if checkpoint is not None:
+        start = max(start, checkpoint["next_id"])
+        num_deleted = checkpoint["num_deleted"]
+        logger.info(f"Resuming deletion of {label} from ID {start}...")
+
+    started = time.monotonic()
+    num_run = 0
+    while start <= bounds["max_id"]:
+        end = start + chunk_size
+        with transaction.atomic():
+            ids = (
+                model.objects.filter(pk__gte=start, pk__lt=end)
+                .filter(condition)
+                .values_list("pk", flat=True)
+                .distinct()
+            )
+            num_run += len(delete_rows(model, ids))
+        start = end
+        cache.set_checkpoint(name, {"next_id": start, "num_deleted": num_deleted + num_run})
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"Deleted a total of {num_deleted + num_run} {label} up to ID {start - 1} "
+            f"({num_run / max(elapsed, 1e-6):.1f} {label}/s)..."
+        )
+    cache.clear_checkpoint(name)
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Deleted a total of {num_deleted + num_run} {label}! This run deleted {num_run} in "
+        f"{elapsed:.1f}s ({num_run / max(elapsed, 1e-6):.1f} {label}/s)."
+    )
+    return num_deleted + num_run
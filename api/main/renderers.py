@@ -1,52 +1,87 @@
 from rest_framework.renderers import BaseRenderer
 from rest_framework.renderers import JSONRenderer
 from django_ltree.fields import PathValue
-from .encoders import TatorJSONEncoder
+from .encoders import TatorJSONEncoder, dumps_compact
 
 import csv
 import io
 import ujson
 import logging
 
-from collections import OrderedDict
-from pprint import pprint
-
 
 logger = logging.getLogger(__name__)
 
 
+def attribute_columns(entity_types):
+    """Returns attribute names of the given entity types in display order, without duplicates."""
+    columns = {}
+    for entity_type in entity_types:
+        attribute_types = sorted(entity_type.attribute_types or [], key=lambda a: a.get("order", 0))
+        for attribute_type in attribute_types:
+            columns.setdefault(attribute_type["name"], None)
+    return list(columns)
+
+
 class CsvRenderer(BaseRenderer):
     """renders an object (list of objects) to a CSV file"""
 
     media_type = "text/plain"
     format = "csv"
 
+    @staticmethod
+    def _attribute_names(renderer_context):
+        """Returns the attribute names declared by the entity types of the rendered view."""
+        view = renderer_context.get("view")
+        entity_type = getattr(view, "entity_type", None)
+        project = getattr(view, "kwargs", {}).get("project")
+        if entity_type is None or project is None:
+            return []
+        types = entity_type.objects.filter(project=project)
+        request = renderer_context.get("request")
+        type_id = request.query_params.get("type") if request is not None else None
+        if type_id is not None and type_id.isdigit():
+            types = types.filter(pk=type_id)
+        return attribute_columns(types)
+
     def render(self, listObj, media_type=None, renderer_context=None):
-        """Flattens list of objects into a CSV"""
-        temp_file = io.StringIO()
-        temp_list = []
-        return_value = "No Records found."
-        try:
-            if len(listObj) > 0:
-                field_names = set()
-                for entry in listObj:
-                    field_names.update(list(entry.keys()))
-                for entry in listObj:
-                    row_object = {}
-                    for field in field_names:
-                        if type(entry.get(field)) in [OrderedDict, dict]:
-                            row_object.update(entry.get(field))
-                        else:
-                            row_object[field] = entry.get(field)
-                    temp_list.append(row_object)
-                writer = csv.DictWriter(temp_file, fieldnames=field_names, extrasaction="ignore")
-                writer.writeheader()
-                writer.writerows(temp_list)
-                return_value = temp_file.getvalue()
-        except Exception as e:
-            return_value = str(e)
-        finally:
-            return return_value
+        """Flattens list of objects into a CSV in one pass over the entries. Columns are added
+        in the order they are first seen, with the attribute names declared by the entity type
+        schema placed where the first attributes appear. Rows written before a column was
+        added end before it instead of holding an empty value.
+        """
+        if isinstance(listObj, dict):
+            # Single objects and error messages are written as one row.
+            listObj = [listObj]
+        if not listObj:
+            return "No Records found."
+        attribute_names = self._attribute_names(renderer_context or {})
+        columns = []
+        seen = set()
+
+        def _add_columns(names):
+            for name in names:
+                if name not in seen:
+                    seen.add(name)
+                    columns.append(name)
+
+        body = io.StringIO()
+        writer = csv.writer(body)
+        for entry in listObj:
+            row = {}
+            for field, value in entry.items():
+                if isinstance(value, dict):
+                    if field == "attributes":
+                        _add_columns(attribute_names)
+                    _add_columns(value)
+                    row.update(value)
+                else:
+                    _add_columns((field,))
+                    row[field] = value
+            writer.writerow([row.get(column) for column in columns])
+        _add_columns(attribute_names)
+        header = io.StringIO()
+        csv.writer(header).writerow(columns)
+        return header.getvalue() + body.getvalue()
 
 
 class PprintRenderer(BaseRenderer):
@@ -63,6 +98,17 @@ class PprintRenderer(BaseRenderer):
 class TatorRenderer(JSONRenderer):
     encoder_class = TatorJSONEncoder
 
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Renders compact output with `dumps_compact`, and indented output with `json`."""
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None and self.compact and not self.ensure_ascii:
+            ret = dumps_compact(data, allow_nan=not self.strict)
+            # Escape separators that are valid json but not valid javascript, as DRF does.
+            return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return super().render(data, accepted_media_type, renderer_context)
+
 
 class JpegRenderer(BaseRenderer):
     media_type = "image/jpeg"
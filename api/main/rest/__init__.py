@@ -15,7 +15,7 @@ from .bookmark import BookmarkDetailAPI
 from .bucket import BucketListAPI
 from .bucket import BucketDetailAPI
 from .change_log import ChangeLogListAPI
-from .clone_media import CloneMediaListAPI, GetClonedMediaAPI
+from .clone_media import CloneMediaListAPI, CloneMediaStatusAPI, GetClonedMediaAPI
 from .applet import AppletListAPI
 from .applet import AppletDetailAPI
 from .download_info import DownloadInfoAPI
@@ -23,6 +23,8 @@ from ._attribute_query import (
     _look_for_section_uuid,
 )
 
+from ._util import cursor_paginate
+
 logger = logging.getLogger(__name__)
 
 ANNOTATION_LOOKUP = {"localization": Localization, "state": State}
@@ -30,14 +32,14 @@ ANNOTATION_LOOKUP = {"localization": Localization, "state": State}
 ANNOTATION_TYPE_LOOKUP = {"localization": LocalizationType, "state": StateType}
 
 
-def _do_object_search(qs, params):
+def _do_object_search(qs, params, project):
     if params.get("object_search"):
-        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"))
+        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"), project)
 
     # Used by GET queries
     if params.get("encoded_search"):
         search_obj = json.loads(base64.b64decode(params.get("encoded_search").encode()).decode())
-        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj)
+        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj, project)
 
     return qs
 
@@ -160,7 +162,9 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
             if section_uuid:
                 media_qs = _look_for_section_uuid(media_qs, section_uuid)
             if object_search:
-                media_qs = get_attribute_psql_queryset_from_query_obj(media_qs, object_search)
+                media_qs = get_attribute_psql_queryset_from_query_obj(
+                    media_qs, object_search, project
+                )
             if related_object_search:
                 media_state_types = StateType.objects.filter(project=project)
                 media_localization_types = Localization.objects.filter(project=project)
@@ -210,7 +214,7 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
         related_matches = []
         for entity_type in related_media_types:
             media_qs = Media.objects.filter(project=project, type=entity_type)
-            media_qs = get_attribute_psql_queryset_from_query_obj(media_qs, search_obj)
+            media_qs = get_attribute_psql_queryset_from_query_obj(media_qs, search_obj, project)
             if media_qs.exists():
                 related_matches.append(media_qs)
         if related_matches:
@@ -222,7 +226,7 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
         else:
             qs = qs.filter(pk=-1)
 
-    qs = _do_object_search(qs, params)
+    qs = _do_object_search(qs, params, project)
     if params.get("related_id"):
         if annotation_type == "localization":
             state_qs = State.objects.filter(pk__in=params.get("related_id"))
@@ -250,7 +254,9 @@ def _get_annotation_psql_queryset(project, filter_ops, params, annotation_type):
     if params.get("show_all_marks", 0) == 0:
         qs = qs.filter(mark=F("latest_mark"))
 
-    if (start is not None) and (stop is not None):
+    if params.get("page_size") is not None:
+        qs = cursor_paginate(qs, params)
+    elif (start is not None) and (stop is not None):
         qs = qs[start:stop]
     elif start is not None:
         qs = qs[start:]
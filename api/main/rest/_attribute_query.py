@@ -1,5 +1,8 @@
 """ TODO: add documentation for this """
 import logging
+import json
+import threading
+from collections import OrderedDict
 
 from dateutil.parser import parse as dateutil_parse
 import pytz
@@ -34,11 +37,14 @@ from ..models import (
     LocalizationType,
     Media,
     MediaType,
+    Project,
     Section,
     State,
     StateType,
 )
 
+from ..cache import TatorCache
+
 from ._attributes import KV_SEPARATOR
 
 logger = logging.getLogger(__name__)
@@ -105,14 +111,14 @@ def _related_search(
         state_qs = State.objects.filter(
             project=project, type=entity_type, deleted=False, variant_deleted=False
         )
-        state_qs = get_attribute_psql_queryset_from_query_obj(state_qs, search_obj)
+        state_qs = get_attribute_psql_queryset_from_query_obj(state_qs, search_obj, project)
         if state_qs.exists():
             related_matches.append(state_qs)
     for entity_type in related_localization_types:
         local_qs = Localization.objects.filter(
             project=project, type=entity_type, deleted=False, variant_deleted=False
         )
-        local_qs = get_attribute_psql_queryset_from_query_obj(local_qs, search_obj)
+        local_qs = get_attribute_psql_queryset_from_query_obj(local_qs, search_obj, project)
         if local_qs.exists():
             related_matches.append(local_qs)
 
@@ -296,7 +302,7 @@ def build_query_recursively(query_object, castLookup, is_media, project, all_cas
 
             if section[0].object_search:
                 media_qs = get_attribute_psql_queryset_from_query_obj(
-                    media_qs, section[0].object_search
+                    media_qs, section[0].object_search, project
                 )
 
             if section[0].related_object_search:
@@ -369,14 +375,41 @@ def build_query_recursively(query_object, castLookup, is_media, project, all_cas
     return query, all_casts
 
 
-def get_attribute_psql_queryset_from_query_obj(qs, query_object):
-    if qs.exists() == False:
-        return qs.filter(pk=-1)
+class CompiledQuery:
+    """A search object compiled against a specific version of a project's attribute schema.
+
+    Holds the Q object and the typed annotations it requires so that it can be
+    applied to any queryset of the same model and project without reloading
+    the entity types or walking the search tree again.
+    """
+
+    def __init__(self, q_object, annotations):
+        self.q_object = q_object
+        self.annotations = annotations
+
+    def apply(self, qs):
+        for name, expression in self.annotations:
+            qs = qs.annotate(**{name: expression})
+        return qs.filter(self.q_object)
+
 
-    is_media = False
-    if type(qs[0]) == Media:
-        is_media = True
+# Per-process LRU cache of compiled queries, keyed by model, project, schema
+# version and the serialized search object.
+COMPILED_QUERY_CACHE_SIZE = 1024
+_compiled_queries = OrderedDict()
+_compiled_queries_lock = threading.Lock()
 
+
+def _uses_section(query_object):
+    """Returns true if the search object contains a $section lookup, which depends
+    on section contents rather than the attribute schema and cannot be cached."""
+    if "method" in query_object:
+        return any(_uses_section(x) for x in query_object["operations"])
+    return query_object.get("attribute") == "$section"
+
+
+def compile_query_obj(model, project, query_object):
+    """Compiles a search object into a reusable :class:`CompiledQuery`."""
     typeLookup = {
         Media: MediaType,
         Localization: LocalizationType,
@@ -401,11 +434,10 @@ def get_attribute_psql_queryset_from_query_obj(qs, query_object):
     attributeCast = {}
     annotateField = {}
     # For Section the attribute types are stored in the project itself
-    if type(qs[0]) == Section:
-        typeObjects = [qs[0].project]
+    if model == Section:
+        typeObjects = Project.objects.filter(pk=getattr(project, "pk", project))
     else:
-        typeModel = typeLookup[type(qs[0])]
-        typeObjects = typeModel.objects.filter(project=qs[0].project)
+        typeObjects = typeLookup[model].objects.filter(project=project)
     for typeObject in typeObjects:
         for attributeType in typeObject.attribute_types:
             attributeCast[attributeType["name"]] = castLookup[attributeType["dtype"]]
@@ -439,121 +471,218 @@ def get_attribute_psql_queryset_from_query_obj(qs, query_object):
         attributeCast[key] = str
 
     q_object, required_annotations = build_query_recursively(
-        query_object, attributeCast, is_media, qs[0].project, set()
+        query_object, attributeCast, model == Media, project, set()
     )
 
     logger.info(f"Q_Object = {q_object}")
     logger.info(f"Query requires the following annotations: {required_annotations}")
+    annotations = []
     for annotation in required_annotations:
         logger.info(f"\t {annotation} to {annotateField[annotation]()}")
         if annotateField[annotation] == DateTimeField:
             # Cast DateTime to text first
-            qs = qs.annotate(
-                **{
-                    f"casted_{_sanitize(annotation)}_text": Cast(
-                        F(f"attributes__{annotation}"), TextField()
-                    )
-                }
+            annotations.append(
+                (
+                    f"casted_{_sanitize(annotation)}_text",
+                    Cast(F(f"attributes__{annotation}"), TextField()),
+                )
             )
-            qs = qs.annotate(
-                **{
-                    f"casted_{_sanitize(annotation)}": Cast(
-                        F(f"casted_{_sanitize(annotation)}_text"),
-                        annotateField[annotation](),
-                    )
-                }
+            annotations.append(
+                (
+                    f"casted_{_sanitize(annotation)}",
+                    Cast(F(f"casted_{_sanitize(annotation)}_text"), annotateField[annotation]()),
+                )
             )
         else:
-            qs = qs.annotate(
-                **{
-                    f"casted_{_sanitize(annotation)}": Cast(
-                        F(f"attributes__{annotation}"), annotateField[annotation]()
-                    )
-                }
+            annotations.append(
+                (
+                    f"casted_{_sanitize(annotation)}",
+                    Cast(F(f"attributes__{annotation}"), annotateField[annotation]()),
+                )
             )
-    return qs.filter(q_object)
-
-
-def get_attribute_psql_queryset(entity_type, qs, params, filter_ops):
+    return CompiledQuery(q_object, annotations)
+
+
+def get_compiled_query(model, project, query_object):
+    """Returns a compiled query for the search object, using the per-process cache
+    when the project's attribute schema has not changed since it was compiled.
+    """
+    if _uses_section(query_object):
+        return compile_query_obj(model, project, query_object)
+
+    project_id = int(getattr(project, "pk", project))
+    key = (
+        model._meta.label,
+        project_id,
+        TatorCache().get_schema_version(project_id),
+        json.dumps(query_object, sort_keys=True),
+    )
+    with _compiled_queries_lock:
+        compiled = _compiled_queries.get(key)
+        if compiled is not None:
+            _compiled_queries.move_to_end(key)
+            return compiled
+
+    compiled = compile_query_obj(model, project, query_object)
+    with _compiled_queries_lock:
+        _compiled_queries[key] = compiled
+        while len(_compiled_queries) > COMPILED_QUERY_CACHE_SIZE:
+            _compiled_queries.popitem(last=False)
+    return compiled
+
+
+def get_attribute_psql_queryset_from_query_obj(qs, query_object, project=None):
+    if project is None:
+        # Fall back to inferring the project from the queryset contents.
+        first = qs.first()
+        if first is None:
+            return qs.filter(pk=-1)
+        project = first.project_id
+    return get_compiled_query(qs.model, project, query_object).apply(qs)
+
+
+def _get_attribute_filter(entity_type, params, filter_ops, prefix=""):
+    """Builds the typed annotations and Q object implementing the attribute filters for
+    a single entity type. Annotation aliases are prefixed with `prefix` so filters for
+    several types can share one queryset. Returns a tuple of (annotations, query, found)
+    where found indicates whether any filter applies to the entity type.
+    """
     attribute_null = params.get("attribute_null", [])
-    float_queries = params.get("float_array", [])
-
-    # return original queryset if no queries were supplied
-    if not (filter_ops or float_queries or attribute_null):
-        return qs
-
-    found_queryset = False
+    annotations = []
+    query = Q()
+    found = False
     for key, value, op in filter_ops:
         if key.startswith("$"):
             db_field = key[1:]
-            qs = qs.filter(**{f"{db_field}{OPERATOR_SUFFIXES[op]}": value})
-            found_queryset = True
+            query &= Q(**{f"{db_field}{OPERATOR_SUFFIXES[op]}": value})
+            found = True
         else:
             field_type, _ = _get_field_for_attribute(entity_type, key)
             if field_type:
                 # Annotate with a typed object prior to query to ensure index usage
-                alias_key = re.sub(r"[^\w]", "__", key)
+                alias_key = prefix + re.sub(r"[^\w]", "__", key)
                 if field_type == PointField:
-                    qs = qs.annotate(
-                        **{f"{alias_key}_0_float": Cast(f"attributes__{key}__0", FloatField())}
+                    annotations.append(
+                        (f"{alias_key}_0_float", Cast(f"attributes__{key}__0", FloatField()))
                     )
-                    qs = qs.annotate(
-                        **{f"{alias_key}_1_float": Cast(f"attributes__{key}__1", FloatField())}
+                    annotations.append(
+                        (f"{alias_key}_1_float", Cast(f"attributes__{key}__1", FloatField()))
                     )
-                    qs = qs.annotate(
-                        **{
-                            f"{alias_key}_typed": Cast(
+                    annotations.append(
+                        (
+                            f"{alias_key}_typed",
+                            Cast(
                                 Func(
                                     F(f"{alias_key}_0_float"),
                                     F(f"{alias_key}_1_float"),
                                     function="ST_MakePoint",
                                 ),
                                 PointField(srid=4326),
-                            )
-                        }
+                            ),
+                        )
                     )
-                    qs = qs.filter(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
+                    query &= Q(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
                 elif field_type == DateTimeField:
-                    qs = qs.annotate(
-                        **{f"{alias_key}_text": Cast(f"attributes__{key}", CharField())}
+                    annotations.append(
+                        (f"{alias_key}_text", Cast(f"attributes__{key}", CharField()))
                     )
-                    qs = qs.annotate(
-                        **{f"{alias_key}_typed": Cast(f"{alias_key}_text", DateTimeField())}
+                    annotations.append(
+                        (f"{alias_key}_typed", Cast(f"{alias_key}_text", DateTimeField()))
                     )
-                    qs = qs.filter(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
+                    query &= Q(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
                 elif field_type == CharField or field_type == EnumField:
-                    qs = qs.annotate(
-                        **{f"{alias_key}_typed": Cast(f"attributes__{key}", field_type())}
+                    annotations.append(
+                        (f"{alias_key}_typed", Cast(f"attributes__{key}", field_type()))
                     )
                     if OPERATOR_SUFFIXES[op]:
-                        qs = qs.filter(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
+                        query &= Q(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
                     else:
                         # BUG: database_qs mangles the SQL and requires this workaround:
                         # This is only on equal for some reason.
-                        qs = qs.filter(
-                            **{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": f'"{value}"'}
-                        )
+                        query &= Q(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": f'"{value}"'})
                 else:
-                    qs = qs.annotate(
-                        **{f"{alias_key}_typed": Cast(f"attributes__{key}", field_type())}
+                    annotations.append(
+                        (f"{alias_key}_typed", Cast(f"attributes__{key}", field_type()))
                     )
-                    qs = qs.filter(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
-                found_queryset = True
+                    query &= Q(**{f"{alias_key}_typed{OPERATOR_SUFFIXES[op]}": value})
+                found = True
 
     if attribute_null is not None:
         for kv in attribute_null:
             key, value = kv.split(KV_SEPARATOR)
             value = _convert_boolean(value)
             if value:
-                qs = qs.filter(
-                    Q(**{f"attributes__contains": {key: None}})
-                    | ~Q(**{f"attributes__has_key": key})
+                query &= Q(**{f"attributes__contains": {key: None}}) | ~Q(
+                    **{f"attributes__has_key": key}
                 )
             else:
                 # Returns true if the attributes both have a key and it is not set to null
-                qs = qs.filter(**{f"attributes__has_key": key})
-                qs = qs.filter(~Q(**{f"attributes__contains": {key: None}}))
-            found_queryset = True
+                query &= Q(**{f"attributes__has_key": key})
+                query &= ~Q(**{f"attributes__contains": {key: None}})
+            found = True
+
+    return annotations, query, found
+
+
+def _attribute_filter_signature(entity_type, filter_ops):
+    """Returns a hashable description of how the filter operations apply to an entity
+    type. Types with equal signatures produce identical predicates."""
+    signature = []
+    for key, _, _ in filter_ops:
+        if not key.startswith("$"):
+            signature.append(_get_field_for_attribute(entity_type, key))
+    return tuple(signature)
+
+
+def get_attribute_psql_queryset_multi_type(entity_types, qs, params, filter_ops):
+    """Applies attribute filters across several entity types in a single statement.
+
+    Entity types are grouped by the dtypes of the filtered attributes, so one set of typed
+    annotations and one predicate is emitted per group rather than one subquery per type.
+    Types that no filter applies to cannot match and are pruned up front. The group predicate
+    is repeated in a branch per type of the group, ORed together, so each branch can use the
+    partial indices of its type.
+    """
+    if params.get("float_array"):
+        raise Exception("Must supply 'type' if supplying a float_query.")
+
+    groups = {}
+    for entity_type in entity_types:
+        signature = _attribute_filter_signature(entity_type, filter_ops)
+        groups.setdefault(signature, []).append(entity_type)
+    logger.info(f"Planning attribute filter for {len(entity_types)} types in {len(groups)} groups.")
+
+    query = None
+    for idx, group in enumerate(groups.values()):
+        annotations, group_query, found = _get_attribute_filter(
+            group[0], params, filter_ops, prefix=f"g{idx}_"
+        )
+        if not found:
+            continue
+        for name, expression in annotations:
+            qs = qs.annotate(**{name: expression})
+        # Each branch implies the partial index predicate of its type.
+        for entity_type in group:
+            branch = Q(type=entity_type.pk) & group_query
+            query = branch if query is None else query | branch
+
+    if query is None:
+        return qs.filter(pk=-1)
+    return qs.filter(query)
+
+
+def get_attribute_psql_queryset(entity_type, qs, params, filter_ops):
+    attribute_null = params.get("attribute_null", [])
+    float_queries = params.get("float_array", [])
+
+    # return original queryset if no queries were supplied
+    if not (filter_ops or float_queries or attribute_null):
+        return qs
+
+    annotations, query, found_queryset = _get_attribute_filter(entity_type, params, filter_ops)
+    for name, expression in annotations:
+        qs = qs.annotate(**{name: expression})
+    qs = qs.filter(query)
 
     for query in float_queries:
         if "type" not in params:
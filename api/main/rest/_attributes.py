@@ -1,9 +1,9 @@
 """ TODO: add documentation for this """
 from typing import List
+import json
 import logging
 
-from django.db.models.expressions import Func
-from django.db.models import Case, When, F
+from django.db.models.expressions import RawSQL
 from django.contrib.gis.measure import D as GisDistance
 from django.contrib.gis.geos import Point
 from django.shortcuts import get_object_or_404
@@ -14,73 +14,8 @@ logger = logging.getLogger(__name__)
 # Separator for key value pairs in attribute queries
 KV_SEPARATOR = "::"
 
-
-class ReplaceValue(Func):  # pylint: disable=abstract-method
-    """
-    Updates the value of the attribute field named `keyname` with `new_value`. See
-    https://www.postgresql.org/docs/current/functions-json.html for documentation on the function
-    template.
-    """
-
-    function = "jsonb_set"
-    template = "%(function)s(%(expressions)s, '{\"%(keyname)s\"}','%(new_value)s', %(create_missing)s)"  # pylint: disable=line-too-long
-    arity = 1
-
-    def __init__(
-        self,
-        expression: str,
-        keyname: str,
-        new_value: str,
-        create_missing: bool = False,
-        **extra,
-    ):
-        super().__init__(
-            expression,
-            keyname=keyname,
-            new_value=new_value,
-            create_missing="true" if create_missing else "false",
-            **extra,
-        )
-
-
-class ReplaceKey(Func):  # pylint: disable=abstract-method
-    """
-    Renames the attribute field named `old_key` to `new_key` and does not modify the value. See
-    https://www.postgresql.org/docs/current/functions-json.html for documentation on the function
-    template.
-    """
-
-    function = "jsonb_set"
-    template = "%(function)s(%(expressions)s #- '{\"%(old_key)s\"}', '{\"%(new_key)s\"}', COALESCE(%(expressions)s #> '{\"%(old_key)s\"}','null'::jsonb), %(create_missing)s)"  # pylint: disable=line-too-long
-    arity = 1
-
-    def __init__(
-        self, expression: str, old_key: str, new_key: str, create_missing: bool = False, **extra
-    ):
-        super().__init__(
-            expression,
-            old_key=old_key,
-            new_key=new_key,
-            create_missing="true" if create_missing else "false",
-            **extra,
-        )
-
-
-class DeleteKey(Func):  # pylint: disable=abstract-method
-    """
-    Deletes the attribute field named `key` and any value it may have. See
-    https://www.postgresql.org/docs/current/functions-json.html for documentation on the function
-    template.
-    """
-
-    # function = 'jsonb_set'
-    template = "%(expressions)s - '%(key)s'"  # pylint: disable=line-too-long
-    arity = 1
-
-    def __init__(self, expression: str, key: str, create_missing: bool = False, **extra):
-        super().__init__(
-            expression, key=key, create_missing="true" if create_missing else "false", **extra
-        )
+# Number of objects updated by each statement of bulk attribute operations
+BULK_ATTRIBUTE_CHUNK_SIZE = 10000
 
 
 def convert_attribute(attr_type, attr_val):  # pylint: disable=too-many-branches
@@ -257,64 +192,75 @@ def patch_attributes(new_attrs, obj):
     return obj
 
 
-def _process_for_bulk_op(raw_value):
+def _mutated_attributes(patch, rename, delete):
     """
-    Converts a raw value into the accepted format for jsonb in PostgreSQL.
+    Returns an expression for the attribute field with the keys in `delete` removed, the keys in
+    `rename` renamed and `patch` merged in, in that order. See
+    https://www.postgresql.org/docs/current/functions-json.html for documentation on the
+    operators.
     """
-    if isinstance(raw_value, str):
-        raw_value = raw_value.replace("\\", "\\\\")
-        raw_value = raw_value.replace("\n", "\\n")
-        raw_value = raw_value.replace('"', '\\"')
-        return f'"{raw_value}"'
-    if isinstance(raw_value, bool):
-        return f"{str(raw_value).lower()}"
-    if raw_value == None:
-        return "null"
+    sql = "attributes"
+    params = []
+    removed = [*delete, *rename]
+    if removed:
+        sql = f"({sql} - %s::text[])"
+        params.append(removed)
+    if rename:
+        # Renamed keys keep their values; keys missing from an object are skipped.
+        sql = (
+            f"({sql} || (SELECT COALESCE(jsonb_object_agg(renames.value, attributes -> "
+            f"renames.key), '{{}}'::jsonb) FROM jsonb_each_text(%s::jsonb) AS renames "
+            f"WHERE attributes ? renames.key))"
+        )
+        params.append(json.dumps(rename))
+    if patch:
+        sql = f"({sql} || %s::jsonb)"
+        params.append(json.dumps(patch))
+    return RawSQL(sql, params)
 
-    return raw_value
+
+def bulk_mutate_attributes(
+    q_s, patch=None, rename=None, delete=None, chunk_size=BULK_ATTRIBUTE_CHUNK_SIZE
+):
+    """
+    Deletes, renames and updates attribute keys with one UPDATE per chunk of objects, so each
+    row is rewritten once. The primary keys of `q_s` are fetched once and updated in slices of
+    `chunk_size`, so each statement locks at most `chunk_size` rows and the caller's filters
+    are not evaluated again for every chunk.
+
+    :param q_s: Queryset of the objects to update.
+    :param patch: Dict of new attribute values by key.
+    :param rename: Dict of new attribute keys by old key. Keys are renamed simultaneously.
+    :param delete: List of attribute keys to remove.
+    """
+    patch = patch or {}
+    rename = rename or {}
+    delete = delete or []
+    if not (patch or rename or delete):
+        return
+    attributes = _mutated_attributes(patch, rename, delete)
+    manager = q_s.model._base_manager
+    ids = list(q_s.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(ids), chunk_size):
+        manager.filter(pk__in=ids[start : start + chunk_size]).update(attributes=attributes)
 
 
 def bulk_patch_attributes(new_attrs, q_s):
     """
     Updates attribute values.
     """
-    for key, raw_val in new_attrs.items():
-        q_s.update(
-            attributes=ReplaceValue(
-                "attributes",
-                keyname=key.replace("%", "%%"),
-                new_value=_process_for_bulk_op(raw_val),
-                create_missing=True,
-            )
-        )
+    bulk_mutate_attributes(q_s, patch=new_attrs)
 
 
 def bulk_rename_attributes(new_attrs, q_s):
     """
     Updates attribute keys.
     """
-    for old_key, new_key in new_attrs.items():
-        old = old_key.replace("%", "%%")
-        new = new_key.replace("%", "%%")
-        q_s.update(
-            attributes=Case(
-                When(
-                    attributes__has_key=old,
-                    then=ReplaceKey(
-                        "attributes",
-                        old_key=old,
-                        new_key=new,
-                        create_missing=True,
-                    ),
-                ),
-                default=F("attributes"),
-            )
-        )
+    bulk_mutate_attributes(q_s, rename=new_attrs)
 
 
 def bulk_delete_attributes(attrs_to_delete: List[str], q_s):
     """
     Removes attribute keys.
     """
-    for attr in attrs_to_delete:
-        q_s.update(attributes=DeleteKey("attributes", key=attr.replace("%", "%%")))
+    bulk_mutate_attributes(q_s, delete=attrs_to_delete)
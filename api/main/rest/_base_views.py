@@ -8,6 +8,7 @@ from rest_framework.exceptions import PermissionDenied
 from rest_framework import status
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import response
+from django.http import StreamingHttpResponse
 
 from ..schema import parse
 
@@ -47,8 +48,11 @@ class GetMixin:
         """TODO: add documentation for this"""
         resp = Response({})
         params = parse(request)
+        self.response_headers = {}
         response_data = self._get(params)
-        resp = Response(response_data, status=status.HTTP_200_OK)
+        if isinstance(response_data, StreamingHttpResponse):
+            return response_data
+        resp = Response(response_data, status=status.HTTP_200_OK, headers=self.response_headers)
         return resp
 
 
@@ -92,8 +96,9 @@ class DeleteMixin:
 class PutMixin:
     def put(self, request, format=None, **kwargs):
         params = parse(request)
+        self.response_headers = {}
         response_data = self._put(params)
-        resp = Response(response_data, status=status.HTTP_200_OK)
+        resp = Response(response_data, status=status.HTTP_200_OK, headers=self.response_headers)
         return resp
 
 
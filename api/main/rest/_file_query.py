@@ -17,6 +17,8 @@ from ._attribute_query import (
     supplied_name_to_field,
 )
 
+from ._util import cursor_paginate
+
 logger = logging.getLogger(__name__)
 
 
@@ -76,13 +78,13 @@ def _get_file_psql_queryset(project, filter_ops, params):
 
     # Used by PUT queries
     if params.get("object_search"):
-        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"))
+        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"), project)
 
     # Used by GET queries
     if params.get("encoded_search"):
         search_obj = json.loads(base64.b64decode(params.get("encoded_search")).decode())
         logger.info(f"Applying encoded search={search_obj}")
-        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj)
+        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj, project)
 
     if params.get("sort_by", None):
         sortables = [supplied_name_to_field(x) for x in params.get("sort_by")]
@@ -90,7 +92,9 @@ def _get_file_psql_queryset(project, filter_ops, params):
     else:
         qs = qs.order_by("id")
 
-    if start is not None and stop is not None:
+    if params.get("page_size") is not None:
+        qs = cursor_paginate(qs, params)
+    elif start is not None and stop is not None:
         qs = qs[start:stop]
     elif start is not None:
         qs = qs[start:]
@@ -0,0 +1,194 @@
+""" Utilities for high-throughput creation of annotations. """
+
+import datetime
+import functools
+import io
+import json
+import math
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+
+from ..models import ChangeLog, ChangeToObject
+from ._attributes import convert_attribute
+
+_MISSING = object()
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+
+def _column_converter(attr_type):
+    """Returns a function that validates and converts one value of the given attribute type.
+    Values that are already of the expected type are checked inline, anything else is left
+    to `convert_attribute`.
+    """
+    dtype = attr_type["dtype"]
+    slow = functools.partial(convert_attribute, attr_type)
+    if dtype in ["string", "blob"]:
+        return lambda value: value
+    if dtype == "bool":
+        return lambda value: value if type(value) is bool else slow(value)
+    if dtype in ["int", "float"]:
+        minimum = attr_type.get("minimum", -math.inf)
+        maximum = attr_type.get("maximum", math.inf)
+        if dtype == "int":
+            return lambda value: (
+                value if type(value) is int and minimum <= value <= maximum else slow(value)
+            )
+        return lambda value: (
+            float(value)
+            if type(value) in (float, int) and minimum <= value <= maximum
+            else slow(value)
+        )
+    if dtype == "enum":
+        try:
+            choices = frozenset(attr_type["choices"])
+        except TypeError:
+            return slow
+        return lambda value: value if type(value) is str and value in choices else slow(value)
+    return slow
+
+
+def _missing_value(attr_type):
+    """Returns the value filled in for rows that omit the given attribute, following
+    `check_required_fields`. Raises if the attribute is required.
+    """
+    field = attr_type["name"]
+    if attr_type["dtype"] == "datetime":
+        if attr_type.get("use_current"):
+            return datetime.datetime.now(datetime.timezone.utc).isoformat()
+        if attr_type.get("required", True):
+            raise ValueError(
+                f'Missing attribute value for "{field}". Set `use_current` to '
+                f"True or supply a value."
+            )
+    elif "default" in attr_type:
+        return attr_type["default"]
+    elif attr_type.get("required", True):
+        raise ValueError(
+            f'Missing attribute value for "{field}". Set a `default` on '
+            f"the attribute type or supply a value."
+        )
+    return _MISSING
+
+
+def validate_attribute_columns(attr_types, specs, indices, errors):
+    """Validates the attributes of specs sharing one entity type, one attribute type at a time.
+
+    :param attr_types: The `attribute_types` of the entity type.
+    :param specs: List of all specs in the request.
+    :param indices: Indices of the specs of this entity type.
+    :param errors: Dict of spec index to error message. Specs already in it are skipped and
+                   specs that fail validation are added to it.
+    :returns: Dict of spec index to validated attributes, with missing values filled in.
+    """
+    attributes = {idx: {} for idx in indices}
+    for attr_type in attr_types:
+        name = attr_type["name"]
+        convert = _column_converter(attr_type)
+        try:
+            missing = _missing_value(attr_type)
+            missing_error = None
+        except ValueError as exc:
+            missing = _MISSING
+            missing_error = str(exc)
+        for idx in indices:
+            if idx in errors:
+                continue
+            values = specs[idx].get("attributes", {})
+            if name in values:
+                try:
+                    attributes[idx][name] = convert(values[name])
+                except Exception as exc:  # pylint: disable=broad-except
+                    errors[idx] = str(exc)
+            elif missing_error is not None:
+                errors[idx] = missing_error
+            elif missing is not _MISSING:
+                attributes[idx][name] = missing
+    return attributes
+
+
+def allocate_ids(model, count):
+    """Reserves `count` primary keys from the sequence of the given model."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [model._meta.db_table, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _copy_value(value, encoder=None):
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, cls=encoder)
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_rows(model, rows):
+    """Inserts rows with `COPY ... FROM STDIN`, bypassing model instances entirely.
+
+    :param model: Model of the table to insert into.
+    :param rows: List of dicts of column values keyed by field name, with related objects given
+                 by primary key. Every row must have the same keys and include the primary key.
+    """
+    if not rows:
+        return
+    fields = [model._meta.get_field(name) for name in rows[0]]
+    encoders = [getattr(field, "encoder", None) for field in fields]
+    buf = io.StringIO()
+    for row in rows:
+        buf.write(
+            "\t".join(_copy_value(value, encoder) for value, encoder in zip(row.values(), encoders))
+        )
+        buf.write("\n")
+    buf.seek(0)
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {model._meta.db_table} ({columns}) FROM STDIN", buf)
+
+
+def copy_log_creation(model, rows, project, user):
+    """Creates changelogs for rows inserted with `copy_rows`, equivalent to `bulk_log_creation`.
+
+    :param model: Model of the inserted rows.
+    :param rows: The inserted rows.
+    :param project: The project the request originates from
+    :param user: The user making the requests
+    """
+    if not rows:
+        return
+    now = datetime.datetime.now(datetime.timezone.utc)
+    change_ids = allocate_ids(ChangeLog, len(rows))
+    copy_rows(
+        ChangeLog,
+        [
+            {
+                "id": change_id,
+                "project": project.id,
+                "user": user.id,
+                "modified_datetime": now,
+                "description_of_change": model.create_dict_from_values(row),
+            }
+            for change_id, row in zip(change_ids, rows)
+        ],
+    )
+    ref_table = ContentType.objects.get_for_model(model).id
+    copy_rows(
+        ChangeToObject,
+        [
+            {"id": object_id, "ref_table": ref_table, "ref_id": row["id"], "change_id": change_id}
+            for object_id, change_id, row in zip(
+                allocate_ids(ChangeToObject, len(rows)), change_ids, rows
+            )
+        ],
+    )
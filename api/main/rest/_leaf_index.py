@@ -0,0 +1,272 @@
+""" In-memory indexes for leaf autocomplete suggestions. """
+
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict, namedtuple
+import logging
+import threading
+
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.db.models.fields.json import KeyTransform
+
+from ..cache import TatorCache
+from ..models import Leaf
+
+logger = logging.getLogger(__name__)
+
+# Separates keys in the packed string searched by wildcard queries.
+_SEPARATOR = "\x00"
+
+_IndexedLeaf = namedtuple("_IndexedLeaf", ["name", "path", "depth", "parent", "has_alias", "alias"])
+
+# Maximum number of ancestor paths whose leaf types are cached.
+_ANCESTOR_TYPES_MAX_SIZE = 10000
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_ancestor_types = {}
+
+
+def _leaf_rows(queryset):
+    return queryset.annotate(
+        alias_value=KeyTransform("alias", "attributes"),
+        has_alias=ExpressionWrapper(Q(attributes__has_key="alias"), output_field=BooleanField()),
+    ).values_list("id", "type", "deleted", "name", "path", "parent", "alias_value", "has_alias")
+
+
+def _label(name, alias):
+    """Returns the group label given to children of a leaf."""
+    if alias is None:
+        return name
+    return f"{name} ({alias})"
+
+
+class LeafIndex:
+    """Suggestion index over the leaves of one leaf type.
+
+    Lowercased names and aliases are kept in a sorted list for prefix lookups and packed into a
+    single string that is searched for the remaining components of wildcard queries. Group
+    labels are resolved when leaves are loaded, so suggestions do not query the database.
+    """
+
+    def __init__(self, type_id):
+        self.type_id = type_id
+        self.version = None
+        self._lock = threading.Lock()
+        self._leaves = {}
+        self._labels = {}
+        self._keys = []
+        self._text = None
+        self._offsets = None
+
+    @staticmethod
+    def _leaf_keys(leaf):
+        keys = {leaf.name.lower()}
+        if isinstance(leaf.alias, str):
+            keys.add(leaf.alias.lower())
+        return keys
+
+    def _remove(self, leaf_id):
+        leaf = self._leaves.pop(leaf_id, None)
+        if leaf is None:
+            return
+        for key in self._leaf_keys(leaf):
+            idx = bisect_left(self._keys, (key, leaf_id))
+            if idx < len(self._keys) and self._keys[idx] == (key, leaf_id):
+                del self._keys[idx]
+        self._text = None
+
+    def _load(self, rows, incremental):
+        parents = set()
+        for leaf_id, type_id, deleted, name, path, parent, alias, has_alias in rows:
+            self._labels[leaf_id] = _label(name, alias)
+            if type_id != self.type_id or deleted:
+                continue
+            path = str(path)
+            leaf = _IndexedLeaf(name, path.lower(), path.count(".") + 1, parent, has_alias, alias)
+            self._leaves[leaf_id] = leaf
+            for key in self._leaf_keys(leaf):
+                if incremental:
+                    insort(self._keys, (key, leaf_id))
+                else:
+                    self._keys.append((key, leaf_id))
+            if parent is not None:
+                parents.add(parent)
+        self._text = None
+
+        # Resolve labels of parents outside of this index, such as deleted leaves.
+        missing = parents - self._labels.keys()
+        if missing:
+            for leaf_id, _, _, name, _, _, alias, _ in _leaf_rows(
+                Leaf.objects.filter(pk__in=missing)
+            ):
+                self._labels[leaf_id] = _label(name, alias)
+
+    def _build(self):
+        self._leaves = {}
+        self._labels = {}
+        self._keys = []
+        self._load(
+            _leaf_rows(Leaf.objects.filter(type=self.type_id, deleted=False)).iterator(), False
+        )
+        self._keys.sort()
+        logger.info(f"Built suggestion index of {len(self._leaves)} leaves of type {self.type_id}")
+
+    def _update(self, leaf_ids):
+        for leaf_id in leaf_ids:
+            self._remove(leaf_id)
+        self._load(_leaf_rows(Leaf.objects.filter(pk__in=leaf_ids)), True)
+
+    def sync(self):
+        """Applies leaf changes recorded since the index was last synced, rebuilding the index
+        if they are no longer available.
+        """
+        cache = TatorCache()
+        version = cache.get_leaf_version(self.type_id)
+        if version == self.version:
+            return
+        with self._lock:
+            if self.version is not None:
+                if self.version == version:
+                    return
+                if self.version < version:
+                    leaf_ids = cache.get_leaf_changes(self.type_id, self.version + 1, version)
+                    if leaf_ids is not None:
+                        self._update(leaf_ids)
+                        self.version = version
+                        return
+            self._build()
+            self.version = version
+
+    def _packed(self):
+        if self._text is None:
+            offsets = []
+            offset = 0
+            for key, _ in self._keys:
+                offsets.append(offset)
+                offset += len(key) + 1
+            self._offsets = offsets
+            self._text = _SEPARATOR.join(key for key, _ in self._keys) + _SEPARATOR
+        return self._text, self._offsets
+
+    def _prefixed(self, prefix):
+        """Returns the entries whose keys start with the prefix."""
+        entries = []
+        for idx in range(bisect_left(self._keys, (prefix,)), len(self._keys)):
+            if not self._keys[idx][0].startswith(prefix):
+                break
+            entries.append(self._keys[idx])
+        return entries
+
+    def _containing(self, needle):
+        """Returns the entries whose keys, each followed by a separator, contain the needle."""
+        text, offsets = self._packed()
+        entries = []
+        pos = text.find(needle)
+        while pos >= 0:
+            idx = bisect_right(offsets, pos) - 1
+            entries.append(self._keys[idx])
+            if idx + 1 == len(offsets):
+                break
+            pos = text.find(needle, offsets[idx + 1])
+        return entries
+
+    def _match(self, query):
+        """Returns IDs of leaves with a name or alias matching the query. Without wildcards the
+        query is a prefix. With wildcards the first component is a prefix, the last a suffix and
+        any others must be contained in the key.
+        """
+        if "*" not in query:
+            return {leaf_id for _, leaf_id in self._prefixed(query)}
+        components = query.split("*")
+        prefix, suffix = components[0], components[-1]
+        middle = [component for component in components[1:-1] if component]
+
+        # Take candidates from the most selective component, then check the others.
+        if prefix:
+            entries = self._prefixed(prefix)
+        elif middle or suffix:
+            needle = max(middle, key=len) if middle else ""
+            if len(suffix) >= len(needle):
+                needle = suffix + _SEPARATOR
+            entries = self._containing(needle)
+        else:
+            entries = self._keys
+        return {
+            leaf_id
+            for key, leaf_id in entries
+            if key.startswith(prefix)
+            and key.endswith(suffix)
+            and all(component in key for component in middle)
+        }
+
+    def suggest(self, query, ancestor, min_level):
+        """Returns suggestions for leaves under the ancestor path and at or below the minimum
+        level, grouped by the labels of their parents.
+        """
+        ancestor_path = ancestor.lower()
+        suggestions = []
+        with self._lock:
+            for leaf_id in self._match(query.lower()):
+                leaf = self._leaves[leaf_id]
+                if leaf.depth < min_level or not leaf.path.startswith(ancestor_path):
+                    continue
+                group = ancestor
+                if leaf.parent is not None:
+                    group = self._labels.get(leaf.parent, ancestor)
+                suggestion = {"value": leaf.name, "group": group, "data": {}}
+                if leaf.has_alias:
+                    suggestion["data"]["alias"] = leaf.alias
+                suggestions.append(suggestion)
+        suggestions.sort(key=lambda suggestion: (suggestion["group"], suggestion["value"]))
+        return suggestions
+
+
+def get_leaf_index(type_id):
+    """Returns the up to date suggestion index of a leaf type, building it on first use."""
+    with _indexes_lock:
+        index = _indexes.get(type_id)
+        if index is None:
+            index = _indexes[type_id] = LeafIndex(type_id)
+    index.sync()
+    return index
+
+
+def get_ancestor_type(project, ancestor):
+    """Returns the leaf type of the leaf at the given path, or None if there is no such leaf.
+    Types are cached along with the leaf version of the type, as moving or deleting the leaf
+    records a change of its type.
+    """
+    key = (project, ancestor)
+    cache = TatorCache()
+    cached = _ancestor_types.get(key)
+    if cached is not None and cache.get_leaf_version(cached[0]) == cached[1]:
+        return cached[0]
+    type_id = Leaf.objects.filter(project=project, path=ancestor).values_list("type", flat=True)
+    type_id = type_id.first()
+    if type_id is None:
+        _ancestor_types.pop(key, None)
+        return None
+    if len(_ancestor_types) >= _ANCESTOR_TYPES_MAX_SIZE:
+        _ancestor_types.clear()
+    _ancestor_types[key] = (type_id, cache.get_leaf_version(type_id))
+    return type_id
+
+
+def record_leaf_changes(leaf_ids):
+    """Records changes of leaves made with bulk queries, which do not send model signals, once
+    the current transaction commits.
+    """
+    leaf_ids = list(leaf_ids)
+
+    def _push():
+        ids_by_type = defaultdict(list)
+        for type_id, leaf_id in Leaf.objects.filter(pk__in=leaf_ids).values_list("type", "id"):
+            if type_id is not None:
+                ids_by_type[type_id].append(leaf_id)
+        cache = TatorCache()
+        for type_id, ids in ids_by_type.items():
+            cache.push_leaf_changes(type_id, ids)
+
+    if leaf_ids:
+        transaction.on_commit(_push)
@@ -12,9 +12,12 @@ from ..models import Leaf, LeafType
 from ._attribute_query import (
     get_attribute_filter_ops,
     get_attribute_psql_queryset,
+    get_attribute_psql_queryset_from_query_obj,
     supplied_name_to_field,
 )
 
+from ._util import cursor_paginate
+
 logger = logging.getLogger(__name__)
 
 
@@ -73,12 +76,12 @@ def _get_leaf_psql_queryset(project, filter_ops, params):
             qs = sub_qs
 
     if params.get("object_search"):
-        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"))
+        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"), project)
 
     # Used by GET queries
     if params.get("encoded_search"):
         search_obj = json.loads(base64.b64decode(params.get("encoded_search")).decode())
-        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj)
+        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj, project)
 
     if params.get("sort_by", None):
         sortables = [supplied_name_to_field(x) for x in params.get("sort_by")]
@@ -86,7 +89,9 @@ def _get_leaf_psql_queryset(project, filter_ops, params):
     else:
         qs = qs.order_by("id")
 
-    if start is not None and stop is not None:
+    if params.get("page_size") is not None:
+        qs = cursor_paginate(qs, params)
+    elif start is not None and stop is not None:
         qs = qs[start:stop]
     elif start is not None:
         qs = qs[start:]
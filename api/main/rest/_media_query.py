@@ -19,10 +19,13 @@ from ._attribute_query import (
     get_attribute_filter_ops,
     get_attribute_psql_queryset,
     get_attribute_psql_queryset_from_query_obj,
+    get_attribute_psql_queryset_multi_type,
     supplied_name_to_field,
     _look_for_section_uuid,
 )
 
+from ._util import cursor_paginate
+
 logger = logging.getLogger(__name__)
 
 
@@ -124,23 +127,9 @@ def _get_media_psql_queryset(project, filter_ops, params):
         )
         qs = qs.filter(type=filter_type)
     elif filter_ops or params.get("float_array", None):
-        queries = []
-        for entity_type in MediaType.objects.filter(project=project):
-            sub_qs = get_attribute_psql_queryset(entity_type, qs, params, filter_ops)
-            if sub_qs:
-                queries.append(sub_qs.filter(type=entity_type))
-            else:
-                queries.append(qs.filter(pk=-1))  # no matches
-        logger.info(f"Joining {len(queries)} queries together.")
-
-        sub_qs = queries.pop()
-        if queries:
-            query = Q(pk__in=sub_qs)
-            for r in queries:
-                query = query | Q(pk__in=r)
-            qs = qs.filter(query)
-        else:
-            qs = sub_qs
+        qs = get_attribute_psql_queryset_multi_type(
+            list(MediaType.objects.filter(project=project)), qs, params, filter_ops
+        )
 
     # Do a related query
     logger.info(params)
@@ -193,7 +182,7 @@ def _get_media_psql_queryset(project, filter_ops, params):
             qs = _look_for_section_uuid(qs, section_uuid)
 
         if section[0].object_search:
-            qs = get_attribute_psql_queryset_from_query_obj(qs, section[0].object_search)
+            qs = get_attribute_psql_queryset_from_query_obj(qs, section[0].object_search, project)
 
         if section[0].related_object_search:
             qs = _related_search(
@@ -217,7 +206,9 @@ def _get_media_psql_queryset(project, filter_ops, params):
                 match_qs = _look_for_section_uuid(qs, section_uuid)
 
             if section.object_search:
-                match_qs = get_attribute_psql_queryset_from_query_obj(qs, section[0].object_search)
+                match_qs = get_attribute_psql_queryset_from_query_obj(
+                    qs, section.object_search, project
+                )
 
             if section.related_object_search:
                 match_qs = _related_search(
@@ -251,10 +242,10 @@ def _get_media_psql_queryset(project, filter_ops, params):
     # Used by GET queries
     if params.get("encoded_search"):
         search_obj = json.loads(base64.b64decode(params.get("encoded_search")).decode())
-        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj)
+        qs = get_attribute_psql_queryset_from_query_obj(qs, search_obj, project)
 
     if params.get("object_search"):
-        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"))
+        qs = get_attribute_psql_queryset_from_query_obj(qs, params.get("object_search"), project)
 
     if params.get("sort_by", None):
         sortables = [supplied_name_to_field(x) for x in params.get("sort_by")]
@@ -262,10 +253,13 @@ def _get_media_psql_queryset(project, filter_ops, params):
     else:
         qs = qs.order_by("name", "id")
 
-    if stop is not None:
-        qs = qs[:stop]
-    if start is not None:
-        qs = qs[start:]
+    if params.get("page_size") is not None:
+        qs = cursor_paginate(qs, params)
+    else:
+        if stop is not None:
+            qs = qs[:stop]
+        if start is not None:
+            qs = qs[start:]
 
     logger.info(qs.query)
     logger.info(qs.explain())
@@ -1,22 +1,244 @@
 """ TODO: add documentation for this """
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import logging
 import os
 import json
 import subprocess
 import math
 import io
+import tempfile
 import textwrap
+import threading
 import mmap
 import sys
 
 from PIL import Image, ImageDraw, ImageFont
 from django.conf import settings
 
+from tator_online.middleware import statsd
+
+from ..segment_index import SegmentIndex
 from ..store import get_storage_lookup
 from ..models import Resource
 
 logger = logging.getLogger(__name__)
 
+# Bounds of the parsed segment info cache in memory and of the segment and rendered frame
+# caches on disk, in bytes.
+SEGMENT_INFO_CACHE_BYTES = int(os.getenv("SEGMENT_INFO_CACHE_BYTES", 64 * 1024 * 1024))
+SEGMENT_CACHE_BYTES = int(os.getenv("SEGMENT_CACHE_BYTES", 2 * 1024 * 1024 * 1024))
+FRAME_CACHE_BYTES = int(os.getenv("FRAME_CACHE_BYTES", 1024 * 1024 * 1024))
+# Number of frame decodes run concurrently by each process.
+DECODER_WORKERS = int(os.getenv("DECODER_WORKERS", os.cpu_count() or 1))
+# Segments separated by at most this many bytes are read with one byte range request, up to
+# requests of MAX_RANGE_BYTES, and up to FETCH_WORKERS requests are run concurrently.
+RANGE_COALESCE_GAP = int(os.getenv("RANGE_COALESCE_GAP", 256 * 1024))
+MAX_RANGE_BYTES = int(os.getenv("MAX_RANGE_BYTES", 32 * 1024 * 1024))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 8))
+MEDIA_CACHE_DIR = os.getenv(
+    "MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tator_media_cache")
+)
+
+_cache_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+
+def _record_lookup(tier, hit):
+    _cache_stats[tier]["hits" if hit else "misses"] += 1
+    statsd.increment(
+        "media_cache_lookups",
+        tags=["service:tator", f"tier:{tier}", f"result:{'hit' if hit else 'miss'}"],
+    )
+
+
+def get_media_cache_stats():
+    """Returns the hits, misses and hit rate of each media cache tier in this process."""
+    stats = {}
+    for tier, counts in _cache_stats.items():
+        lookups = counts["hits"] + counts["misses"]
+        stats[tier] = {**counts, "hit_rate": counts["hits"] / lookups if lookups else 0.0}
+    return stats
+
+
+class _MemoryCache:
+    """LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes):
+        self._max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def put(self, key, value, size):
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._size -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self._size += size
+            while self._size > self._max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._size -= evicted_size
+
+
+class _DiskCache:
+    """Content addressed files bounded by their total size, evicting the least recently used.
+
+    The directory may be shared by several processes, so each process tracks the size it
+    has added and rescans the directory when that estimate exceeds the bound.
+    """
+
+    def __init__(self, name, max_bytes):
+        self._dir = os.path.join(MEDIA_CACHE_DIR, name)
+        self._max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self._dir, digest[:2], digest)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                data = cache_file.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key, data):
+        if len(data) > self._max_bytes:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as cache_file:
+                cache_file.write(data)
+            os.replace(temp_path, path)
+            with self._lock:
+                # The first write of a process scans the directory for its actual size.
+                if self._size is None:
+                    self._size = self._max_bytes
+                self._size += len(data)
+                if self._size > self._max_bytes:
+                    self._evict()
+        except OSError:
+            logger.warning(f"Failed to write {path} to media cache", exc_info=True)
+
+    def _evict(self):
+        entries = []
+        for subdir in os.scandir(self._dir):
+            if subdir.is_dir():
+                for entry in os.scandir(subdir.path):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(entry[1] for entry in entries)
+
+        # Evict down to 80% of the bound so eviction does not run on every write.
+        entries.sort()
+        for _, entry_size, path in entries:
+            if size <= 0.8 * self._max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+
+def _decode_and_encode(video_path, width, height, indices, force_scale, render_format):
+    """Decodes frames of a video in one pass and encodes crops of them as images.
+
+    :param indices: Dict of frame index in the video to list of (crop, output path), where
+                    crop is None or (width, height, x, y) in pixels.
+    """
+    ordered = sorted(indices)
+    select = "+".join(f"eq(n,{index})" for index in ordered)
+    args = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-i",
+        video_path,
+        "-vf",
+        f"select='{select}',scale={width}:{height}",
+        "-vsync",
+        "0",
+        "-frames:v",
+        str(len(ordered)),
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        "rgb24",
+        "pipe:1",
+    ]
+    frame_size = width * height * 3
+    with subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as proc:
+        for index in ordered:
+            data = proc.stdout.read(frame_size)
+            if len(data) != frame_size:
+                proc.kill()
+                raise RuntimeError(f"Failed to decode frame {index} of {video_path}!")
+            img = Image.frombuffer("RGB", (width, height), data, "raw", "RGB", 0, 1)
+            for crop, output in indices[index]:
+                out = img
+                if crop:
+                    w, h, x, y = crop  # pylint: disable=invalid-name
+                    out = out.crop((x, y, x + w, y + h))
+                if force_scale:
+                    out = out.resize(force_scale)
+                if render_format == "jpg":
+                    out.save(output, "jpeg", quality=90)
+                else:
+                    out.save(output, render_format)
+        stderr = proc.stderr.read()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, args, stderr=stderr)
+
+
+def _plan_ranges(segments, max_gap=RANGE_COALESCE_GAP, max_size=MAX_RANGE_BYTES):
+    """Combines byte ranges of segments that overlap, touch or are separated by at most
+    `max_gap` bytes into as few ranges as possible, each no larger than `max_size` unless a
+    single segment is.
+
+    :param segments: Iterable of (offset, size) of each segment.
+    :returns: Sorted list of inclusive (start, stop) byte ranges.
+    """
+    ranges = []
+    for offset, size in sorted(set(segments)):
+        if size <= 0:
+            continue
+        stop = offset + size - 1
+        if ranges and offset <= ranges[-1][1] + 1 + max_gap and stop - ranges[-1][0] < max_size:
+            ranges[-1][1] = max(ranges[-1][1], stop)
+        else:
+            ranges.append([offset, stop])
+    return [tuple(byte_range) for byte_range in ranges]
+
+
+_segment_info_cache = _MemoryCache(SEGMENT_INFO_CACHE_BYTES)
+_segment_cache = _DiskCache("segments", SEGMENT_CACHE_BYTES)
+_frame_cache = _DiskCache("frames", FRAME_CACHE_BYTES)
+_decoder_pool = ThreadPoolExecutor(max_workers=DECODER_WORKERS)
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+
 
 class MediaUtil:
     """TODO: add documentation for this"""
@@ -25,7 +247,7 @@ class MediaUtil:
         self._temp_dir = temp_dir
         # If available we only attempt to fetch
         # the part of the file we need to
-        self._segment_info = None
+        self._segment_index = None
         resources = Resource.objects.filter(media__in=[video])
         store_lookup = get_storage_lookup(resources)
 
@@ -55,18 +277,12 @@ class MediaUtil:
                 self._storage = store_lookup[self._video_file]
                 self._height = video.media_files["streaming"][quality_idx]["resolution"][0]
                 self._width = video.media_files["streaming"][quality_idx]["resolution"][1]
-                segment_file = video.media_files["streaming"][quality_idx]["segment_info"]
-                f_p = io.BytesIO()
-                self._storage.download_fileobj(segment_file, f_p)
-                self._segment_info = json.loads(f_p.getvalue().decode("utf-8"))
-                self._moof_data = [
-                    (i, x)
-                    for i, x in enumerate(self._segment_info["segments"])
-                    if x["name"] == "moof"
-                ]
+                self._segment_index = self._load_segment_index(
+                    video.media_files["streaming"][quality_idx]
+                )
                 self._start_bias_frame = 0
-                if self._moof_data[0][1]["frame_start"] > 0:
-                    self._start_bias_frame = self._moof_data[0][1]["frame_start"]
+                if self._segment_index.moof_frame_start[0] > 0:
+                    self._start_bias_frame = self._segment_index.moof_frame_start[0]
 
         elif "image" in video.media_files:
             # Select highest quality image that is non AVIF (no ffmpeg support)
@@ -89,57 +305,64 @@ class MediaUtil:
             raise RuntimeError(f"Media {video.id} does not have streaming or image media!")
         self._fps = video.fps
 
+    def _load_segment_index(self, media_def):
+        """Returns the segment index of a streaming file, downloading its binary index if it
+        has one and parsing its segment info json otherwise.
+        """
+        segment_file = media_def["segment_info"]
+        index_file = media_def.get("segment_index")
+        key = index_file or segment_file
+        segment_index = _segment_info_cache.get(key)
+        _record_lookup("segment_info", segment_index is not None)
+        if segment_index is not None:
+            return segment_index
+        if index_file:
+            try:
+                f_p = io.BytesIO()
+                self._storage.download_fileobj(index_file, f_p)
+                segment_index = SegmentIndex(f_p.getvalue())
+            except Exception:  # pylint: disable=broad-except
+                logger.warning(f"Failed to load {index_file}, using {segment_file}", exc_info=True)
+        if segment_index is None:
+            f_p = io.BytesIO()
+            self._storage.download_fileobj(segment_file, f_p)
+            segment_index = SegmentIndex.from_segment_info(json.loads(f_p.getvalue()))
+        _segment_info_cache.put(key, segment_index, segment_index.nbytes)
+        return segment_index
+
     def _get_impacted_segments(self, frames):
-        """TODO: add documentation for this"""
-        if self._segment_info is None and self._external_fetch != None:
+        """Returns the segments needed to decode each frame as a list of (frame, segment
+        positions), skipping frames past the end of the video. The init segments are always
+        included, as is the next moof for frames close to the end of their moof.
+        """
+        if self._segment_index is None and self._external_fetch != None:
             return None
 
+        index = self._segment_index
         segment_list = []
         for frame_str in frames:
-            frame_seg = set()
-            frame_seg.add(0)
-            frame_seg.add(1)
+            frame_seg = {0, 1}
             # We already load the header so ignore those segments
             frame = int(frame_str)
-            min_idx = 0
-            max_idx = len(self._moof_data) - 1
             # Handle frames and files with frame biases
-            if frame < self._moof_data[0][1]["frame_start"]:
+            if frame < index.moof_frame_start[0]:
                 # Force add the first two segments and all the data in between
-                frame_seg.add(self._moof_data[0][0])
-                for data_idx in range(self._moof_data[0][0] + 1, self._moof_data[1][0], 1):
-                    frame_seg.add(data_idx)
-                frame_seg.add(self._moof_data[1][0])
-                frame_seg = list(frame_seg)
-                frame_seg.sort()
-                segment_list.append((frame, frame_seg))
+                frame_seg.update(range(index.moof_segment[0], index.moof_segment[1] + 1))
+                segment_list.append((frame, sorted(frame_seg)))
                 continue
 
-            last_segment = self._moof_data[max_idx][1]  # Frame start/stop is in the moof
-            if frame >= last_segment["frame_start"] + last_segment["frame_samples"]:
+            moof_idx = index.find_moof(frame)
+            if moof_idx is None:
                 continue
-
-            # Do a binary search for the segment in question
-            while min_idx <= max_idx:
-                guess_idx = math.floor((max_idx + min_idx) / 2)
-                moof = self._moof_data[guess_idx][1]
-                if frame < moof["frame_start"]:
-                    max_idx = max_idx - 1
-                elif frame >= moof["frame_start"] + moof["frame_samples"]:
-                    min_idx = min_idx + 1
-                else:
-                    frame_seg.add(self._moof_data[guess_idx][0])
-                    frame_seg.add(self._moof_data[guess_idx][0] + 1)
-                    if frame - moof["frame_start"] > moof["frame_samples"] - 5:
-                        # Handle boundary conditions
-                        if guess_idx + 1 in self._moof_data:
-                            frame_seg.add(self._moof_data[guess_idx + 1][0])
-                            frame_seg.add(self._moof_data[guess_idx + 1][0] + 1)
-                    break
-
-            frame_seg = list(frame_seg)
-            frame_seg.sort()
-            segment_list.append((frame, frame_seg))
+            moof_segment = index.moof_segment[moof_idx]
+            frame_seg.update((moof_segment, moof_segment + 1))
+            if frame - index.moof_frame_start[moof_idx] > index.moof_frame_samples[moof_idx] - 5:
+                # Handle boundary conditions
+                if moof_idx + 1 < index.num_moofs:
+                    next_segment = index.moof_segment[moof_idx + 1]
+                    frame_seg.update((next_segment, next_segment + 1))
+
+            segment_list.append((frame, sorted(frame_seg)))
         logger.info(f"Given {frames}, we need {segment_list}")
         return segment_list
 
@@ -168,18 +391,19 @@ class MediaUtil:
 
     def make_temporary_videos(self, segment_list):
         """Return a temporary mp4 for each impacted segment to limit IO to
-        cloud storage"""
+        cloud storage. Segments shared by several temporary videos, such as the
+        header, are read once."""
+        index = self._segment_index
+        segment_data = self._get_segments(
+            {segment_idx for _, segments in segment_list for segment_idx in segments}
+        )
         lookup = {}
         segment_info = []
         for frame, segments in segment_list:
             temp_video = os.path.join(self._temp_dir, f"{frame}.mp4")
-            preferred_block_size = 16 * 1024
-            sc_graph = [(0, 0)]
             segment_frame_start = sys.maxsize
-            # create a scatter/gather
             for segment_idx in segments:
-                segment = self._segment_info["segments"][segment_idx]
-                last_io = sc_graph[len(sc_graph) - 1]
+                segment = index.segment(segment_idx)
                 if segment.get("frame_start", sys.maxsize) < segment_frame_start:
                     segment_frame_start = segment["frame_start"]
 
@@ -191,27 +415,74 @@ class MediaUtil:
                         }
                     )
 
-                if last_io[0] + last_io[1] == segment["offset"]:
-                    # merge contigous blocks
-                    sc_graph[len(sc_graph) - 1] = (last_io[0], last_io[1] + segment["size"])
-                else:
-                    # A new block
-                    sc_graph.append((segment["offset"], segment["size"]))
-
             if segment_frame_start == sys.maxsize:
                 segment_frame_start = frame
             lookup[frame] = (segment_frame_start, temp_video)
 
-            logger.info(f"Scatter gather graph = {sc_graph}")
             with open(temp_video, "wb") as out_fp:
-                for scatter in sc_graph:
-                    start = scatter[0]
-                    stop = scatter[0] + scatter[1] - 1  # Byte range is inclusive
-                    body = self._storage.get_object(self._video_file, start=start, stop=stop)
-                    out_fp.write(body)
+                for segment_idx in segments:
+                    out_fp.write(segment_data[segment_idx])
 
         return lookup, segment_info
 
+    def _get_segments(self, segment_idxs):
+        """Returns the bytes of segments of the video file by position. Segments missing from
+        the segment cache are read with byte ranges planned by `_plan_ranges`, issued
+        concurrently.
+        """
+        index = self._segment_index
+        segment_data = {}
+        missing = []
+        for segment_idx in segment_idxs:
+            if index.size[segment_idx] == 0:
+                segment_data[segment_idx] = b""
+                continue
+            key = (self._video_file, index.offset[segment_idx], index.size[segment_idx])
+            body = _segment_cache.get(key)
+            _record_lookup("segment", body is not None)
+            if body is None:
+                missing.append((index.offset[segment_idx], index.size[segment_idx], segment_idx))
+            else:
+                segment_data[segment_idx] = body
+        if not missing:
+            return segment_data
+
+        ranges = _plan_ranges((offset, size) for offset, size, _ in missing)
+        logger.info(f"Reading {len(missing)} segments with byte ranges {ranges}")
+        bodies = _fetch_pool.map(
+            lambda byte_range: self._storage.get_object(
+                self._video_file, start=byte_range[0], stop=byte_range[1]
+            ),
+            ranges,
+        )
+        missing.sort()
+        pos = 0
+        for (start, stop), body in zip(ranges, bodies):
+            if len(body) != stop - start + 1:
+                raise RuntimeError(f"Failed to read bytes {start}-{stop} of {self._video_file}!")
+            while pos < len(missing) and missing[pos][0] <= stop:
+                offset, size, segment_idx = missing[pos]
+                data = body[offset - start : offset - start + size]
+                segment_data[segment_idx] = data
+                _segment_cache.put((self._video_file, offset, size), data)
+                pos += 1
+        return segment_data
+
+    def _get_cached_frame(self, key, output):
+        """Writes a rendered frame from the frame cache to the output path, returning whether
+        it was cached.
+        """
+        data = _frame_cache.get(key)
+        _record_lookup("frame", data is not None)
+        if data is not None:
+            with open(output, "wb") as output_file:
+                output_file.write(data)
+        return data is not None
+
+    def _put_cached_frame(self, key, output):
+        with open(output, "rb") as output_file:
+            _frame_cache.put(key, output_file.read())
+
     def _frame_to_time_str(self, frame, relative_to=None):
         """TODO: add documentation for this"""
         if relative_to:
@@ -227,88 +498,148 @@ class MediaUtil:
         seconds = total_seconds % 60
         return f"{hours}:{minutes}:{seconds}"
 
-    def _generate_frame_images(self, frames, rois=None, render_format="jpg", force_scale=None):
-        """Generate a jpg for each requested frame and store in the working directory"""
+    def _crop_box(self, roi):
+        """Converts a relative (width, height, x, y) roi into pixels."""
+        w = max(0, min(round(roi[0] * self._width), self._width))  # pylint: disable=invalid-name
+        h = max(0, min(round(roi[1] * self._height), self._height))  # pylint: disable=invalid-name
+        x = max(0, min(round(roi[2] * self._width), self._width))  # pylint: disable=invalid-name
+        y = max(0, min(round(roi[3] * self._height), self._height))  # pylint: disable=invalid-name
+        return w, h, x, y
+
+    def _generate_frame_images(
+        self, frames, rois=None, render_format="jpg", force_scale=None, pooled=True, use_cache=True
+    ):
+        """Generate a jpg for each requested frame and store in the working directory
+
+        :param pooled: Whether to decode segmented mp4 frames on the decoder pool instead of
+                       with one ffmpeg input per frame.
+        :param use_cache: Whether to use the frame cache.
+        """
         BATCH_SIZE = 30
         frame_idx = 0
         procs = []
+        crops = [self._crop_box(roi) for roi in rois] if rois else None
         for idx in range(0, len(frames), BATCH_SIZE):
             batch = [int(frame) for frame in frames[idx : idx + BATCH_SIZE]]
-            crop_filter = None
-            if rois:
-                crop_filter = []
-                for c in rois:  # pylint: disable=invalid-name
-                    w = max(
-                        0, min(round(c[0] * self._width), self._width)
-                    )  # pylint: disable=invalid-name
-                    h = max(
-                        0, min(round(c[1] * self._height), self._height)
-                    )  # pylint: disable=invalid-name
-                    x = max(
-                        0, min(round(c[2] * self._width), self._width)
-                    )  # pylint: disable=invalid-name
-                    y = max(
-                        0, min(round(c[3] * self._height), self._height)
-                    )  # pylint: disable=invalid-name
-                    crop_filter.append(f"crop={w}:{h}:{x}:{y}")
-            scale_filter = None
-            if force_scale:
-                scale_w = force_scale[0]
-                scale_h = force_scale[1]
-                scale_filter = f"scale={scale_w}:{scale_h}"
-
             logger.info(f"Processing {self._video_file}")
-            args = ["ffmpeg"]
-            inputs = []
-            outputs = []
 
-            # attempt to make a temporary file in a fast manner to speed up AWS access
-            impacted_segments = self._get_impacted_segments(batch)
-            lookup = {}
-            if impacted_segments:
-                lookup, _ = self.make_temporary_videos(impacted_segments)
-
-            for batch_idx, frame in enumerate(batch):
-                outputs.extend(["-map", f"{batch_idx}:v", "-frames:v", "1", "-q:v", "3"])
+            # Frames rendered before are served from the frame cache.
+            to_render = []
+            for frame in batch:
+                crop = crops[frame_idx] if crops else None
                 video_filters = []
-                if crop_filter:
-                    video_filters.append(crop_filter[frame_idx])
-                if scale_filter:
-                    video_filters.append(scale_filter)
-                if video_filters:
-                    outputs.extend(["-vf", ",".join(video_filters)])
-
-                outputs.append(os.path.join(self._temp_dir, f"{frame_idx}.{render_format}"))
-                if frame in lookup:
-                    inputs.extend(
-                        [
-                            "-ss",
-                            self._frame_to_time_str(frame, lookup[frame][0]),
-                            "-i",
-                            lookup[frame][1],
-                        ]
-                    )
-                elif self._external_fetch == "hls":
-                    inputs.extend(
-                        [
-                            "-ss",
-                            self._frame_to_time_str(frame, None),
-                            "-f",
-                            "hls",
-                            "-i",
-                            self._video_file,
-                        ]
-                    )
-                else:
-                    raise ValueError("Failed to find frame {frame} in segmented mp4!")
+                if crop:
+                    video_filters.append("crop={}:{}:{}:{}".format(*crop))
+                if force_scale:
+                    video_filters.append(f"scale={force_scale[0]}:{force_scale[1]}")
+                output = os.path.join(self._temp_dir, f"{frame_idx}.{render_format}")
+                key = (self._video_file, frame, tuple(video_filters), render_format)
+                if not (use_cache and self._get_cached_frame(key, output)):
+                    to_render.append((frame, crop, video_filters, output, key))
                 frame_idx += 1
+            if not to_render:
+                continue
 
-            # Now add all the cmds in
-            args.extend(inputs)
-            args.extend(outputs)
-            logger.info(args)
-            procs.append(subprocess.run(args, check=True, capture_output=True))
-        return any([proc.returncode == 0 for proc in procs])
+            if pooled and self._segment_index is not None:
+                self._decode_frame_images(to_render, force_scale, render_format)
+            else:
+                procs.append(self._ffmpeg_frame_images(to_render))
+            if use_cache:
+                for *_, output, key in to_render:
+                    self._put_cached_frame(key, output)
+        return not procs or any([proc.returncode == 0 for proc in procs])
+
+    def _ffmpeg_frame_images(self, to_render):
+        """Renders frames with one ffmpeg process that seeks to each frame in its own input."""
+        args = ["ffmpeg"]
+        inputs = []
+        outputs = []
+
+        # attempt to make a temporary file in a fast manner to speed up AWS access
+        impacted_segments = self._get_impacted_segments([frame for frame, *_ in to_render])
+        lookup = {}
+        if impacted_segments:
+            lookup, _ = self.make_temporary_videos(impacted_segments)
+
+        for batch_idx, (frame, _, video_filters, output, _) in enumerate(to_render):
+            outputs.extend(["-map", f"{batch_idx}:v", "-frames:v", "1", "-q:v", "3"])
+            if video_filters:
+                outputs.extend(["-vf", ",".join(video_filters)])
+
+            outputs.append(output)
+            if frame in lookup:
+                inputs.extend(
+                    [
+                        "-ss",
+                        self._frame_to_time_str(frame, lookup[frame][0]),
+                        "-i",
+                        lookup[frame][1],
+                    ]
+                )
+            elif self._external_fetch == "hls":
+                inputs.extend(
+                    [
+                        "-ss",
+                        self._frame_to_time_str(frame, None),
+                        "-f",
+                        "hls",
+                        "-i",
+                        self._video_file,
+                    ]
+                )
+            else:
+                raise ValueError("Failed to find frame {frame} in segmented mp4!")
+
+        # Now add all the cmds in
+        args.extend(inputs)
+        args.extend(outputs)
+        logger.info(args)
+        return subprocess.run(args, check=True, capture_output=True)
+
+    def _decode_frame_images(self, to_render, force_scale, render_format):
+        """Renders frames by decoding each temporary segment video once on the decoder pool,
+        cropping, scaling and encoding the raw frames with PIL.
+        """
+        frames = sorted({frame for frame, *_ in to_render})
+        impacted_segments = self._get_impacted_segments(frames)
+        found = {frame for frame, _ in impacted_segments}
+        for frame in frames:
+            if frame not in found:
+                raise ValueError(f"Failed to find frame {frame} in segmented mp4!")
+
+        # Frames that need the same segments share a temporary video.
+        groups = defaultdict(list)
+        for frame, segments in impacted_segments:
+            groups[tuple(segments)].append(frame)
+        lookup, _ = self.make_temporary_videos(
+            [(group[0], list(segments)) for segments, group in groups.items()]
+        )
+
+        renders = defaultdict(list)
+        for frame, crop, _, output, _ in to_render:
+            renders[frame].append((crop, output))
+        futures = []
+        for group in groups.values():
+            segment_frame_start, temp_video = lookup[group[0]]
+            indices = {}
+            for frame in group:
+                index = frame - segment_frame_start
+                if index < 0:
+                    index += self._start_bias_frame
+                indices.setdefault(index, []).extend(renders[frame])
+            futures.append(
+                _decoder_pool.submit(
+                    _decode_and_encode,
+                    temp_video,
+                    self._width,
+                    self._height,
+                    indices,
+                    force_scale,
+                    render_format,
+                )
+            )
+        for future in futures:
+            future.result()
 
     def get_image(self, roi=None, render_format="jpg", force_scale=None):
         crop_filter = None
@@ -330,18 +661,23 @@ class MediaUtil:
         if force_scale:
             scale_filter = f"scale={force_scale[0]}:{force_scale[1]}"
 
-        args = ["ffmpeg", "-i", self._storage.get_download_url(self._video_file, 3600)]
         video_filters = []
         if crop_filter:
             video_filters.append(crop_filter)
         if scale_filter:
             video_filters.append(scale_filter)
+        output = os.path.join(self._temp_dir, f"temp.{render_format}")
+        key = (self._video_file, 0, tuple(video_filters), render_format)
+        if self._get_cached_frame(key, output):
+            return output
+
+        args = ["ffmpeg", "-i", self._storage.get_download_url(self._video_file, 3600)]
         if video_filters:
             args.extend(["-vf", ",".join(video_filters)])
-        output = os.path.join(self._temp_dir, f"temp.{render_format}")
         args.append(output)
         proc = subprocess.run(args, check=True, capture_output=True)
         if proc.returncode == 0:
+            self._put_cached_frame(key, output)
             return output
         else:
             return None
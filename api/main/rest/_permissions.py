@@ -37,14 +37,39 @@ def _for_schema_view(request, view):
     )
 
 
+_PERMISSION_VALUES = {permission.value for permission in Permission}
+
+
+def membership_permission(user_id, project_id):
+    """Returns the permission level of a user's membership in a project, or None if the
+    user is not a member. Levels are cached and invalidated when memberships change.
+    """
+    cache = TatorCache()
+    val = cache.get_cred_cache(user_id, project_id)
+    if val is None or (val and val not in _PERMISSION_VALUES):
+        version = cache.get_cred_version(project_id)
+        permission = (
+            Membership.objects.filter(user=user_id, project=project_id)
+            .values_list("permission", flat=True)
+            .first()
+        )
+        val = "" if permission is None else Permission(permission).value
+        cache.set_cred_cache(user_id, project_id, val, version)
+    return Permission(val) if val else None
+
+
 class ProjectPermissionBase(BasePermission):
     """Base class for requiring project permissions."""
 
     def has_permission(self, request, view):
         # Get the project from the URL parameters
         if "project" in view.kwargs:
-            project_id = view.kwargs["project"]
-            project = get_object_or_404(Project, pk=int(project_id))
+            project_id = int(view.kwargs["project"])
+            # Memberships only exist for existing projects, so the project is only
+            # fetched to distinguish a missing project from denied access.
+            if self._validate_project_id(request, project_id):
+                return True
+            project = get_object_or_404(Project, pk=project_id)
         elif "id" in view.kwargs:
             pk = view.kwargs["id"]
             obj = get_object_or_404(view.get_queryset(), pk=pk)
@@ -88,20 +113,22 @@ class ProjectPermissionBase(BasePermission):
         return project
 
     def _validate_project(self, request, project):
+        return self._validate_project_id(request, project.pk)
+
+    def _validate_project_id(self, request, project_id):
         granted = True
 
         if isinstance(request.user, AnonymousUser):
             granted = False
         else:
             # Find membership for this user and project
-            membership = Membership.objects.filter(user=request.user, project=project)
+            permission = membership_permission(request.user.pk, project_id)
 
             # If user is not part of project, deny access
-            if membership.count() == 0:
+            if permission is None:
                 granted = False
             else:
                 # If user has insufficient permission, deny access
-                permission = membership[0].permission
                 insufficient = permission in self.insufficient_permissions
                 is_edit = request.method not in SAFE_METHODS
                 if is_edit and insufficient:
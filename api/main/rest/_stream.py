@@ -0,0 +1,107 @@
+""" Utilities for streaming large list responses. """
+
+import csv
+from itertools import islice
+import logging
+
+from django.db import connection
+from django.http import StreamingHttpResponse
+
+from ..encoders import dumps_compact
+from ..renderers import attribute_columns
+from ._util import cursor_paginate, get_next_cursor
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 2000
+
+STREAM_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/plain",
+}
+
+
+class _Echo:
+    """Pseudo-buffer that returns written values so csv writers can be used in generators."""
+
+    def write(self, value):
+        return value
+
+
+def _dumps(row):
+    # Matches the compact output of TatorRenderer.
+    return dumps_compact(row).decode()
+
+
+def iterate_chunks(qs, fields, chunk_size=STREAM_CHUNK_SIZE):
+    """Yields lists of up to `chunk_size` value dicts read through a server-side cursor. If
+    server-side cursors are disabled, as they are behind pgbouncer, chunks of unsliced querysets
+    are read with keyset pagination instead so the rows are not all fetched at once.
+    """
+    if connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] and not qs.query.is_sliced:
+        params = {"page_size": chunk_size}
+        while True:
+            page = cursor_paginate(qs, params)
+            chunk = list(page.values(*fields))
+            if chunk:
+                yield chunk
+            params["cursor"] = get_next_cursor(page, params, chunk)
+            if params["cursor"] is None:
+                break
+        return
+    rows = qs.values(*fields).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def batch_lookup(model, field, ids, cache):
+    """Adds values of `field` for the given primary keys of `model` that are not already
+    present in `cache`, using one query per call.
+    """
+    missing = set(ids) - cache.keys()
+    if missing:
+        for obj in model.objects.filter(pk__in=missing).values("id", field).iterator():
+            cache[obj["id"]] = obj[field]
+    return cache
+
+
+def _json_stream(chunks):
+    yield "["
+    separator = ""
+    for chunk in chunks:
+        yield separator + ",".join(_dumps(row) for row in chunk)
+        separator = ","
+    yield "]"
+
+
+def _ndjson_stream(chunks):
+    for chunk in chunks:
+        yield "".join(_dumps(row) + "\n" for row in chunk)
+
+
+def _csv_stream(chunks, columns):
+    writer = csv.DictWriter(_Echo(), fieldnames=columns, extrasaction="ignore")
+    yield writer.writeheader()
+    for chunk in chunks:
+        yield "".join(writer.writerow(row) for row in chunk)
+
+
+def streaming_response(chunks, stream_format, columns=None):
+    """Returns a response that serializes chunks of rows as they are produced.
+
+    :param chunks: Iterable of lists of row dicts.
+    :param stream_format: One of `json` (a JSON array), `ndjson` (one JSON object per line)
+                          or `csv`.
+    :param columns: Column names, required for `csv`.
+    """
+    if stream_format == "csv":
+        content = _csv_stream(chunks, columns)
+    elif stream_format == "ndjson":
+        content = _ndjson_stream(chunks)
+    else:
+        content = _json_stream(chunks)
+    return StreamingHttpResponse(content, content_type=STREAM_CONTENT_TYPES[stream_format])
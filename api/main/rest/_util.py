@@ -1,5 +1,7 @@
+import base64
 import datetime
 from itertools import islice
+import json
 import logging
 from urllib.parse import urlparse
 import uuid
@@ -8,12 +10,15 @@ import socket
 
 from django.contrib.contenttypes.models import ContentType
 from django.utils.http import urlencode
+from django.db.models import JSONField, Q, Value
 from django.db.models.expressions import Subquery
+from django.db.models.functions import Cast
 from rest_framework.reverse import reverse
 from rest_framework.exceptions import APIException
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.exceptions import NotFound
 
+from ..encoders import TatorJSONEncoder
 from ..models import type_to_obj, ChangeLog, ChangeToObject, Membership, Project, Permission, User
 
 from ._attributes import bulk_patch_attributes, convert_attribute
@@ -148,6 +153,156 @@ def paginate(query_params, queryset):
     return qs
 
 
+def _cursor_ordering(queryset):
+    """Returns the ordering of a queryset as a list of (field, descending) tuples, with the
+    primary key appended as a tie breaker if it is not already part of the ordering.
+    """
+    ordering = []
+    for field in queryset.query.order_by:
+        descending = field.startswith("-")
+        field = field.lstrip("-")
+        if field == "pk":
+            field = "id"
+        ordering.append((field, descending))
+        if field == "id":
+            break
+    if not any(field == "id" for field, _ in ordering):
+        ordering.append(("id", False))
+    return ordering
+
+
+def _cursor_rhs(value):
+    """Converts an encoded cursor value into a lookup value. Attribute values that were
+    JSON null are compared against a jsonb null rather than SQL NULL."""
+    if value[0] is None:
+        return Cast(Value("null"), JSONField())
+    return value[0]
+
+
+def _cursor_filter(ordering, values):
+    """Builds a Q object selecting rows strictly after the row with the given sort values.
+    Each sort value is encoded as an empty list for SQL NULL or a one element list otherwise.
+    NULLs sort last in ascending order and first in descending order, as in PostgreSQL.
+    """
+    after = []
+    equal = Q()
+    for (field, descending), value in zip(ordering, values):
+        if not value:
+            if descending:
+                after.append(equal & Q(**{f"{field}__isnull": False}))
+            equal &= Q(**{f"{field}__isnull": True})
+        else:
+            rhs = _cursor_rhs(value)
+            if descending:
+                after.append(equal & Q(**{f"{field}__lt": rhs}))
+            else:
+                after.append(equal & (Q(**{f"{field}__gt": rhs}) | Q(**{f"{field}__isnull": True})))
+            equal &= Q(**{field: rhs})
+    query = after.pop()
+    for q in after:
+        query |= q
+    return query
+
+
+class _CursorEncoder(TatorJSONEncoder):
+    """Keeps the microseconds of datetimes and times, which `DjangoJSONEncoder` truncates to
+    milliseconds, so cursors compare against the exact sort value of the last row.
+    """
+
+    def default(self, obj):
+        if isinstance(obj, (datetime.datetime, datetime.time)):
+            return obj.isoformat()
+        return super().default(obj)
+
+
+def encode_cursor(values):
+    """Encodes a list of sort values into an opaque cursor string."""
+    blob = json.dumps(values, cls=_CursorEncoder, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(blob).decode()
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor string produced by `encode_cursor`."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except ValueError as exc:
+        raise BadQuery(f"Invalid cursor '{cursor}'!") from exc
+
+
+def cursor_paginate(queryset, params):
+    """Applies keyset pagination to an ordered queryset. Rows after the position encoded
+    in the `cursor` parameter are selected, up to `page_size` rows. Unlike offset slicing
+    the cost of retrieving a page does not depend on how deep into the results it is.
+    """
+    ordering = _cursor_ordering(queryset)
+    queryset = queryset.order_by(*[f"-{f}" if desc else f for f, desc in ordering])
+    cursor = params.get("cursor")
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise BadQuery("Cursor does not match the requested sort order!")
+        queryset = queryset.filter(_cursor_filter(ordering, values))
+    return queryset[: params["page_size"]]
+
+
+def get_next_cursor(queryset, params, response_data):
+    """Returns the cursor for the page following `response_data`, which must be the rows
+    of a queryset returned by `cursor_paginate`. Returns None if there are no more pages.
+    """
+    page_size = params.get("page_size")
+    if page_size is None or len(response_data) < page_size:
+        return None
+    last = response_data[-1]
+    values = []
+    missing = []
+    for field, _ in _cursor_ordering(queryset):
+        if field.startswith("attributes__"):
+            attributes = last.get("attributes") or {}
+            key = field[len("attributes__") :]
+            values.append([attributes[key]] if key in attributes else [])
+        elif field in last:
+            values.append([] if last[field] is None else [last[field]])
+        else:
+            # Sort field is not part of the response, look it up separately.
+            values.append(None)
+            missing.append(field)
+    if missing:
+        # Look up through the queryset so sort fields that are annotations are kept.
+        unsliced = queryset.all()
+        unsliced.query.clear_limits()
+        looked_up = unsliced.filter(pk=last["id"]).values(*missing)[0]
+        for field in missing:
+            idx = values.index(None)
+            values[idx] = [] if looked_up[field] is None else [looked_up[field]]
+    return encode_cursor(values)
+
+
+def get_neighbor_ids(queryset, pk, count=1, reverse=False):
+    """Returns IDs of up to `count` rows following the row with the given primary key in the
+    order of a queryset, or preceding it if `reverse` is set. The sort values of the row are
+    looked up and compared with a keyset filter, so the rows before it are never scanned.
+    Returns an empty list if the row is not in the queryset.
+    """
+    ordering = _cursor_ordering(queryset)
+    if reverse:
+        ordering = [(field, not descending) for field, descending in ordering]
+    fields = {"attributes" if field.startswith("attributes__") else field for field, _ in ordering}
+    row = queryset.filter(pk=pk).values(*fields).first()
+    if row is None:
+        return []
+    values = []
+    for field, _ in ordering:
+        if field.startswith("attributes__"):
+            attributes = row["attributes"] or {}
+            key = field[len("attributes__") :]
+            values.append([attributes[key]] if key in attributes else [])
+        else:
+            values.append([] if row[field] is None else [row[field]])
+    queryset = queryset.order_by(*[f"-{f}" if desc else f for f, desc in ordering])
+    queryset = queryset.filter(_cursor_filter(ordering, values))
+    return list(queryset.values_list("id", flat=True)[:count])
+
+
 def bulk_create_from_generator(obj_generator, model, batch_size=1000):
     saved_objects = []
     while True:
@@ -4,20 +4,22 @@ import shutil
 from uuid import uuid1
 
 from django.conf import settings
+from django.http import Http404
 
-from ..schema import CloneMediaListSchema, GetClonedMediaSchema
+from ..schema import CloneMediaListSchema, CloneMediaStatusSchema, GetClonedMediaSchema
 from ..models import Project
 from ..models import MediaType
 from ..models import Media
 from ..models import Section
-from ..models import Resource
-from ..search import TatorSearch
 from ..util import get_clone_info
+from ..worker import get_job_group, push_jobs
 
 from ._media_query import get_media_queryset
 from ._base_views import BaseDetailView, BaseListView
+from ._ingest import allocate_ids
 from ._permissions import ClonePermission, ProjectEditPermission
-from ._util import bulk_create_from_generator
+
+import main._clone_media
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +31,10 @@ class CloneMediaListAPI(BaseListView):
     permission_classes = [ClonePermission]
     http_method_names = ["post"]
     entity_type = MediaType  # Needed by attribute filter mixin
-    MAX_NUM_MEDIA = 500
-
-    @staticmethod
-    def _media_obj_generator(original_medias, dest_project, dest_type, section):
-        for media in original_medias.iterator():
-            new_obj = media
-            new_obj.pk = None
-            new_obj.project = Project.objects.get(pk=dest_project)
-            new_obj.type = MediaType.objects.get(pk=dest_type)
-            if section:
-                new_obj.attributes["tator_user_sections"] = section.tator_user_sections
-            yield new_obj
+    MAX_SYNC_MEDIA = 500
+    """ Larger selections are cloned asynchronously. """
+    CHUNK_SIZE = 5000
+    """ Number of media cloned by each asynchronous job. """
 
     def _post(self, params):
         dest = params["dest_project"]
@@ -50,14 +44,7 @@ class CloneMediaListAPI(BaseListView):
 
         # Retrieve media that will be cloned.
         original_medias = get_media_queryset(self.kwargs["project"], params)
-
-        # If there are too many Media to create at once, raise an exception.
-        if original_medias.count() > self.MAX_NUM_MEDIA:
-            raise Exception(
-                "Maximum number of media that can be cloned in one request is "
-                f"{self.MAX_NUM_MEDIA}. Try paginating request with start, stop, "
-                "or after parameters."
-            )
+        media_ids = list(original_medias.values_list("pk", flat=True))
 
         # If given media type is not part of destination project, raise an exception.
         if params["dest_type"] == -1:
@@ -68,7 +55,7 @@ class CloneMediaListAPI(BaseListView):
                 raise Exception("Destination media type is not part of destination project!")
 
         # Look for destination section, if given.
-        section = None
+        section_uuid = None
         if params.get("dest_section"):
             sections = Section.objects.filter(project=dest, name__iexact=params["dest_section"])
             if sections.count() == 0:
@@ -79,30 +66,61 @@ class CloneMediaListAPI(BaseListView):
                 )
             else:
                 section = sections[0]
+            section_uuid = section.tator_user_sections
+
+        # Reserve IDs up front so they can be returned before asynchronous clones finish.
+        ids = allocate_ids(Media, len(media_ids)) if media_ids else []
+        if len(ids) <= self.MAX_SYNC_MEDIA:
+            main._clone_media._clone_media(media_ids, ids, dest, type_obj.id, section_uuid)
+            return {
+                "message": f"Successfully cloned {len(ids)} medias!",
+                "id": ids,
+                "job_group": None,
+            }
+
+        group = f"clone_media_{dest}_{uuid1()}"
+        push_jobs(
+            "db_jobs",
+            [
+                {
+                    "func": main._clone_media._clone_media,
+                    "args": (
+                        media_ids[idx : idx + self.CHUNK_SIZE],
+                        ids[idx : idx + self.CHUNK_SIZE],
+                        dest,
+                        type_obj.id,
+                        section_uuid,
+                    ),
+                    "result_ttl": 0,
+                }
+                for idx in range(0, len(ids), self.CHUNK_SIZE)
+            ],
+            group=group,
+        )
+        return {
+            "message": f"Started clone of {len(ids)} medias in job group {group}!",
+            "id": ids,
+            "job_group": group,
+        }
+
+
+class CloneMediaStatusAPI(BaseDetailView):
+    """Progress of an asynchronous media clone into a project."""
+
+    schema = CloneMediaStatusSchema()
+    permission_classes = [ProjectEditPermission]
+    http_method_names = ["get"]
 
-        objs = self._media_obj_generator(original_medias, dest, params["dest_type"], section)
-        medias = bulk_create_from_generator(objs, Media)
-
-        # Update resources.
-        for media in medias:
-            if media.media_files:
-                for key in [
-                    "streaming",
-                    "archival",
-                    "audio",
-                    "image",
-                    "thumbnail",
-                    "thumbnail_gif",
-                    "attachment",
-                ]:
-                    for f in media.media_files.get(key, []):
-                        Resource.add_resource(f["path"], media)
-                        if key == "streaming":
-                            Resource.add_resource(f["segment_info"], media)
-
-        # Return created IDs.
-        ids = [media.id for media in medias]
-        return {"message": f"Successfully cloned {len(ids)} medias!", "id": ids}
+    def _get(self, params):
+        group = params["job_group"]
+        # Only groups cloning into this project are visible.
+        counts = None
+        if group.startswith(f"clone_media_{params['project']}_"):
+            counts = get_job_group(group)
+        if counts is None:
+            raise Http404(f"Job group {group} not found!")
+        complete = counts["finished"] + counts["failed"] == counts["total"]
+        return {"job_group": group, **counts, "complete": complete}
 
 
 class GetClonedMediaAPI(BaseDetailView):
@@ -31,6 +31,7 @@ from ._util import computeRequiredFields
 from ._util import check_required_fields
 from ._util import check_file_resource_prefix
 from ._util import compute_user
+from ._util import get_next_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +47,9 @@ class FileListAPI(BaseListView):
     def _get(self, params: dict) -> dict:
         qs = get_file_queryset(params["project"], params)
         response_data = list(qs.values(*FILE_PROPERTIES))
+        next_cursor = get_next_cursor(qs, params, response_data)
+        if next_cursor is not None:
+            self.response_headers["X-Next-Cursor"] = next_cursor
         return response_data
 
     def _post(self, params: dict) -> dict:
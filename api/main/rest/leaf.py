@@ -4,7 +4,6 @@ from collections import defaultdict
 
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
-from django.db.models import Q
 from django.http import Http404
 
 from ..models import Leaf
@@ -17,6 +16,7 @@ from ..schema.components import leaf as leaf_schema
 
 from ._base_views import BaseListView
 from ._base_views import BaseDetailView
+from ._leaf_index import get_ancestor_type, get_leaf_index, record_leaf_changes
 from ._leaf_query import get_leaf_queryset
 from ._attributes import patch_attributes
 from ._attributes import bulk_patch_attributes
@@ -29,6 +29,7 @@ from ._util import (
     computeRequiredFields,
     check_required_fields,
     delete_and_log_changes,
+    get_next_cursor,
     log_changes,
 )
 from ._permissions import ProjectViewOnlyPermission
@@ -56,60 +57,11 @@ class LeafSuggestionAPI(BaseDetailView):
         ancestor = params["ancestor"]
 
         # Try to find root node for type
-        root_node = Leaf.objects.filter(project=project, path=ancestor)
-        if root_node.count() == 0:
+        type_id = get_ancestor_type(project, ancestor)
+        if type_id is None:
             return []
 
-        if query.find("*") < 0:
-            q_object = Q(name__istartswith=query)
-        else:
-            comps = query.split("*")
-            queries = []
-            for idx, c in enumerate(comps):
-                if c:
-                    if idx == 0:
-                        queries.append(Q(name__istartswith=c))
-                    elif idx == len(comps) - 1:
-                        queries.append(Q(name__iendswith=c))
-                    else:
-                        queries.append(Q(name__icontains=c))
-
-            q_object = queries[0]
-            queries.pop(0)
-            for q in queries:
-                q_object = q_object & q
-
-        type_id = root_node[0].type
-        queryset = Leaf.objects.filter(
-            project=project, type=type_id, path__istartswith=ancestor, path__depth__gte=min_level
-        ).filter(q_object)
-
-        suggestions = []
-        for idx, match in enumerate(queryset):
-            group = params["ancestor"]
-            if match.parent:
-                group = match.parent.name
-
-            suggestion = {"value": match.name, "group": group, "data": {}}
-
-            if "alias" in match.attributes:
-                suggestion["data"]["alias"] = match.attributes["alias"]
-
-            catAlias = None
-            if match.parent:
-                if match.parent.attributes:
-                    catAlias = match.parent.attributes.get("alias", None)
-                if catAlias != None:
-                    suggestion["group"] = f'{suggestion["group"]} ({catAlias})'
-
-            suggestions.append(suggestion)
-
-        def functor(elem):
-            return elem["group"]
-
-        suggestions.sort(key=functor)
-        logger.info(queryset.explain())
-        return suggestions
+        return get_leaf_index(type_id).suggest(query, ancestor, min_level)
 
 
 class LeafListAPI(BaseListView):
@@ -127,6 +79,9 @@ class LeafListAPI(BaseListView):
     def _get(self, params):
         qs = get_leaf_queryset(params["project"], params)
         response_data = list(qs.values(*LEAF_PROPERTIES))
+        next_cursor = get_next_cursor(qs, params, response_data)
+        if next_cursor is not None:
+            self.response_headers["X-Next-Cursor"] = next_cursor
         return response_data
 
     @staticmethod
@@ -186,6 +141,7 @@ class LeafListAPI(BaseListView):
         create_buffer = []
 
         ids = bulk_log_creation(leaves, project, self.request.user)
+        record_leaf_changes(ids)
 
         # Return created IDs.
         if len(ids) == 1:
@@ -197,7 +153,9 @@ class LeafListAPI(BaseListView):
         qs = get_leaf_queryset(params["project"], params)
         count = qs.count()
         if count > 0:
+            leaf_ids = list(qs.values_list("id", flat=True))
             bulk_delete_and_log_changes(qs, params["project"], self.request.user)
+            record_leaf_changes(leaf_ids)
 
         if count == 1:
             return {"message": f"Successfully deleted {count} leaf!"}
@@ -213,10 +171,12 @@ class LeafListAPI(BaseListView):
                     "When doing a bulk patch the type id of all objects must be the same."
                 )
             new_attrs = validate_attributes(params, qs[0])
+            leaf_ids = list(qs.values_list("id", flat=True))
             bulk_update_and_log_changes(
                 qs, params["project"], self.request.user, new_attributes=new_attrs
             )
             bulk_patch_attributes(new_attrs, qs)
+            record_leaf_changes(leaf_ids)
 
         if count == 1:
             return {"message": f"Successfully updated {count} leaf!"}
@@ -290,6 +250,7 @@ class LeafDetailAPI(BaseDetailView):
             inner_leaf = Leaf.objects.get(pk=i, deleted=False)
 
         bulk_delete_and_log_changes(queryset, project, self.request.user)
+        record_leaf_changes(ids)
 
         # todo figure out syntax for this query
         # query = get_leaf_es_query(params)
@@ -1,4 +1,9 @@
+import contextlib
+import datetime
 import logging
+from collections import defaultdict
+
+import pgtrigger
 from django.db.models import Max
 from django.db import transaction
 from django.http import Http404
@@ -31,8 +36,11 @@ from ._util import (
     construct_elemental_id_from_spec,
     construct_parent_from_spec,
     compute_user,
+    get_next_cursor,
 )
+from ._ingest import allocate_ids, copy_log_creation, copy_rows, validate_attribute_columns
 from ._permissions import ProjectEditPermission
+from ._stream import attribute_columns, batch_lookup, iterate_chunks, streaming_response
 
 logger = logging.getLogger(__name__)
 
@@ -54,39 +62,60 @@ class LocalizationListAPI(BaseListView):
     permission_classes = [ProjectEditPermission]
     http_method_names = ["get", "post", "patch", "delete", "put"]
     entity_type = LocalizationType  # Needed by attribute filter mixin
+    MAX_CREATE = 500
+    """ Maximum number of localizations created by one request without `ingest`. """
+
+    @staticmethod
+    def _csv_rows(response_data, email_dict, filename_dict):
+        """Flattens attributes and replaces user and media IDs with email and media name.
+        Lookups are done once per batch and accumulated in the given dicts.
+        """
+        batch_lookup(User, "email", [d["user"] for d in response_data], email_dict)
+        batch_lookup(Media, "name", [d["media"] for d in response_data], filename_dict)
+        for element in response_data:
+            del element["type"]
+
+            oldAttributes = element["attributes"]
+            del element["attributes"]
+            element.update(oldAttributes)
+
+            user_id = element["user"]
+            media_id = element["media"]
+
+            element["user"] = email_dict[user_id]
+            element["media"] = filename_dict[media_id]
+        return response_data
+
+    def _stream(self, qs, params):
+        chunks = iterate_chunks(qs, LOCALIZATION_PROPERTIES)
+        if self.request.accepted_renderer.format != "csv":
+            return streaming_response(chunks, params["stream"])
+        if "type" in params:
+            types = LocalizationType.objects.filter(pk=params["type"])
+        else:
+            types = LocalizationType.objects.filter(project=self.kwargs["project"])
+        columns = [
+            field for field in LOCALIZATION_PROPERTIES if field not in ["type", "attributes"]
+        ]
+        columns += attribute_columns(types)
+        email_dict = {}
+        filename_dict = {}
+        chunks = (self._csv_rows(chunk, email_dict, filename_dict) for chunk in chunks)
+        return streaming_response(chunks, "csv", columns)
 
     def _get(self, params):
         logger.info("PARAMS=%s", params)
         qs = get_annotation_queryset(self.kwargs["project"], params, "localization")
+        if params.get("stream"):
+            return self._stream(qs, params)
         response_data = list(qs.values(*LOCALIZATION_PROPERTIES))
+        next_cursor = get_next_cursor(qs, params, response_data)
+        if next_cursor is not None:
+            self.response_headers["X-Next-Cursor"] = next_cursor
 
         # Adjust fields for csv output.
         if self.request.accepted_renderer.format == "csv":
-            # CSV creation requires a bit more
-            user_ids = set([d["user"] for d in response_data])
-            users = list(User.objects.filter(id__in=user_ids).values("id", "email"))
-            email_dict = {}
-            for user in users:
-                email_dict[user["id"]] = user["email"]
-
-            media_ids = set([d["media"] for d in response_data])
-            medias = list(Media.objects.filter(id__in=media_ids).values("id", "name"))
-            filename_dict = {}
-            for media in medias:
-                filename_dict[media["id"]] = media["name"]
-
-            for element in response_data:
-                del element["type"]
-
-                oldAttributes = element["attributes"]
-                del element["attributes"]
-                element.update(oldAttributes)
-
-                user_id = element["user"]
-                media_id = element["media"]
-
-                element["user"] = email_dict[user_id]
-                element["media"] = filename_dict[media_id]
+            response_data = self._csv_rows(response_data, {}, {})
         return response_data
 
     def _post(self, params):
@@ -97,6 +126,10 @@ class LocalizationListAPI(BaseListView):
             raise RuntimeError("Localization creation requires list of localizations!") from exc
         if not isinstance(loc_specs, list):
             loc_specs = [loc_specs]
+        if not params.get("ingest") and len(loc_specs) > self.MAX_CREATE:
+            raise ValueError(
+                f"A maximum of {self.MAX_CREATE} localizations may be created without `ingest`!"
+            )
 
         project = params["project"]
 
@@ -119,6 +152,9 @@ class LocalizationListAPI(BaseListView):
                     number=0,
                 )
 
+        if params.get("ingest"):
+            return self._ingest(loc_specs, project, default_version)
+
         # Find unique foreign keys.
         meta_ids = set([loc["type"] for loc in loc_specs])
         media_ids = set([loc["media_id"] for loc in loc_specs])
@@ -214,6 +250,137 @@ class LocalizationListAPI(BaseListView):
         # Return created IDs.
         return {"message": f"Successfully created {len(ids)} localizations!", "id": ids}
 
+    def _ingest(self, loc_specs, project, default_version):
+        """Creates localizations without model instances. Specs are validated in columns,
+        rows are written with COPY and specs that fail validation are reported rather than
+        failing the request.
+        """
+        project = Project.objects.get(pk=project)
+        errors = {}
+
+        # Look up foreign keys within the project, each with one query.
+        metas = {
+            obj.id: obj
+            for obj in LocalizationType.objects.filter(
+                project=project, pk__in={loc["type"] for loc in loc_specs}
+            )
+        }
+        media_ids = set(
+            Media.objects.filter(
+                project=project, pk__in={loc["media_id"] for loc in loc_specs}
+            ).values_list("id", flat=True)
+        )
+        version_ids = set(
+            Version.objects.filter(
+                project=project, pk__in={loc.get("version") for loc in loc_specs} - {None}
+            ).values_list("id", flat=True)
+        )
+        parent_ids = set(
+            Localization.objects.filter(
+                project=project, pk__in={loc.get("parent") for loc in loc_specs} - {None}
+            ).values_list("id", flat=True)
+        )
+        users = {}
+        for user_elemental_id in {loc.get("user_elemental_id") for loc in loc_specs}:
+            try:
+                users[user_elemental_id] = compute_user(
+                    project, self.request.user, user_elemental_id
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                users[user_elemental_id] = exc
+
+        # Validate rows in columns, grouped by type.
+        indices_by_type = defaultdict(list)
+        elemental_ids = {}
+        for idx, loc in enumerate(loc_specs):
+            user = users[loc.get("user_elemental_id")]
+            if loc["type"] not in metas:
+                errors[
+                    idx
+                ] = f"Localization type {loc['type']} is not part of project {project.id}!"
+            elif loc["media_id"] not in media_ids:
+                errors[idx] = f"Media {loc['media_id']} is not part of project {project.id}!"
+            elif loc.get("version") is not None and loc["version"] not in version_ids:
+                errors[idx] = f"Version {loc['version']} is not part of project {project.id}!"
+            elif loc.get("parent") and loc["parent"] not in parent_ids:
+                errors[idx] = f"Parent localization {loc['parent']} does not exist!"
+            elif isinstance(user, Exception):
+                errors[idx] = str(user)
+            else:
+                try:
+                    elemental_ids[idx] = construct_elemental_id_from_spec(loc, Localization)
+                except RuntimeError as exc:
+                    errors[idx] = str(exc)
+                    continue
+                indices_by_type[loc["type"]].append(idx)
+        attributes = {}
+        for type_id, indices in indices_by_type.items():
+            datafields, _, attr_types = computeRequiredFields(metas[type_id])
+            for field in datafields:
+                for idx in indices:
+                    if idx not in errors and field not in loc_specs[idx]:
+                        errors[idx] = f'Missing required field in request body "{field}".'
+            attributes.update(validate_attribute_columns(attr_types, loc_specs, indices, errors))
+
+        # Build rows in the order of the request.
+        indices = [idx for idx in range(len(loc_specs)) if idx not in errors]
+        now = datetime.datetime.now(datetime.timezone.utc)
+        rows = []
+        for idx in indices:
+            loc = loc_specs[idx]
+            user_id = users[loc.get("user_elemental_id")].id
+            rows.append(
+                {
+                    "project": project.id,
+                    "type": loc["type"],
+                    "attributes": attributes[idx],
+                    "created_datetime": now,
+                    "created_by": user_id,
+                    "modified_datetime": now,
+                    "modified_by": user_id,
+                    "user": user_id,
+                    "media": loc["media_id"],
+                    "frame": loc.get("frame", None),
+                    "thumbnail_image": None,
+                    "version": loc.get("version") or default_version.id,
+                    "x": loc.get("x", None),
+                    "y": loc.get("y", None),
+                    "u": loc.get("u", None),
+                    "v": loc.get("v", None),
+                    "width": loc.get("width", None),
+                    "height": loc.get("height", None),
+                    "points": loc.get("points", None),
+                    "parent": loc.get("parent") or None,
+                    "deleted": False,
+                    "elemental_id": elemental_ids[idx],
+                    "variant_deleted": False,
+                    "mark": 0,
+                    "latest_mark": 0,
+                }
+            )
+
+        # New elemental IDs start at mark 0, so the mark triggers only need to run when an
+        # elemental ID is supplied.
+        if any(loc_specs[idx].get("elemental_id") for idx in indices):
+            ignore = contextlib.nullcontext()
+        else:
+            ignore = pgtrigger.ignore(
+                "main.Localization:localization_mark_trigger",
+                "main.Localization:post_localization_mark_trigger",
+            )
+        with transaction.atomic(), ignore:
+            ids = allocate_ids(Localization, len(rows))
+            for row, id_ in zip(rows, ids):
+                row["id"] = id_
+            copy_rows(Localization, rows)
+            copy_log_creation(Localization, rows, project, self.request.user)
+
+        return {
+            "message": f"Successfully created {len(ids)} localizations!",
+            "id": ids,
+            "errors": [{"index": idx, "message": errors[idx]} for idx in sorted(errors)],
+        }
+
     def _delete(self, params):
         qs = get_annotation_queryset(params["project"], params, "localization")
         count = qs.count()
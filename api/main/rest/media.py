@@ -46,6 +46,7 @@ from ._util import (
     log_creation,
     computeRequiredFields,
     check_required_fields,
+    get_next_cursor,
     url_to_key,
 )
 
@@ -101,7 +102,9 @@ def _presign(user_id, expiration, medias, fields=None, no_cache=False):
     cache = TatorCache()
     ttl = expiration - 3600
 
-    # Get replace all keys with presigned urls.
+    # Collect the media definitions and keys that need presigned urls.
+    media_defs = []
+    keys = set()
     for media in medias:
         if media.get("media_files") is None:
             continue
@@ -111,34 +114,40 @@ def _presign(user_id, expiration, medias, fields=None, no_cache=False):
                 continue
 
             for media_def in media["media_files"][field]:
-                # Get path url
                 # If the path is a bona fide URL, don't attempt to presign it
                 if urlparse(media_def["path"]).scheme != "":
                     continue
-                url = cache.get_presigned(user_id, media_def["path"])
-                if no_cache or (url is None):
-                    tator_store = store_lookup[media_def["path"]]
-                    url = tator_store.get_download_url(media_def["path"], expiration)
-                    if ttl > 0 and not no_cache:
-                        cache.set_presigned(user_id, media_def["path"], url, ttl)
-                media_def["path"] = url
-                # Get segment url
+                media_defs.append((media_def, "path"))
+                keys.add(media_def["path"])
                 if field == "streaming":
                     if "segment_info" in media_def:
-                        url = cache.get_presigned(user_id, media_def["segment_info"])
-                        if no_cache or (url is None):
-                            tator_store = store_lookup[media_def["segment_info"]]
-                            url = tator_store.get_download_url(
-                                media_def["segment_info"], expiration
-                            )
-                            if ttl > 0 and not no_cache:
-                                cache.set_presigned(user_id, media_def["segment_info"], url, ttl)
-                        media_def["segment_info"] = url
+                        media_defs.append((media_def, "segment_info"))
+                        keys.add(media_def["segment_info"])
                     else:
                         logger.warning(
                             f"No segment file in media {media['id']} for file {media_def['path']}!"
                         )
 
+    # Look up cached urls in one round trip and sign the misses per store.
+    if no_cache:
+        urls = dict.fromkeys(keys)
+    else:
+        urls = cache.get_presigned_many(user_id, keys)
+    misses = {}
+    for key, url in urls.items():
+        if url is None:
+            misses.setdefault(store_lookup[key], []).append(key)
+    signed = {}
+    for tator_store, store_keys in misses.items():
+        signed.update(tator_store.get_download_urls(store_keys, expiration))
+    if ttl > 0 and not no_cache:
+        cache.set_presigned_many(user_id, signed, ttl)
+    urls.update(signed)
+
+    # Replace all keys with presigned urls.
+    for media_def, field in media_defs:
+        media_def[field] = urls[media_def[field]]
+
 
 def _save_image(url, media_obj, project_obj, role):
     """
@@ -386,6 +395,9 @@ class MediaListAPI(BaseListView):
         if params.get("encoded_related_search") == None:
             fields.remove("incident")
         response_data = list(qs.values(*fields))
+        next_cursor = get_next_cursor(qs, params, response_data)
+        if next_cursor is not None:
+            self.response_headers["X-Next-Cursor"] = next_cursor
         presigned = params.get("presigned")
         if presigned is not None:
             no_cache = params.get("no_cache", False)
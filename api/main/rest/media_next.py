@@ -1,12 +1,10 @@
-from collections import defaultdict
-from copy import deepcopy
 import logging
 
 from ..models import Media
-from ..search import TatorSearch
 from ..schema import MediaNextSchema
 
 from ._media_query import get_media_queryset
+from ._util import get_neighbor_ids
 
 from ._base_views import BaseDetailView
 from ._permissions import ProjectViewOnlyPermission
@@ -31,20 +29,10 @@ class MediaNextAPI(BaseDetailView):
         media_id = params["id"]
         media = Media.objects.get(pk=media_id)
 
-        qs = get_media_queryset(media.project.id, params)
-        iter_obj = qs.iterator()
-        next_id = -1
-        try:
-            for x in range(qs.count()):
-                record = next(iter_obj)
-                if record.id == media_id:
-                    next_record = next(iter_obj)
-                    next_id = next_record.id
-                    break
-        except StopIteration:
-            pass
-
-        response_data = {"next": next_id}
+        # Neighbors are found relative to the whole list, so pagination does not apply.
+        qs = get_media_queryset(media.project.id, {**params, "start": None, "stop": None})
+        next_ids = get_neighbor_ids(qs, media_id, params.get("count", 1))
+        response_data = {"next": next_ids[0] if next_ids else -1, "next_ids": next_ids}
         return response_data
 
     def get_queryset(self):
@@ -1,12 +1,10 @@
-from collections import defaultdict
-from copy import deepcopy
 import logging
 
 from ..models import Media
-from ..search import TatorSearch
 from ..schema import MediaPrevSchema
 
 from ._media_query import get_media_queryset
+from ._util import get_neighbor_ids
 
 from ._base_views import BaseDetailView
 from ._permissions import ProjectViewOnlyPermission
@@ -32,20 +30,10 @@ class MediaPrevAPI(BaseDetailView):
         media_id = params["id"]
         media = Media.objects.get(pk=media_id)
 
-        qs = get_media_queryset(media.project.id, params).reverse()
-        iter_obj = qs.iterator()
-        next_id = -1
-        try:
-            for x in range(qs.count()):
-                record = next(iter_obj)
-                if record.id == media_id:
-                    next_record = next(iter_obj)
-                    next_id = next_record.id
-                    break
-        except StopIteration:
-            pass
-
-        response_data = {"prev": next_id}
+        # Neighbors are found relative to the whole list, so pagination does not apply.
+        qs = get_media_queryset(media.project.id, {**params, "start": None, "stop": None})
+        prev_ids = get_neighbor_ids(qs, media_id, params.get("count", 1), reverse=True)
+        response_data = {"prev": prev_ids[0] if prev_ids else -1, "prev_ids": prev_ids}
         return response_data
 
     def get_queryset(self):
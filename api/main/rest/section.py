@@ -68,7 +68,7 @@ class SectionListAPI(BaseListView):
             if value:
                 qs = qs.filter(**{f"path__{db_operation}": f"{value}"})
 
-        qs = _do_object_search(qs, params)
+        qs = _do_object_search(qs, params, params["project"])
         # Annotate the response to match the schema
         qs = qs.annotate(related_search=F("related_object_search"))
 
@@ -1,13 +1,11 @@
 import logging
 import datetime
-import itertools
 
 from django.db import transaction
 from django.db.models import Max
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.http import Http404
-import numpy as np
 
 from ..models import State
 from ..models import StateType
@@ -42,8 +40,10 @@ from ._util import (
     construct_elemental_id_from_spec,
     construct_parent_from_spec,
     compute_user,
+    get_next_cursor,
 )
 from ._permissions import ProjectEditPermission
+from ._stream import attribute_columns, batch_lookup, iterate_chunks, streaming_response
 
 logger = logging.getLogger(__name__)
 
@@ -52,29 +52,46 @@ STATE_PROPERTIES.pop(STATE_PROPERTIES.index("media"))
 STATE_PROPERTIES.pop(STATE_PROPERTIES.index("localizations"))
 
 
+# Denormalized many to many fields, renamed to "media" and "localizations" in responses.
+STATE_LINK_FIELDS = ["media_ids", "localization_ids"]
+
+
 def _fill_m2m(response_data):
-    # Get many to many fields.
-    state_ids = [state["id"] for state in response_data]
-    localizations = {
-        obj["state_id"]: obj["localizations"]
-        for obj in State.localizations.through.objects.filter(state__in=state_ids)
-        .values("state_id")
-        .order_by("state_id")
-        .annotate(localizations=ArrayAgg("localization_id"))
-        .iterator()
-    }
-    media = {
-        obj["state_id"]: obj["media"]
-        for obj in State.media.through.objects.filter(state__in=state_ids)
-        .values("state_id")
-        .order_by("state_id")
-        .annotate(media=ArrayAgg("media_id"))
-        .iterator()
-    }
-    # Copy many to many fields into response data.
+    # Copy many to many fields from their denormalized columns. States that have not been
+    # backfilled yet fall back to aggregating the through tables.
+    state_ids = [
+        state["id"]
+        for state in response_data
+        if state["localization_ids"] is None or state["media_ids"] is None
+    ]
+    localizations = {}
+    media = {}
+    if state_ids:
+        localizations = {
+            obj["state_id"]: obj["localizations"]
+            for obj in State.localizations.through.objects.filter(state__in=state_ids)
+            .values("state_id")
+            .order_by("state_id")
+            .annotate(localizations=ArrayAgg("localization_id"))
+            .iterator()
+        }
+        media = {
+            obj["state_id"]: obj["media"]
+            for obj in State.media.through.objects.filter(state__in=state_ids)
+            .values("state_id")
+            .order_by("state_id")
+            .annotate(media=ArrayAgg("media_id"))
+            .iterator()
+        }
     for state in response_data:
-        state["localizations"] = localizations.get(state["id"], [])
-        state["media"] = media.get(state["id"], [])
+        localization_ids = state.pop("localization_ids")
+        media_ids = state.pop("media_ids")
+        if localization_ids is None:
+            localization_ids = localizations.get(state["id"], [])
+        if media_ids is None:
+            media_ids = media.get(state["id"], [])
+        state["localizations"] = localization_ids
+        state["media"] = media_ids
     return response_data
 
 
@@ -100,57 +117,89 @@ class StateListAPI(BaseListView):
     http_method_names = ["get", "post", "patch", "delete", "put"]
     entity_type = StateType  # Needed by attribute filter mixin
 
+    @staticmethod
+    def _csv_rows(response_data, email_dict, filename_dict):
+        """Flattens attributes and replaces user and media IDs with email and media names.
+        Lookups are done once per batch and accumulated in the given dicts.
+        """
+        batch_lookup(User, "email", [d["modified_by"] for d in response_data], email_dict)
+        batch_lookup(
+            Media, "name", [media for d in response_data for media in d["media"]], filename_dict
+        )
+        for element in response_data:
+            del element["type"]
+
+            oldAttributes = element["attributes"]
+            del element["attributes"]
+            element.update(oldAttributes)
+
+            user_id = element["modified_by"]
+            media_ids = element["media"]
+
+            element["user"] = email_dict[user_id]
+            element["media"] = [filename_dict[media_id] for media_id in media_ids]
+        return response_data
+
+    @staticmethod
+    def _is_interpolated_frame_type(params):
+        if "type" not in params:
+            return False
+        type_object = StateType.objects.get(pk=params["type"])
+        return (
+            type_object.association == "Frame"
+            and type_object.interpolation == InterpolationMethods.LATEST
+        )
+
+    def _stream(self, qs, params):
+        chunks = (
+            _fill_m2m(chunk)
+            for chunk in iterate_chunks(qs, [*STATE_PROPERTIES, *STATE_LINK_FIELDS])
+        )
+        if self.request.accepted_renderer.format != "csv":
+            return streaming_response(chunks, params["stream"])
+        if "type" in params:
+            types = StateType.objects.filter(pk=params["type"])
+        else:
+            types = StateType.objects.filter(project=self.kwargs["project"])
+        columns = [field for field in STATE_PROPERTIES if field not in ["type", "attributes"]]
+        columns += ["localizations", "media", "user"]
+        columns += attribute_columns(types)
+        email_dict = {}
+        filename_dict = {}
+        chunks = (self._csv_rows(chunk, email_dict, filename_dict) for chunk in chunks)
+        return streaming_response(chunks, "csv", columns)
+
     def _get(self, params):
         t0 = datetime.datetime.now()
         qs = get_annotation_queryset(self.kwargs["project"], params, "state")
-        response_data = list(qs.values(*STATE_PROPERTIES))
+        csv_format = self.request.accepted_renderer.format == "csv"
+        # Interpolated CSV columns depend on the following row, so are not streamed.
+        if params.get("stream") and not (csv_format and self._is_interpolated_frame_type(params)):
+            return self._stream(qs, params)
+        response_data = list(qs.values(*STATE_PROPERTIES, *STATE_LINK_FIELDS))
+        next_cursor = get_next_cursor(qs, params, response_data)
+        if next_cursor is not None:
+            self.response_headers["X-Next-Cursor"] = next_cursor
 
         t1 = datetime.datetime.now()
         response_data = _fill_m2m(response_data)
-        if self.request.accepted_renderer.format == "csv":
-            # CSV creation requires a bit more
-            user_ids = set([d["modified_by"] for d in response_data])
-            users = list(User.objects.filter(id__in=user_ids).values("id", "email"))
-            email_dict = {}
-            for user in users:
-                email_dict[user["id"]] = user["email"]
-
-            media_ids = set(media for d in response_data for media in d["media"])
-            medias = list(Media.objects.filter(id__in=media_ids).values("id", "name"))
-            filename_dict = {media["id"]: media["name"] for media in medias}
-
-            for element in response_data:
-                del element["type"]
-
-                oldAttributes = element["attributes"]
-                del element["attributes"]
-                element.update(oldAttributes)
-
-                user_id = element["modified_by"]
-                media_ids = element["media"]
-
-                element["user"] = email_dict[user_id]
-                element["media"] = [filename_dict[media_id] for media_id in media_ids]
-
-            if "type" in params:
-                type_object = StateType.objects.get(pk=params["type"])
-                if (
-                    type_object.association == "Frame"
-                    and type_object.interpolation == InterpolationMethods.LATEST
-                ):
-                    for idx, el in enumerate(response_data):
-                        mediaEl = Media.objects.get(pk=el["media"])
-                        endFrame = 0
-                        if idx + 1 < len(response_data):
-                            next_element = response_data[idx + 1]
-                            endFrame = next_element["frame"]
-                        else:
-                            endFrame = mediaEl.num_frames
-                        el["media"] = mediaEl.name
-
-                        el["endFrame"] = endFrame
-                        el["startSeconds"] = int(el["frame"]) * mediaEl.fps
-                        el["endSeconds"] = int(el["endFrame"]) * mediaEl.fps
+        if csv_format:
+            response_data = self._csv_rows(response_data, {}, {})
+
+            if self._is_interpolated_frame_type(params):
+                for idx, el in enumerate(response_data):
+                    mediaEl = Media.objects.get(pk=el["media"])
+                    endFrame = 0
+                    if idx + 1 < len(response_data):
+                        next_element = response_data[idx + 1]
+                        endFrame = next_element["frame"]
+                    else:
+                        endFrame = mediaEl.num_frames
+                    el["media"] = mediaEl.name
+
+                    el["endFrame"] = endFrame
+                    el["startSeconds"] = int(el["frame"]) * mediaEl.fps
+                    el["endSeconds"] = int(el["endFrame"]) * mediaEl.fps
         t2 = datetime.datetime.now()
         logger.info(f"Number of states: {len(response_data)}")
         logger.info(f"Time to get states: {t1-t0}")
@@ -313,24 +362,7 @@ class StateListAPI(BaseListView):
                         loc_relations = []
         State.localizations.through.objects.bulk_create(loc_relations, ignore_conflicts=True)
 
-        # Calculate segments (this is not triggered for bulk created m2m).
-        localization_ids = itertools.chain(
-            *[state_spec.get("localization_ids", []) for state_spec in state_specs]
-        )
-        loc_id_to_frame = {
-            loc["id"]: loc["frame"]
-            for loc in Localization.objects.filter(pk__in=localization_ids)
-            .values("id", "frame")
-            .iterator()
-        }
-        for state, state_spec in zip(states, state_specs):
-            frames = [loc_id_to_frame[loc_id] for loc_id in state_spec.get("localization_ids", [])]
-            if len(frames) > 0:
-                frames = np.sort(frames)
-                segments = np.split(frames, np.where(np.diff(frames) != 1)[0] + 1)
-                state.segments = [[int(segment[0]), int(segment[-1])] for segment in segments]
-        State.objects.bulk_update(states, ["segments"])
-
+        # Segments and denormalized ids are filled in by triggers on the relation tables.
         ids = bulk_log_creation(states, project, self.request.user)
 
         return {"message": f"Successfully created {len(ids)} states!", "id": ids}
@@ -421,19 +453,8 @@ class StateDetailBaseAPI(BaseDetailView):
     def get_qs(self, params, qs):
         if not qs.exists():
             raise Http404
-        state = qs.values(*STATE_PROPERTIES)[0]
-        # Get many to many fields.
-        state["localizations"] = list(
-            State.localizations.through.objects.filter(state_id=state["id"]).aggregate(
-                localizations=ArrayAgg("localization_id")
-            )["localizations"]
-        )
-        state["media"] = list(
-            State.media.through.objects.filter(state_id=state["id"]).aggregate(
-                media=ArrayAgg("media_id")
-            )["media"]
-        )
-        return state
+        state = qs.values(*STATE_PROPERTIES, *STATE_LINK_FIELDS)[0]
+        return _fill_m2m([state])[0]
 
     def patch_qs(self, params, qs):
         if not qs.exists():
@@ -58,6 +58,8 @@ class VideoFileListAPI(BaseListView):
             Resource.add_resource(body["path"], media)
             if role == "streaming":
                 Resource.add_resource(body["segment_info"], media)
+                if body.get("segment_index"):
+                    Resource.add_resource(body["segment_index"], media)
         return {"message": f"Media file in media object {media.id} created!"}
 
     def get_queryset(self):
@@ -112,6 +114,8 @@ class VideoFileDetailAPI(BaseDetailView):
             if role == "streaming":
                 old_segments = media_files[role][index]["segment_info"]
                 new_segments = body["segment_info"]
+                old_index = media_files[role][index].get("segment_index")
+                new_index = body.get("segment_index")
             media_files[role][index] = body
             qs.update(media_files=media_files)
         media = Media.objects.get(pk=params["id"])
@@ -124,6 +128,12 @@ class VideoFileDetailAPI(BaseDetailView):
                 drop_media_from_resource(old_segments, media)
                 safe_delete(old_segments, media.project.id)
                 Resource.add_resource(new_segments, media)
+            if old_index != new_index:
+                if old_index:
+                    drop_media_from_resource(old_index, media)
+                    safe_delete(old_index, media.project.id)
+                if new_index:
+                    Resource.add_resource(new_index, media)
         return {"message": f"Media file in media object {media.id} successfully updated!"}
 
     def _delete(self, params):
@@ -151,6 +161,9 @@ class VideoFileDetailAPI(BaseDetailView):
         if role == "streaming":
             drop_media_from_resource(deleted["segment_info"], media)
             safe_delete(deleted["segment_info"], media.project.id)
+            if deleted.get("segment_index"):
+                drop_media_from_resource(deleted["segment_index"], media)
+                safe_delete(deleted["segment_index"], media.project.id)
         return {"message": f'Media file in media object {params["id"]} successfully deleted!'}
 
     def get_queryset(self):
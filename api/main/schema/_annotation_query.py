@@ -92,3 +92,17 @@ annotation_filter_parameter_schema = [
         "schema": {"type": "integer", "minimum": 0, "maximum": 1, "default": 0},
     },
 ]
+
+annotation_stream_parameter_schema = [
+    {
+        "name": "stream",
+        "in": "query",
+        "required": False,
+        "description": "If given, results are read in chunks from a server-side cursor and "
+        "streamed to the client rather than assembled in memory first. `json` returns a "
+        "JSON array and `ndjson` returns one JSON object per line. CSV output (`format=csv`) "
+        "is streamed with either value. Pagination headers are not returned for streamed "
+        "responses.",
+        "schema": {"type": "string", "enum": ["json", "ndjson"]},
+    },
+]
@@ -118,6 +118,27 @@ attribute_filter_parameter_schema = [
     },
 ]
 
+cursor_parameter_schema = [
+    {
+        "name": "page_size",
+        "in": "query",
+        "required": False,
+        "description": "Enables cursor pagination and sets the maximum number of items to "
+        "return. When the page is full, the response includes an `X-Next-Cursor` header "
+        "that can be supplied as `cursor` to retrieve the next page. Takes precedence over "
+        "`start` and `stop`.",
+        "schema": {"type": "integer", "minimum": 1},
+    },
+    {
+        "name": "cursor",
+        "in": "query",
+        "required": False,
+        "description": "Opaque cursor returned in the `X-Next-Cursor` header of a previous "
+        "request with the same filters and sort order. Requires `page_size`.",
+        "schema": {"type": "string"},
+    },
+]
+
 related_attribute_filter_parameter_schema = [
     {
         "name": "related_attribute",
@@ -68,6 +68,8 @@ class CustomGenerator(SchemaGenerator):
                 "ConcatDefinition": concat_definition,
                 "ChangeLog": change_log,
                 "CloneMediaSpec": clone_media_spec,
+                "CloneMediaResponse": clone_media_response,
+                "CloneMediaStatus": clone_media_status,
                 "GetClonedMediaResponse": get_cloned_media_response,
                 "Applet": applet,
                 "AppletSpec": applet_spec,
@@ -2,7 +2,6 @@ from textwrap import dedent
 
 from rest_framework.schemas.openapi import AutoSchema
 
-from ._message import message_with_id_list_schema
 from ._errors import error_responses
 from ._attributes import attribute_filter_parameter_schema
 from ._media_query import media_filter_parameter_schema
@@ -27,8 +26,11 @@ class CloneMediaListSchema(AutoSchema):
         media type, and section in the given request body. Section is passed as
         a section name; if the given section does not exist, it will be created.
 
-        This endpoint will only clone up to 500 media per request. Use the `start`,
-        `stop`, or `after` parameters to paginate a request.
+        Up to 500 media are cloned before the response is returned. Larger
+        selections are cloned asynchronously in the background; the IDs of the
+        clones are returned immediately and the clones appear as cloning
+        progresses. The response then includes a `job_group` that can be
+        passed to `CloneMediaStatus` to find out when cloning is complete.
         """
         )
 
@@ -75,7 +77,75 @@ class CloneMediaListSchema(AutoSchema):
     def get_responses(self, path, method):
         responses = error_responses()
         if method == "POST":
-            responses["201"] = message_with_id_list_schema("cloned media list")
+            responses["201"] = {
+                "description": "Successful creation of cloned media list.",
+                "content": {
+                    "application/json": {
+                        "schema": {"$ref": "#/components/schemas/CloneMediaResponse"},
+                    }
+                },
+            }
+        return responses
+
+
+class CloneMediaStatusSchema(AutoSchema):
+    def get_operation(self, path, method):
+        operation = super().get_operation(path, method)
+        if method == "GET":
+            operation["operationId"] = "GetCloneMediaStatus"
+        operation["tags"] = ["Tator"]
+        return operation
+
+    def get_description(self, path, method):
+        return dedent(
+            """\
+        Get progress of an asynchronous media clone.
+
+        Returns the number of jobs in the job group returned by a `CloneMediaList`
+        request and how many of them finished or failed. Job groups are kept for
+        a week after their last update.
+        """
+        )
+
+    def get_path_parameters(self, path, method):
+        return [
+            {
+                "name": "project",
+                "in": "path",
+                "required": True,
+                "description": "A unique integer identifying the destination project.",
+                "schema": {"type": "integer"},
+            }
+        ]
+
+    def get_filter_parameters(self, path, method):
+        params = []
+        if method == "GET":
+            params = [
+                {
+                    "name": "job_group",
+                    "in": "query",
+                    "required": True,
+                    "description": "Name of the job group returned by `CloneMediaList`.",
+                    "schema": {"type": "string"},
+                }
+            ]
+        return params
+
+    def get_request_body(self, path, method):
+        return {}
+
+    def get_responses(self, path, method):
+        responses = error_responses()
+        if method == "GET":
+            responses["200"] = {
+                "description": "Progress of the clone.",
+                "content": {
+                    "application/json": {
+                        "schema": {"$ref": "#/components/schemas/CloneMediaStatus"},
+                    }
+                },
+            }
         return responses
 
 
@@ -30,7 +30,12 @@ from .bucket import (
     s3_config,
 )
 from .change_log import change_log
-from .clone_media import clone_media_spec, get_cloned_media_response
+from .clone_media import (
+    clone_media_spec,
+    clone_media_response,
+    clone_media_status,
+    get_cloned_media_response,
+)
 from .applet import applet
 from .applet import applet_spec
 from .download_info import download_info_spec
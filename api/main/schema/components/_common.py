@@ -46,6 +46,24 @@ create_list_response = {
                 "additionalProperties": True,
             },
         },
+        "errors": {
+            "type": "array",
+            "description": "List of objects that were not created, if partial creation was "
+            "requested.",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "index": {
+                        "type": "integer",
+                        "description": "Index of the object in the request body.",
+                    },
+                    "message": {
+                        "type": "string",
+                        "description": "Reason the object was not created.",
+                    },
+                },
+            },
+        },
     },
 }
 
@@ -76,6 +76,12 @@ video_definition = {
             "`streaming`.",
             "type": "string",
         },
+        "segment_index": {
+            "description": "Path to binary segment index containing the same information as "
+            "`segment_info` in fixed width arrays. Optional for media role `streaming`, used "
+            "in place of `segment_info` to find the segments of frames if present.",
+            "type": "string",
+        },
         "host": {
             "description": "If supplied will use this instead of currently connected "
             "host, e.g. https://example.com",
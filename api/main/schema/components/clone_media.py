@@ -22,6 +22,56 @@ clone_media_spec = {
 }
 
 
+clone_media_response = {
+    "type": "object",
+    "properties": {
+        "message": {
+            "type": "string",
+            "description": "Message indicating successful start of the clone.",
+        },
+        "id": {
+            "type": "array",
+            "description": "List of unique integers identifying the cloned media.",
+            "items": {"type": "integer"},
+        },
+        "job_group": {
+            "type": "string",
+            "nullable": True,
+            "description": "Name of the job group cloning the media in the background, or "
+            "null if the media were cloned before the response was returned. Pass it to the "
+            "`CloneMediaStatus` endpoint of the destination project to track progress.",
+        },
+    },
+}
+
+
+clone_media_status = {
+    "type": "object",
+    "properties": {
+        "job_group": {
+            "type": "string",
+            "description": "Name of the job group.",
+        },
+        "total": {
+            "type": "integer",
+            "description": "Number of jobs in the group.",
+        },
+        "finished": {
+            "type": "integer",
+            "description": "Number of jobs that cloned their media.",
+        },
+        "failed": {
+            "type": "integer",
+            "description": "Number of jobs that failed. Media of failed jobs were not cloned.",
+        },
+        "complete": {
+            "type": "boolean",
+            "description": "Whether every job in the group has finished or failed.",
+        },
+    },
+}
+
+
 get_cloned_media_response = {
     "type": "object",
     "properties": {
@@ -2,5 +2,10 @@ media_next = {
     "type": "object",
     "properties": {
         "next": {"type": "integer", "minimum": 0},
+        "next_ids": {
+            "type": "array",
+            "description": "IDs of up to `count` following media, nearest first.",
+            "items": {"type": "integer"},
+        },
     },
 }
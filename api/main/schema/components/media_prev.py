@@ -2,5 +2,10 @@ media_prev = {
     "type": "object",
     "properties": {
         "prev": {"type": "integer", "minimum": 0},
+        "prev_ids": {
+            "type": "array",
+            "description": "IDs of up to `count` preceding media, nearest first.",
+            "items": {"type": "integer"},
+        },
     },
 }
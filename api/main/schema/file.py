@@ -3,6 +3,7 @@ from textwrap import dedent
 from rest_framework.schemas.openapi import AutoSchema
 
 from ._attributes import attribute_filter_parameter_schema
+from ._attributes import cursor_parameter_schema
 from ._message import message_schema
 from ._message import message_with_id_schema
 from ._errors import error_responses
@@ -52,7 +53,11 @@ class FileListSchema(AutoSchema):
     def get_filter_parameters(self, path, method) -> list:
         params = []
         if method in ["GET"]:
-            params = file_filter_parameter_schema + attribute_filter_parameter_schema
+            params = (
+                file_filter_parameter_schema
+                + attribute_filter_parameter_schema
+                + cursor_parameter_schema
+            )
         return params
 
     def get_request_body(self, path, method):
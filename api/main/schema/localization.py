@@ -7,9 +7,13 @@ from ._message import message_with_id_list_schema
 from ._errors import error_responses
 from ._attributes import (
     attribute_filter_parameter_schema,
+    cursor_parameter_schema,
     related_attribute_filter_parameter_schema,
 )
-from ._annotation_query import annotation_filter_parameter_schema
+from ._annotation_query import (
+    annotation_filter_parameter_schema,
+    annotation_stream_parameter_schema,
+)
 
 localization_filter_schema = [
     {
@@ -63,7 +67,8 @@ class LocalizationListSchema(AutoSchema):
                 """\
             This method does a bulk create on a list of :class:`tator.models.LocalizationSpec`
             objects; it also accepts a single instance. A maximum of 500 localizations may be
-            created in one request.
+            created in one request, or 5000 with the `ingest` parameter. Use `ingest` when
+            creating many localizations, such as results of an algorithm.
             """
             )
         elif method == "PATCH":
@@ -109,6 +114,20 @@ class LocalizationListSchema(AutoSchema):
                 + localization_filter_schema
                 + related_attribute_filter_parameter_schema
             )
+        if method == "GET":
+            params = params + cursor_parameter_schema + annotation_stream_parameter_schema
+        if method == "POST":
+            params = [
+                {
+                    "name": "ingest",
+                    "in": "query",
+                    "required": False,
+                    "description": "If `True`, localizations are validated and written in bulk "
+                    "for high throughput. Localizations that fail validation are skipped and "
+                    "reported in `errors` instead of failing the request.",
+                    "schema": {"type": "boolean"},
+                },
+            ]
         return params
 
     def get_request_body(self, path, method):
@@ -123,7 +142,7 @@ class LocalizationListSchema(AutoSchema):
                                 {
                                     "type": "array",
                                     "items": {"$ref": "#/components/schemas/LocalizationSpec"},
-                                    "maxItems": 500,
+                                    "maxItems": 5000,
                                 },
                                 {
                                     "$ref": "#/components/schemas/LocalizationSpec",
@@ -8,6 +8,7 @@ from ._errors import error_responses
 from ._media_query import media_filter_parameter_schema
 from ._attributes import (
     attribute_filter_parameter_schema,
+    cursor_parameter_schema,
     related_attribute_filter_parameter_schema,
 )
 
@@ -93,6 +94,8 @@ class MediaListSchema(AutoSchema):
                 + attribute_filter_parameter_schema
                 + related_attribute_filter_parameter_schema
             )
+        if method == "GET":
+            params = params + cursor_parameter_schema
         if method in ["GET", "PUT"]:
             params += [
                 {
@@ -48,6 +48,16 @@ class MediaPrevSchema(AutoSchema):
                 media_filter_parameter_schema
                 + attribute_filter_parameter_schema
                 + related_attribute_filter_parameter_schema
+                + [
+                    {
+                        "name": "count",
+                        "in": "query",
+                        "required": False,
+                        "description": "Number of preceding media IDs to return in `prev_ids`, "
+                        "e.g. for prefetching.",
+                        "schema": {"type": "integer", "minimum": 1, "maximum": 100, "default": 1},
+                    }
+                ]
             )
         return params
 
@@ -7,9 +7,13 @@ from ._message import message_with_id_list_schema
 from ._message import message_schema
 from ._attributes import (
     attribute_filter_parameter_schema,
+    cursor_parameter_schema,
     related_attribute_filter_parameter_schema,
 )
-from ._annotation_query import annotation_filter_parameter_schema
+from ._annotation_query import (
+    annotation_filter_parameter_schema,
+    annotation_stream_parameter_schema,
+)
 
 boilerplate = dedent(
     """\
@@ -88,6 +92,8 @@ class StateListSchema(AutoSchema):
                 + attribute_filter_parameter_schema
                 + related_attribute_filter_parameter_schema
             )
+        if method == "GET":
+            params = params + cursor_parameter_schema + annotation_stream_parameter_schema
         return params
 
     def get_request_body(self, path, method):
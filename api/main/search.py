@@ -4,11 +4,13 @@ import datetime
 from copy import deepcopy
 from uuid import uuid1
 import re
+import threading
 import time
 import psycopg2
 from psycopg2 import sql
 
-from .worker import push_job
+from .connections import record_connection_event
+from .worker import push_job, push_jobs
 
 from django.db import connection
 
@@ -29,15 +31,46 @@ ALLOWED_MUTATIONS = {
 }
 
 
+_local = threading.local()
+
+
+def _is_usable(conn):
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except psycopg2.Error:
+        return False
+    return True
+
+
 def get_connection(db_name):
+    """Returns an autocommit connection to the given database, reused by the calling thread
+    for as long as it is usable. Each statement runs in its own transaction, so the connection
+    also works behind pgbouncer in transaction pooling mode.
+    """
+    if not hasattr(_local, "connections"):
+        _local.connections = {}
+    conn = _local.connections.get(db_name)
+    if conn is not None:
+        if _is_usable(conn):
+            record_connection_event("reused", "search")
+            return conn
+        record_connection_event("unusable", "search")
+        conn.close()
+
     conn = psycopg2.connect(
         database=db_name,
         host=os.getenv("POSTGRES_HOST"),
+        port=os.getenv("POSTGRES_PORT", 5432),
         user=os.getenv("POSTGRES_USER"),
         password=os.getenv("POSTGRES_PASSWORD"),
     )
 
     conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    record_connection_event("created", "search")
+    _local.connections[db_name] = conn
     return conn
 
 
@@ -777,10 +810,13 @@ class TatorSearch:
     def delete_project_indices(self, project):
         """Delete all indices synchronously"""
         proj_indices = self.list_indices(project)
-        for _, index_name, _ in proj_indices:
-            push_job(
-                "db_jobs", delete_psql_index, args=(connection.settings_dict["NAME"], index_name)
-            )
+        push_jobs(
+            "db_jobs",
+            [
+                {"func": delete_psql_index, "args": (connection.settings_dict["NAME"], index_name)}
+                for _, index_name, _ in proj_indices
+            ],
+        )
 
     def delete_index(self, entity_type, attribute):
         """Delete the index for a given entity type"""
@@ -823,24 +859,28 @@ class TatorSearch:
             result = cursor.fetchall()
             return bool(result)
 
-    def create_psql_index(self, entity_type, attribute, flush=False, concurrent=True):
-        """Create a psql index for the given attribute"""
+    def create_psql_index(self, entity_type, attribute, flush=False, concurrent=True, jobs=None):
+        """Create a psql index for the given attribute
+
+        :param jobs: Optional list that index jobs are appended to instead of being enqueued, so
+                     the caller can enqueue them together with `push_jobs`.
+        """
 
         # Handle btrees too
         if attribute["dtype"] == "string":
             temp_attr = {**attribute}
             temp_attr["dtype"] = "string_btree"
-            self.create_psql_index(entity_type, temp_attr, flush, concurrent)
+            self.create_psql_index(entity_type, temp_attr, flush, concurrent, jobs)
 
         if attribute["dtype"] == "native_string":
             temp_attr = {**attribute}
             temp_attr["dtype"] = "native_string_btree"
-            self.create_psql_index(entity_type, temp_attr, flush, concurrent)
+            self.create_psql_index(entity_type, temp_attr, flush, concurrent, jobs)
 
         if attribute["dtype"] == "upper_string":
             temp_attr = {**attribute}
             temp_attr["dtype"] = "upper_string_btree"
-            self.create_psql_index(entity_type, temp_attr, flush, concurrent)
+            self.create_psql_index(entity_type, temp_attr, flush, concurrent, jobs)
 
         index_name = _get_unique_index_name(entity_type, attribute)
         if self.is_index_present(entity_type, attribute) and flush == False:
@@ -856,10 +896,9 @@ class TatorSearch:
 
         table_name = entity_type._meta.db_table.replace("type", "")
         index_name = _get_unique_index_name(entity_type, attribute)
-        push_job(
-            "db_jobs",
-            index_func,
-            args=(
+        job = {
+            "func": index_func,
+            "args": (
                 connection.settings_dict["NAME"],
                 entity_type.project.id,
                 entity_type.id,
@@ -869,50 +908,69 @@ class TatorSearch:
                 flush,
                 concurrent,
             ),
-            result_ttl=0,
-        )
+            "result_ttl": 0,
+        }
+        if jobs is None:
+            push_jobs("db_jobs", [job])
+        else:
+            jobs.append(job)
+
+    def create_mapping(self, entity_type, flush=False, concurrent=True, jobs=None):
+        """Creates psql indices for the built in fields and attributes of an entity type.
 
-    def create_mapping(self, entity_type, flush=False, concurrent=True):
+        :param jobs: Optional list that index jobs are appended to instead of being enqueued.
+                     Otherwise they are enqueued together as one job group.
+        """
         from .models import BUILT_IN_INDICES
 
+        pending = [] if jobs is None else jobs
+
         # Add project specific indices based on the type being indexed
         built_ins = BUILT_IN_INDICES.get(type(entity_type), [])
         for built_in in built_ins:
-            self.create_psql_index(entity_type, built_in, flush=flush, concurrent=concurrent)
+            self.create_psql_index(entity_type, built_in, flush, concurrent, pending)
 
         for attribute in entity_type.attribute_types:
-            self.create_psql_index(entity_type, attribute, flush=flush, concurrent=concurrent)
+            self.create_psql_index(entity_type, attribute, flush, concurrent, pending)
+
+        if jobs is None:
+            table_name = entity_type._meta.db_table.replace("type", "")
+            push_jobs("db_jobs", pending, group=f"{table_name}_{entity_type.id}_{uuid1()}")
 
     def create_section_index(self, project, flush=False, concurrent=True):
         btree_index_name = f"tator_proj_{project.pk}_internalv2_path_btree"
         gist_index_name = f"tator_proj_{project.pk}_internalv2_path_gist"
+        jobs = []
         if self.is_index_present_by_name(btree_index_name) is False or flush is True:
-            push_job(
-                "db_jobs",
-                make_section_path_btree_index,
-                args=(
-                    connection.settings_dict["NAME"],
-                    project.pk,
-                    btree_index_name,
-                    flush,
-                    concurrent,
-                ),
-                result_ttl=0,
+            jobs.append(
+                {
+                    "func": make_section_path_btree_index,
+                    "args": (
+                        connection.settings_dict["NAME"],
+                        project.pk,
+                        btree_index_name,
+                        flush,
+                        concurrent,
+                    ),
+                    "result_ttl": 0,
+                }
             )
 
         if self.is_index_present_by_name(gist_index_name) is False or flush is True:
-            push_job(
-                "db_jobs",
-                make_section_path_gist_index,
-                args=(
-                    connection.settings_dict["NAME"],
-                    project.pk,
-                    gist_index_name,
-                    flush,
-                    concurrent,
-                ),
-                result_ttl=0,
+            jobs.append(
+                {
+                    "func": make_section_path_gist_index,
+                    "args": (
+                        connection.settings_dict["NAME"],
+                        project.pk,
+                        gist_index_name,
+                        flush,
+                        concurrent,
+                    ),
+                    "result_ttl": 0,
+                }
             )
+        push_jobs("db_jobs", jobs)
 
     def rename_alias(self, entity_type, old_name, new_name):
         """
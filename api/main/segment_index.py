@@ -0,0 +1,115 @@
+""" Compact binary index of the segments of a fragmented mp4.
+
+The index is the `segment_info` json of a streaming file stored as fixed width arrays, so it
+can be memory mapped and searched with `bisect` instead of being parsed. The layout is a
+16 byte header of magic, segment count, moof count and a reserved word, followed by little
+endian int64 arrays of:
+
+- segment offset, size, frame_start and frame_samples (-1 where the segment has none);
+- moof segment position, frame_start and frame_samples, in file order.
+"""
+
+from bisect import bisect_right
+import array
+import mmap
+import struct
+import sys
+
+MAGIC = b"TSI1"
+_HEADER = struct.Struct("<4sIII")
+_MISSING = -1
+
+
+def make_segment_index(segment_info):
+    """Packs a parsed `segment_info` json into a binary segment index.
+
+    :param segment_info: Dict with a list of `segments`, each with a `name`, `offset` and
+                         `size`, and `frame_start` and `frame_samples` where applicable.
+    :returns: The index as bytes.
+    """
+    segments = segment_info["segments"]
+    moofs = [(idx, segment) for idx, segment in enumerate(segments) if segment["name"] == "moof"]
+    columns = [
+        [segment["offset"] for segment in segments],
+        [segment["size"] for segment in segments],
+        [segment.get("frame_start", _MISSING) for segment in segments],
+        [segment.get("frame_samples", _MISSING) for segment in segments],
+        [idx for idx, _ in moofs],
+        [moof["frame_start"] for _, moof in moofs],
+        [moof["frame_samples"] for _, moof in moofs],
+    ]
+    values = array.array("q")
+    for column in columns:
+        values.extend(column)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return _HEADER.pack(MAGIC, len(segments), len(moofs), 0) + values.tobytes()
+
+
+class SegmentIndex:
+    """Read only view of a binary segment index, backed by bytes or a memory map."""
+
+    def __init__(self, buffer):
+        magic, num_segments, num_moofs, _ = _HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Buffer is not a segment index!")
+        expected = _HEADER.size + 8 * (4 * num_segments + 3 * num_moofs)
+        if len(buffer) < expected:
+            raise ValueError(f"Segment index is truncated ({len(buffer)} < {expected} bytes)!")
+        view = memoryview(buffer)[_HEADER.size : expected]
+        if sys.byteorder == "little":
+            values = view.cast("q")
+        else:
+            values = array.array("q", view.tobytes())
+            values.byteswap()
+        self._buffer = buffer
+        self.num_segments = num_segments
+        self.num_moofs = num_moofs
+        bounds = [num_segments] * 4 + [num_moofs] * 3
+        columns = []
+        start = 0
+        for size in bounds:
+            columns.append(values[start : start + size])
+            start += size
+        (
+            self.offset,
+            self.size,
+            self.frame_start,
+            self.frame_samples,
+            self.moof_segment,
+            self.moof_frame_start,
+            self.moof_frame_samples,
+        ) = columns
+
+    @classmethod
+    def from_segment_info(cls, segment_info):
+        """Builds an index from a parsed `segment_info` json."""
+        return cls(make_segment_index(segment_info))
+
+    @classmethod
+    def open(cls, path):
+        """Memory maps an index file."""
+        with open(path, "rb") as index_file:
+            return cls(mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @property
+    def nbytes(self):
+        return len(self._buffer)
+
+    def segment(self, idx):
+        """Returns a segment as a dict in the form of the `segment_info` json."""
+        segment = {"offset": self.offset[idx], "size": self.size[idx]}
+        if self.frame_start[idx] != _MISSING:
+            segment["frame_start"] = self.frame_start[idx]
+        if self.frame_samples[idx] != _MISSING:
+            segment["frame_samples"] = self.frame_samples[idx]
+        return segment
+
+    def find_moof(self, frame):
+        """Returns the position in the moof arrays of the moof containing a frame, or None if
+        the frame is outside of all moofs.
+        """
+        idx = bisect_right(self.moof_frame_start, frame) - 1
+        if idx < 0 or frame >= self.moof_frame_start[idx] + self.moof_frame_samples[idx]:
+            return None
+        return idx
@@ -1,17 +1,25 @@
 from abc import ABC, abstractmethod
+import base64
+from collections import defaultdict
 from copy import deepcopy
 from datetime import datetime, timedelta
 from enum import Enum, unique
+from functools import lru_cache
+import hashlib
+import hmac
 import json
 import logging
 from oci.object_storage import ObjectStorageClient
 from oci.object_storage.models import RenameObjectDetails
 import os
+import threading
+import time
 from typing import IO, List, Optional, Tuple, Union
-from urllib.parse import urlsplit, urlunsplit
+from urllib.parse import parse_qs, quote, urlsplit, urlunsplit
 
 import boto3
 from botocore.client import Config
+from botocore.credentials import Credentials as BotoCredentials
 from google.cloud import storage
 from google.oauth2.service_account import Credentials
 
@@ -21,6 +29,7 @@ logger = logging.getLogger(__name__)
 ARCHIVE_KEY = "archive"
 MEDIA_ID_KEY = "media_id"
 PATH_KEYS = ["streaming", "archival", "audio", "image"]
+LIST_PAGE_SIZE = 1000
 
 
 @unique
@@ -112,6 +121,171 @@ def _client_from_config(
     raise ValueError(f"Received unhandled store type '{store_type}'")
 
 
+SIGV4_TIMESTAMP = "%Y%m%dT%H%M%SZ"
+
+
+@lru_cache(maxsize=256)
+def _sigv4_signing_key(secret_key, date, region, service):
+    """Derives the SigV4 signing key, which only changes per day, region and service."""
+    key = f"AWS4{secret_key}".encode()
+    for msg in [date, region, service, "aws4_request"]:
+        key = hmac.new(key, msg.encode(), hashlib.sha256).digest()
+    return key
+
+
+class _LocalPresigner:
+    """Computes presigned GET urls for S3 compatible stores without going through boto.
+
+    The url layout (endpoint, addressing style, signature version and region) is taken
+    from a url presigned by the boto client, and the presigner is only used if it
+    reproduces that url exactly.
+    """
+
+    PROBE_KEY = "tator/presign probe+~é.mp4"
+    PROBE_EXPIRATION = 3600
+
+    def __init__(self, base_url, bucket_name, version, region, service, credentials):
+        self._base_url = base_url
+        self._bucket_name = bucket_name
+        self._version = version
+        self._region = region
+        self._service = service
+        self._credentials = credentials
+        split = urlsplit(base_url)
+        if split.port in [None, {"http": 80, "https": 443}.get(split.scheme)]:
+            self._host = split.hostname
+        else:
+            self._host = split.netloc
+
+    @classmethod
+    def from_client(cls, client, bucket_name, credentials):
+        """Returns a presigner matching the given client and its frozen credentials, or None
+        if urls presigned by the client cannot be reproduced locally.
+        """
+        url = client.generate_presigned_url(
+            ClientMethod="get_object",
+            Params={"Bucket": bucket_name, "Key": cls.PROBE_KEY},
+            ExpiresIn=cls.PROBE_EXPIRATION,
+        )
+        split = urlsplit(url)
+        quoted_key = quote(cls.PROBE_KEY.encode(), safe="/~")
+        if not split.path.endswith(quoted_key):
+            return None
+        base_url = urlunsplit(split._replace(path=split.path[: -len(quoted_key)], query=""))
+        query = parse_qs(split.query)
+        if "X-Amz-Credential" in query:
+            _, _, region, service, _ = query["X-Amz-Credential"][0].split("/")
+            presigner = cls(base_url, bucket_name, "s3v4", region, service, credentials)
+            now = datetime.strptime(query["X-Amz-Date"][0], SIGV4_TIMESTAMP)
+        elif "AWSAccessKeyId" in query:
+            presigner = cls(base_url, bucket_name, "s3", None, None, credentials)
+            now = int(query["Expires"][0]) - cls.PROBE_EXPIRATION
+        else:
+            return None
+        if presigner.presign(cls.PROBE_KEY, cls.PROBE_EXPIRATION, now) != url:
+            logger.warning(f"Presigned urls for bucket {bucket_name} will be generated by boto")
+            return None
+        return presigner
+
+    def presign(self, key, expiration, now=None):
+        """Returns a presigned GET url for the given key.
+
+        :param now: Signing time, a naive UTC datetime for SigV4 or epoch seconds for SigV2.
+                    Defaults to the current time.
+        """
+        url = self._base_url + quote(key.encode(), safe="/~")
+        if self._version == "s3v4":
+            return self._presign_v4(url, expiration, now or datetime.utcnow())
+        return self._presign_v2(url, expiration, time.time() if now is None else now)
+
+    def _presign_v4(self, url, expiration, now):
+        timestamp = now.strftime(SIGV4_TIMESTAMP)
+        date = timestamp[:8]
+        scope = f"{date}/{self._region}/{self._service}/aws4_request"
+        params = [
+            ("X-Amz-Algorithm", "AWS4-HMAC-SHA256"),
+            ("X-Amz-Credential", f"{self._credentials.access_key}/{scope}"),
+            ("X-Amz-Date", timestamp),
+            ("X-Amz-Expires", str(expiration)),
+            ("X-Amz-SignedHeaders", "host"),
+        ]
+        if self._credentials.token is not None:
+            params.append(("X-Amz-Security-Token", self._credentials.token))
+        query = "&".join(f"{k}={quote(v, safe='-_.~')}" for k, v in params)
+        canonical_query = "&".join(sorted(query.split("&")))
+        canonical_request = "\n".join(
+            [
+                "GET",
+                urlsplit(url).path,
+                canonical_query,
+                f"host:{self._host}\n",
+                "host",
+                "UNSIGNED-PAYLOAD",
+            ]
+        )
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                timestamp,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            ]
+        )
+        key = _sigv4_signing_key(self._credentials.secret_key, date, self._region, self._service)
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{url}?{query}&X-Amz-Signature={signature}"
+
+    def _presign_v2(self, url, expiration, now):
+        expires = str(int(now + int(expiration)))
+        path = urlsplit(url).path
+        # The canonical resource always includes the bucket name.
+        if not path.startswith(f"/{self._bucket_name}/"):
+            path = f"/{self._bucket_name}{path}"
+        string_to_sign = f"GET\n\n\n{expires}\n"
+        if self._credentials.token:
+            string_to_sign += f"x-amz-security-token:{self._credentials.token}\n"
+        string_to_sign += path
+        digest = hmac.new(
+            self._credentials.secret_key.encode(), string_to_sign.encode(), hashlib.sha1
+        ).digest()
+        params = [
+            ("AWSAccessKeyId", self._credentials.access_key),
+            ("Signature", base64.b64encode(digest).decode()),
+        ]
+        if self._credentials.token:
+            params.append(("x-amz-security-token", self._credentials.token))
+        params.append(("Expires", expires))
+        query = "&".join(f"{k}={quote(v, safe='-_.~')}" for k, v in params)
+        return f"{url}?{query}"
+
+
+_presigners = {}
+
+
+def _get_local_presigner(client, bucket_name):
+    """Returns a cached local presigner for the given client and bucket, or None."""
+    credentials = getattr(client._request_signer, "_credentials", None)
+    # Refreshable credentials may rotate between calls, so leave them to boto.
+    if type(credentials) is not BotoCredentials:
+        return None
+    credentials = credentials.get_frozen_credentials()
+    key = (
+        client.meta.endpoint_url,
+        client.meta.region_name,
+        client.meta.config.signature_version,
+        repr(client.meta.config.s3),
+        bucket_name,
+        credentials,
+    )
+    if key not in _presigners:
+        try:
+            _presigners[key] = _LocalPresigner.from_client(client, bucket_name, credentials)
+        except Exception:
+            logger.warning("Could not set up local presigning", exc_info=True)
+            _presigners[key] = None
+    return _presigners[key]
+
+
 class TatorStorage(ABC):
     """Interface for object storage."""
 
@@ -207,6 +381,10 @@ class TatorStorage(ABC):
     def get_download_url(self, path: str, expiration: int) -> str:
         """Gets the presigned url for accessing an object"""
 
+    def get_download_urls(self, paths: List[str], expiration: int) -> dict:
+        """Gets presigned urls for accessing several objects, keyed by path"""
+        return {path: self.get_download_url(path, expiration) for path in paths}
+
     @abstractmethod
     def _get_multiple_upload_urls(
         self, key: str, expiration: int, num_parts: int, domain: str
@@ -238,6 +416,49 @@ class TatorStorage(ABC):
         """
         return self.head_object(path, quiet=True).get("ContentLength", -1)
 
+    def get_sizes(self, paths: List[str]) -> dict:
+        """
+        Returns the sizes of several objects keyed by path, -1 for those that do not exist. Objects
+        are listed once per directory instead of being checked one at a time. If listing a
+        directory fails, its objects are checked one at a time so a listing error is not reported
+        as missing objects.
+        """
+        sizes = {}
+        keys_by_prefix = defaultdict(dict)
+        for path in paths:
+            key = self.path_to_key(path)
+            if "/" in key:
+                keys_by_prefix[key[: key.rfind("/") + 1]][key] = path
+            else:
+                sizes[path] = self.get_size(path)
+        for prefix, keys in keys_by_prefix.items():
+            listed = {}
+            kwargs = {}
+            try:
+                while True:
+                    page = self._list_objects_v2(prefix, **kwargs)
+                    new = [obj for obj in page if obj["Key"] not in listed]
+                    listed.update((obj["Key"], obj["Size"]) for obj in new)
+                    if len(page) < LIST_PAGE_SIZE or not new:
+                        break
+                    kwargs["StartAfter"] = page[-1]["Key"]
+            except Exception:
+                logger.warning(
+                    f"Listing {prefix} failed, checking sizes individually", exc_info=True
+                )
+                sizes.update((path, self.get_size(path)) for path in keys.values())
+                continue
+            sizes.update((path, listed.get(key, -1)) for key, path in keys.items())
+        return sizes
+
+    def copy_from(self, source: "TatorStorage", path: str) -> bool:
+        """
+        Copies an object from another store to the same path in this one within the provider, so
+        its contents do not pass through this process. Returns False if the stores cannot copy
+        between each other, in which case the object must be streamed instead.
+        """
+        return False
+
     def list_objects_v2(self, prefix: Optional[str] = None, **kwargs) -> list:
         """
         Returns an object list in the style of the Contents key from boto3.client.list_objects_v2
@@ -386,6 +607,18 @@ class MinIOStorage(TatorStorage):
             ExtraArgs=extra_args,
         )
 
+    def copy_from(self, source, path):
+        if not isinstance(source, MinIOStorage):
+            return False
+        if source.client.meta.endpoint_url != self.client.meta.endpoint_url:
+            return False
+        self.client.copy(
+            CopySource={"Bucket": source.bucket_name, "Key": source.path_to_key(path)},
+            Bucket=self.bucket_name,
+            Key=self.path_to_key(path),
+        )
+        return True
+
     def restore_object(self, path, live_storage_class, min_exp_days):
         self._update_storage_class(path, live_storage_class)
 
@@ -394,12 +627,16 @@ class MinIOStorage(TatorStorage):
 
     def get_download_url(self, path, expiration):
         """Gets the presigned url for accessing an object"""
-        # Generate presigned url.
-        url = self.client.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": self.bucket_name, "Key": self.path_to_key(path)},
-            ExpiresIn=expiration,
-        )
+        # Generate presigned url, locally if the client's urls can be reproduced.
+        presigner = _get_local_presigner(self.client, self.bucket_name)
+        if presigner is None:
+            url = self.client.generate_presigned_url(
+                ClientMethod="get_object",
+                Params={"Bucket": self.bucket_name, "Key": self.path_to_key(path)},
+                ExpiresIn=expiration,
+            )
+        else:
+            url = presigner.presign(self.path_to_key(path), expiration)
         # Replace host if external host is given.
         if self.external_host:
             parsed = urlsplit(url)
@@ -590,6 +827,17 @@ class GCPStorage(TatorStorage):
             new_name=self.path_to_key(dest_path),
         )
 
+    def copy_from(self, source, path):
+        if not isinstance(source, GCPStorage):
+            return False
+        source_blob = self.client.bucket(source.bucket_name).blob(source.path_to_key(path))
+        blob = self.gcs_bucket.blob(self.path_to_key(path))
+        # Large objects are rewritten over several calls.
+        token, _, _ = blob.rewrite(source_blob)
+        while token is not None:
+            token, _, _ = blob.rewrite(source_blob, token=token)
+        return True
+
     def delete_object(self, path):
         self.gcs_bucket.delete_blob(self.path_to_key(path))
 
@@ -656,12 +904,18 @@ class GCPStorage(TatorStorage):
         self._update_storage_class(path, desired_storage_class)
 
 
+_store_pool = {}
+_store_pool_lock = threading.Lock()
+_store_pool_stats = {"hits": 0, "misses": 0}
+
+
 def get_tator_store(
     bucket=None, connect_timeout=5, read_timeout=5, max_attempts=5, upload=False, backup=False
 ) -> TatorStorage:
     """
     Determines the type of object store required by the given bucket and returns it. All returned
-    objects are subclasses of the base class TatorStorage.
+    objects are subclasses of the base class TatorStorage. Stores are shared within a process, so
+    their clients and connections are reused across calls.
 
     :param bucket: The bucket to use for accessing object storage.
     :type bucket: models.Bucket
@@ -734,22 +988,64 @@ def get_tator_store(
             f"Received bucket {bucket} as input, which is missing its `config` field."
         )
 
+    # Stores are pooled by everything used to construct them, so a bucket whose row was edited in
+    # another process misses instead of reusing a stale client.
+    config_hash = hashlib.sha256(
+        json.dumps(
+            [
+                store_type.value,
+                config,
+                bucket_name,
+                external_host,
+                bucket and [bucket.archive_sc, bucket.live_sc],
+                connect_timeout,
+                read_timeout,
+                max_attempts,
+            ],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+    key = (bucket.id if bucket else bucket_type, config_hash)
+    with _store_pool_lock:
+        store = _store_pool.get(key)
+        if store is not None:
+            _store_pool_stats["hits"] += 1
+            return store
+        _store_pool_stats["misses"] += 1
+
     client = _client_from_config(
         store_type, config, bucket_name, connect_timeout, read_timeout, max_attempts
     )
-    return TatorStorage.get_tator_store(store_type, bucket, client, bucket_name, external_host)
+    store = TatorStorage.get_tator_store(store_type, bucket, client, bucket_name, external_host)
+    with _store_pool_lock:
+        return _store_pool.setdefault(key, store)
+
+
+def invalidate_tator_store(bucket_id=None):
+    """Drops pooled stores of the given bucket, or all pooled stores if no bucket is given."""
+    with _store_pool_lock:
+        if bucket_id is None:
+            _store_pool.clear()
+        else:
+            for key in [key for key in _store_pool if key[0] == bucket_id]:
+                del _store_pool[key]
+
+
+def get_store_pool_stats():
+    """Returns the hit and miss counts and the size of this process's store pool."""
+    with _store_pool_lock:
+        return {**_store_pool_stats, "size": len(_store_pool)}
 
 
 def get_storage_lookup(resources):
     """Returns a mapping between resource keys and TatorStorage objects."""
-    buckets = resources.values_list("bucket", flat=True).distinct()
+    buckets = set(resources.values_list("bucket", flat=True).distinct())
     # This is to avoid a circular import
     Bucket = resources.model._meta.get_field("bucket").related_model
     bucket_lookup = {
-        bucket: get_tator_store(Bucket.objects.get(pk=bucket)) if bucket else get_tator_store()
-        for bucket in buckets
-    }
-    return {
-        resource.path: bucket_lookup[resource.bucket.pk] if resource.bucket else bucket_lookup[None]
-        for resource in list(resources)
+        bucket.id: get_tator_store(bucket) for bucket in Bucket.objects.filter(pk__in=buckets)
     }
+    if None in buckets:
+        bucket_lookup[None] = get_tator_store()
+    return {path: bucket_lookup[bucket] for path, bucket in resources.values_list("path", "bucket")}
@@ -10,7 +10,9 @@ from uuid import uuid1, uuid4
 from math import sin, cos, sqrt, atan2, radians
 import re
 import requests
+import urllib.parse
 import io
+import tempfile
 import base64
 import unittest
 
@@ -20,20 +22,53 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.files.base import ContentFile
 from django.contrib.gis.geos import Point
 from minio import Minio
+from rq import Queue
 from minio.deleteobjects import DeleteObject
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APITransactionTestCase
 from dateutil.parser import parse as dateutil_parse
 from botocore.errorfactory import ClientError
-from main.throttles import BurstableThrottle
+from django_ltree.fields import PathValue
+from main.throttles import BurstableThrottle, _take_token
 
 from .backup import TatorBackupManager
+from .cache import TatorCache
+from .encoders import TatorJSONEncoder
 from .models import *
-from .search import TatorSearch, ALLOWED_MUTATIONS
-from .store import get_tator_store, PATH_KEYS
+from .prune import prune
+from .renderers import CsvRenderer, TatorRenderer
+from .rest._annotation_query import get_annotation_queryset
+from .rest._attribute_query import (
+    get_attribute_filter_ops,
+    get_attribute_psql_queryset_multi_type,
+)
+from .rest._attributes import bulk_mutate_attributes
+from .rest._leaf_index import get_ancestor_type
+from .rest._media_util import (
+    _DiskCache,
+    _MemoryCache,
+    _plan_ranges,
+    _record_lookup,
+    get_media_cache_stats,
+)
+from .rest._permissions import membership_permission
+from .rest._stream import iterate_chunks
+from .rest._util import cursor_paginate, get_next_cursor
+from .search import TatorSearch, ALLOWED_MUTATIONS, get_connection
+from .segment_index import SegmentIndex, make_segment_index
+from .store import (
+    get_tator_store,
+    get_store_pool_stats,
+    PATH_KEYS,
+    SIGV4_TIMESTAMP,
+    _get_local_presigner,
+)
 from .util import update_queryset_archive_state
+from .worker import _update_job_group, get_job_group, get_redis, push_jobs
 
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Q
 
 logger = logging.getLogger(__name__)
 
@@ -1050,6 +1085,28 @@ class AttributeTestMixin:
         if len(response.data) >= 2 and len(response1.data) >= 1:
             self.assertEqual(response.data[1], response1.data[0])
 
+    def test_cursor_pagination(self):
+        for sort_by in ["", "&sort_by=-Float Test", "&sort_by=Int Test&sort_by=-$id"]:
+            url = (
+                f"/rest/{self.list_uri}/{self.project.pk}"
+                f"?format=json&type={self.entity_type.pk}{sort_by}"
+            )
+            response = self.client.get(url)
+            assertResponse(self, response, status.HTTP_200_OK)
+            expected_ids = [r["id"] for r in response.data]
+            paged_ids = []
+            cursor = ""
+            while True:
+                response = self.client.get(f"{url}&page_size=2{cursor}")
+                assertResponse(self, response, status.HTTP_200_OK)
+                paged_ids += [r["id"] for r in response.data]
+                if "X-Next-Cursor" not in response:
+                    break
+                cursor = f"&cursor={response['X-Next-Cursor']}"
+            # Ties may be broken differently without a cursor, so compare membership.
+            self.assertEqual(len(paged_ids), len(set(paged_ids)))
+            self.assertEqual(sorted(paged_ids), sorted(expected_ids))
+
     def test_sorting(self):
         response = self.client.get(
             f"/rest/{self.list_uri}/{self.project.pk}"
@@ -2093,6 +2150,64 @@ class VideoTestCase(
         self.edit_permission = Permission.CAN_EDIT
         self.patch_json = {"name": "video1", "last_edit_start": "2017-07-21T17:32:28Z"}
 
+    def test_multi_type_attribute_filter(self):
+        other_type = MediaType.objects.create(
+            name="other video",
+            dtype="video",
+            project=self.project,
+            attribute_types=create_test_attribute_types(),
+        )
+        MediaType.objects.create(name="no attributes", dtype="video", project=self.project)
+        wait_for_indices(other_type)
+        other_entities = [
+            create_test_video(
+                self.user,
+                f"other{idx}",
+                other_type,
+                self.project,
+                attributes={"Float Test": random.random() * 1000},
+            )
+            for idx in range(random.randint(3, 6))
+        ]
+        float_vals = [e.attributes["Float Test"] for e in self.entities + other_entities]
+        for lbound in [0.0, 250.0, 500.0, 1000.0]:
+            response = self.client.get(
+                f"/rest/{self.list_uri}/{self.project.pk}?attribute_gte=Float Test::{lbound}&format=json"
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+            self.assertEqual(len(response.data), sum([v >= lbound for v in float_vals]))
+
+        # Types of a group get a branch each, implying the predicate of their partial indices.
+        params = {"attribute_gte": ["Float Test::0"]}
+        qs = get_attribute_psql_queryset_multi_type(
+            [self.entity_type, other_type],
+            Media.objects.filter(project=self.project),
+            params,
+            get_attribute_filter_ops(params, self.entity_type),
+        )
+        sql = str(qs.query)
+        for entity_type in [self.entity_type, other_type]:
+            self.assertIn(f'"main_media"."meta" = {entity_type.pk} AND', sql)
+
+    def test_csv_columns(self):
+        url = f"/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}&format=csv"
+        response = self.client.get(url)
+        assertResponse(self, response, status.HTTP_200_OK)
+        lines = response.content.decode().splitlines()
+        self.assertEqual(len(lines), len(self.entities) + 1)
+        header = lines[0].split(",")
+        self.assertNotIn("attributes", header)
+        for attribute_type in self.entity_type.attribute_types:
+            self.assertIn(attribute_type["name"], lines[0])
+        # Nested fields that only later entries have still get columns.
+        rows = [
+            {"id": 1, "media_files": None, "attributes": {"Int Test": 1}},
+            {"id": 2, "media_files": {"streaming": []}, "attributes": {"Extra": 2}},
+        ]
+        lines = CsvRenderer().render(rows).splitlines()
+        self.assertEqual(lines[0], "id,media_files,Int Test,streaming,Extra")
+        self.assertEqual(lines[1:], ["1,,1", "2,,,[],2"])
+
     def test_search(self):
         box_type = LocalizationType.objects.create(
             name="boxes",
@@ -2427,6 +2542,89 @@ class VideoTestCase(
         assertResponse(self, response, status.HTTP_200_OK)
         self.assertEqual(response.data, 0)
 
+    def test_media_caches(self):
+        memory = _MemoryCache(10)
+        memory.put("a", "a", 4)
+        memory.put("b", "b", 4)
+        memory.get("a")
+        memory.put("c", "c", 4)
+        self.assertEqual([memory.get(key) for key in "abc"], ["a", None, "c"])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            disk = _DiskCache("test", 10)
+            disk._dir = temp_dir
+            disk.put(("video", 0), b"1234")
+            disk.put(("video", 1), b"5678")
+            self.assertEqual(disk.get(("video", 0)), b"1234")
+            self.assertIsNone(disk.get(("video", 2)))
+            disk.put(("video", 2), b"9012")
+            self.assertEqual(disk.get(("video", 2)), b"9012")
+            num_cached = sum(disk.get(("video", idx)) is not None for idx in range(3))
+            self.assertLessEqual(num_cached * 4, 10)
+
+        _record_lookup("test", True)
+        _record_lookup("test", False)
+        self.assertEqual(get_media_cache_stats()["test"]["hit_rate"], 0.5)
+
+    def test_segment_index(self):
+        segments = [
+            {"name": "ftyp", "offset": 0, "size": 32},
+            {"name": "moov", "offset": 32, "size": 100},
+        ]
+        offset = 132
+        for idx in range(4):
+            segments.append(
+                {
+                    "name": "moof",
+                    "offset": offset,
+                    "size": 50,
+                    "frame_start": 10 + idx * 30,
+                    "frame_samples": 30,
+                }
+            )
+            segments.append({"name": "mdat", "offset": offset + 50, "size": 1000})
+            offset += 1050
+        with tempfile.NamedTemporaryFile() as index_file:
+            index_file.write(make_segment_index({"segments": segments}))
+            index_file.flush()
+            index = SegmentIndex.open(index_file.name)
+            self.assertEqual(index.num_segments, len(segments))
+            self.assertEqual(list(index.moof_segment), [2, 4, 6, 8])
+            for idx, segment in enumerate(segments):
+                segment.pop("name")
+                self.assertEqual(index.segment(idx), segment)
+            self.assertEqual(
+                [index.find_moof(frame) for frame in [9, 10, 39, 40, 129, 130]],
+                [None, 0, 0, 1, 3, None],
+            )
+        with self.assertRaises(ValueError):
+            SegmentIndex(b"\x00" * 16)
+
+    def test_media_next_prev(self):
+        by_name = sorted(self.entities, key=lambda media: (media.name, media.id))
+        by_float = sorted(self.entities, key=lambda media: -media.attributes["Float Test"])
+        for ordered, query in [(by_name, ""), (by_float, "&sort_by=-Float%20Test")]:
+            ids = [media.id for media in ordered]
+            for idx, media_id in enumerate(ids):
+                response = self.client.get(f"/rest/MediaNext/{media_id}?count=2{query}")
+                assertResponse(self, response, status.HTTP_200_OK)
+                self.assertEqual(response.data["next_ids"], ids[idx + 1 : idx + 3])
+                self.assertEqual(response.data["next"], ids[idx + 1] if idx + 1 < len(ids) else -1)
+                response = self.client.get(f"/rest/MediaPrev/{media_id}?count=2{query}")
+                assertResponse(self, response, status.HTTP_200_OK)
+                self.assertEqual(response.data["prev_ids"], ids[max(idx - 2, 0) : idx][::-1])
+                self.assertEqual(response.data["prev"], ids[idx - 1] if idx > 0 else -1)
+
+    def test_plan_ranges(self):
+        header = [(0, 32), (32, 100)]
+        segments = header + [(132, 50), (182, 1000), (1182, 50), (5000, 50)] + header
+        self.assertEqual(_plan_ranges(segments, 0, 10000), [(0, 1231), (5000, 5049)])
+        self.assertEqual(_plan_ranges(segments, 4000, 10000), [(0, 5049)])
+        self.assertEqual(
+            _plan_ranges(segments, 0, 1000), [(0, 181), (182, 1181), (1182, 1231), (5000, 5049)]
+        )
+        self.assertEqual(_plan_ranges([(0, 100), (50, 100), (10, 0)], 0, 1000), [(0, 149)])
+
 
 class ImageTestCase(
     TatorTransactionTest,
@@ -2552,6 +2750,197 @@ class LocalizationBoxTestCase(
         self.edit_permission = Permission.CAN_EDIT
         self.patch_json = {"name": "box1", "in_place": 1}
 
+    def test_stream(self):
+        url = f"/rest/{self.list_uri}/{self.project.pk}?type={self.entity_type.pk}"
+        response = self.client.get(f"{url}&format=json")
+        assertResponse(self, response, status.HTTP_200_OK)
+        expected = json.loads(json.dumps(response.data, cls=TatorJSONEncoder))
+
+        response = self.client.get(f"{url}&stream=json")
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), expected)
+
+        response = self.client.get(f"{url}&stream=ndjson")
+        assertResponse(self, response, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+        response = self.client.get(f"{url}&stream=json&format=csv")
+        assertResponse(self, response, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), len(self.entities) + 1)
+        self.assertIn("Float Test", lines[0])
+
+    def test_ingest(self):
+        bad_attributes = {**self.create_json[0]["attributes"], "Int Test": "asdf"}
+        body = [
+            {**self.create_json[0], "frame": idx, "attributes": {"Int Test": idx}}
+            for idx in range(5)
+        ]
+        body.insert(2, {**self.create_json[0], "attributes": bad_attributes})
+        body.insert(4, {**self.create_json[0], "media_id": -1})
+        body.insert(6, {**self.create_json[0], "elemental_id": "not a uuid"})
+        response = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}?ingest=1", body, format="json"
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["id"]), 5)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [2, 4, 6])
+
+        created = Localization.objects.filter(pk__in=response.data["id"]).order_by("frame")
+        expected = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}", body[:1], format="json"
+        ).data["id"][0]
+        expected = Localization.objects.get(pk=expected)
+        for idx, loc in enumerate(created):
+            self.assertEqual(loc.frame, idx)
+            self.assertEqual(loc.attributes["Int Test"], idx)
+            self.assertEqual(loc.attributes["String Test"], "asdf_default")
+            self.assertEqual(loc.mark, 0)
+            self.assertEqual(loc.latest_mark, 0)
+            self.assertEqual(loc.version, expected.version)
+            self.assertEqual(loc.user, self.user)
+            change = ChangeToObject.objects.get(ref_id=loc.id).change_id
+            self.assertEqual(
+                change.description_of_change,
+                json.loads(json.dumps(loc.create_dict, cls=TatorJSONEncoder)),
+            )
+
+        # Supplied elemental IDs still get marks from the triggers.
+        elemental_id = str(created[0].elemental_id)
+        response = self.client.post(
+            f"/rest/{self.list_uri}/{self.project.pk}?ingest=1",
+            [{**body[0], "elemental_id": elemental_id, "version": expected.version.pk}],
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        loc = Localization.objects.get(pk=response.data["id"][0])
+        self.assertEqual(loc.mark, 1)
+        self.assertEqual(Localization.objects.get(pk=created[0].pk).latest_mark, 1)
+
+    def test_prune(self):
+        pruned = [loc.pk for loc in self.entities[:3]]
+        kept = self.entities[3]
+        state_type = StateType.objects.create(
+            project=self.project, name="tracks", association="Localization"
+        )
+        state = State.objects.create(
+            project=self.project, type=state_type, version=self.project.version_set.all()[0]
+        )
+        state.localizations.add(*self.entities[:4])
+        thumbnail = create_test_video(self.user, "thumb", self.media_entities[0].type, self.project)
+        Localization.objects.filter(pk=pruned[0]).update(thumbnail_image=thumbnail)
+        Localization.objects.filter(pk=kept.pk).update(parent=pruned[1])
+        change = ChangeLog.objects.create(
+            project=self.project, user=self.user, description_of_change={}
+        )
+        ref_table = ContentType.objects.get_for_model(Localization)
+        ChangeToObject.objects.create(ref_table=ref_table, ref_id=pruned[2], change_id=change)
+        Localization.objects.filter(pk__in=pruned).update(deleted=True)
+
+        num_deleted = prune(
+            Localization,
+            Q(project=self.project, deleted=True),
+            f"test_prune_{uuid1()}",
+            chunk_size=2,
+            restart=True,
+        )
+        self.assertEqual(num_deleted, 3)
+        self.assertFalse(Localization.objects.filter(pk__in=pruned).exists())
+        self.assertEqual(
+            Localization.objects.filter(project=self.project).count(), len(self.entities) - 3
+        )
+        state.refresh_from_db()
+        self.assertEqual(state.localization_ids, [kept.pk])
+        self.assertIsNone(Localization.objects.get(pk=kept.pk).parent)
+        self.assertTrue(Media.objects.get(pk=thumbnail.pk).deleted)
+        self.assertFalse(
+            ChangeToObject.objects.filter(ref_table=ref_table, ref_id=pruned[2]).exists()
+        )
+
+    def test_iterate_chunks_without_server_side_cursors(self):
+        qs = Localization.objects.filter(project=self.project).order_by("-frame", "id")
+        expected = list(qs.values("id", "frame"))
+        disabled = connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"]
+        try:
+            for disable in [False, True]:
+                connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = disable
+                chunks = list(iterate_chunks(qs, ["id", "frame"], chunk_size=2))
+                self.assertTrue(all(len(chunk) <= 2 for chunk in chunks))
+                self.assertEqual([row for chunk in chunks for row in chunk], expected)
+        finally:
+            connection.settings_dict["DISABLE_SERVER_SIDE_CURSORS"] = disabled
+
+    def test_cursor_datetime_precision(self):
+        # Rows created within one millisecond must be paged through in order exactly once.
+        base = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        ids = [loc.pk for loc in self.entities[:3]]
+        for offset, pk in enumerate(ids):
+            Localization.objects.filter(pk=pk).update(
+                created_datetime=base + datetime.timedelta(microseconds=offset + 1)
+            )
+        for order in ["created_datetime", "-created_datetime"]:
+            qs = Localization.objects.filter(pk__in=ids).order_by(order)
+            expected = list(qs.values_list("id", flat=True))
+            paged = []
+            params = {"page_size": 1}
+            while True:
+                page = list(cursor_paginate(qs, params).values("id", "created_datetime"))
+                paged += [row["id"] for row in page]
+                cursor = get_next_cursor(qs, params, page)
+                if cursor is None:
+                    break
+                params["cursor"] = cursor
+            self.assertEqual(paged, expected)
+
+    def test_cursor_float_array(self):
+        # Distances are annotations and not part of the rows, so cursors look them up.
+        embedding_type = LocalizationType.objects.create(
+            name="embeddings",
+            dtype="box",
+            project=self.project,
+            attribute_types=[{"name": "Embedding", "dtype": "float_array", "size": 3}],
+        )
+        embedding_type.media.add(self.media_entities[0].type)
+        wait_for_indices(embedding_type)
+        boxes = [
+            create_test_box(
+                self.user,
+                embedding_type,
+                self.project,
+                self.media_entities[0],
+                0,
+                attributes={"Embedding": [float(idx), 0.0, 0.0]},
+            )
+            for idx in range(5)
+        ]
+        params = {
+            "type": embedding_type.pk,
+            "float_array": [{"name": "Embedding", "center": [0.0, 0.0, 0.0]}],
+            "page_size": 2,
+        }
+        paged = []
+        while True:
+            qs = get_annotation_queryset(self.project.pk, params, "localization")
+            page = list(qs.values("id"))
+            paged += [row["id"] for row in page]
+            cursor = get_next_cursor(qs, params, page)
+            if cursor is None:
+                break
+            params["cursor"] = cursor
+        self.assertEqual(paged, [box.pk for box in boxes])
+
+    def test_search_connection(self):
+        db_name = connection.settings_dict["NAME"]
+        conn = get_connection(db_name)
+        self.assertIs(get_connection(db_name), conn)
+        conn.close()
+        reconnected = get_connection(db_name)
+        self.assertIsNot(reconnected, conn)
+        with reconnected.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchone(), (1,))
+
 
 class LocalizationLineTestCase(
     TatorTransactionTest,
@@ -2877,6 +3266,55 @@ class StateTestCase(
         self.edit_permission = Permission.CAN_EDIT
         self.patch_json = {"name": "state1", "in_place": 1}
 
+    def test_links(self):
+        box_type = LocalizationType.objects.create(
+            name="boxes",
+            dtype="box",
+            project=self.project,
+        )
+        media = self.media_entities[0]
+        boxes = [
+            create_test_box(self.user, box_type, self.project, media, frame)
+            for frame in [0, 1, 2, 5]
+        ]
+        response = self.client.post(
+            f"/rest/States/{self.project.pk}",
+            [
+                {
+                    "type": self.entity_type.pk,
+                    "media_ids": [],
+                    "localization_ids": [box.pk for box in boxes],
+                    "attributes": {"Float Test": 0.0},
+                }
+            ],
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        state_id = response.data["id"][0]
+        response = self.client.get(f"/rest/State/{state_id}")
+        self.assertEqual(response.data["localizations"], sorted(box.pk for box in boxes))
+        self.assertEqual(response.data["media"], [media.pk])
+        self.assertEqual(response.data["segments"], [[0, 2], [5, 5]])
+
+        response = self.client.patch(
+            f"/rest/State/{state_id}",
+            {"localization_ids_remove": [boxes[-1].pk], "in_place": 1},
+            format="json",
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        response = self.client.get(f"/rest/States/{self.project.pk}?media_id={media.pk}")
+        state = [state for state in response.data if state["id"] == state_id][0]
+        self.assertEqual(state["localizations"], sorted(box.pk for box in boxes[:-1]))
+        self.assertEqual(state["media"], [media.pk])
+        self.assertEqual(state["segments"], [[0, 2]])
+
+        # States created before links were denormalized are aggregated on read.
+        State.objects.filter(pk=state_id).update(media_ids=None, localization_ids=None)
+        response = self.client.get(f"/rest/State/{state_id}")
+        self.assertEqual(
+            sorted(response.data["localizations"]), sorted(box.pk for box in boxes[:-1])
+        )
+
     def test_elemental_id(self):
         # Test on type object
         new_uuid = str(uuid4())
@@ -3479,6 +3917,88 @@ class LeafTestCase(
         response = self.client.get(f"/rest/LeafTypes/{project}?elemental_id={new_uuid}")
         assert len(response.data) == 1
 
+    def test_suggestion(self):
+        def suggest(query):
+            response = self.client.get(
+                f"/rest/Leaves/Suggestion/root/{self.project.pk}?query={query}"
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+            return [(s["value"], s["group"], s["data"].get("alias")) for s in response.data]
+
+        kwargs = {"type": self.entity_type, "project": self.project}
+        root = Leaf.objects.create(name="root", path="root", **kwargs)
+        fish = Leaf.objects.create(
+            name="Fish", path="root.Fish", parent=root, attributes={"alias": "pisces"}, **kwargs
+        )
+        Leaf.objects.create(
+            name="Salmon",
+            path="root.Fish.Salmon",
+            parent=fish,
+            attributes={"alias": "lox"},
+            **kwargs,
+        )
+        shark = Leaf.objects.create(name="Shark", path="root.Fish.Shark", parent=fish, **kwargs)
+
+        self.assertEqual(
+            suggest("s"), [("Salmon", "Fish (pisces)", "lox"), ("Shark", "Fish (pisces)", None)]
+        )
+        self.assertEqual(suggest("LO"), [("Salmon", "Fish (pisces)", "lox")])
+        self.assertEqual(suggest("*ARK"), [("Shark", "Fish (pisces)", None)])
+        self.assertEqual(suggest("s*a*n"), [("Salmon", "Fish (pisces)", "lox")])
+        self.assertEqual(suggest("f"), [("Fish", "root", "pisces")])
+
+        # Changes to leaves and their parents are picked up by the index.
+        response = self.client.patch(f"/rest/Leaf/{shark.pk}", {"name": "Sharks"}, format="json")
+        assertResponse(self, response, status.HTTP_200_OK)
+        fish.attributes = {"alias": "fishes"}
+        fish.save()
+        self.assertEqual(suggest("sha"), [("Sharks", "Fish (fishes)", None)])
+        response = self.client.delete(f"/rest/Leaf/{shark.pk}")
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual(suggest("sha"), [])
+
+    def test_ancestor_type(self):
+        other_type = LeafType.objects.create(project=self.project, name="other")
+        leaf = Leaf.objects.create(
+            name="root", path="root", type=self.entity_type, project=self.project
+        )
+        self.assertEqual(get_ancestor_type(self.project.pk, "root"), self.entity_type.pk)
+        # Recreating the leaf with another type is picked up by the cache.
+        leaf.delete()
+        Leaf.objects.create(name="root", path="root", type=other_type, project=self.project)
+        self.assertEqual(get_ancestor_type(self.project.pk, "root"), other_type.pk)
+        self.assertIsNone(get_ancestor_type(self.project.pk, "missing"))
+
+    def test_renderer(self):
+        class StdlibRenderer(JSONRenderer):
+            encoder_class = TatorJSONEncoder
+
+        response = self.client.get(f"/rest/Leaves/{self.project.pk}")
+        assertResponse(self, response, status.HTTP_200_OK)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        data = [
+            *response.data,
+            {
+                "path": PathValue("root.Fish"),
+                "elemental_id": uuid4(),
+                "created": now,
+                "date": now.date(),
+                "time": now.time(),
+                "duration": datetime.timedelta(seconds=1.5),
+                "floats": [0.1, 1e-05, -2.5e-07, 1e16, 1.5e300, 123456789.123],
+                "big": 2**70,
+                "text": "Überprüft\u2028確認済み\u2029</script>",
+                "keys": {1: "int", 2.5: "float", 1e16: "big", 1e-05: "small", None: "none"},
+            },
+        ]
+        # Output is identical to json, including where orjson falls back to it.
+        for item in [data, data[-1], data[:-1], [], {}, "text", 1e-05, None]:
+            self.assertEqual(TatorRenderer().render(item), StdlibRenderer().render(item))
+        indented = "application/json; indent=4"
+        self.assertEqual(
+            TatorRenderer().render(data, indented), StdlibRenderer().render(data, indented)
+        )
+
 
 class LeafTypeTestCase(
     TatorTransactionTest,
@@ -3690,6 +4210,29 @@ class MembershipTestCase(
         }
         self.edit_permission = Permission.FULL_CONTROL
 
+    def test_permission_cache_invalidation(self):
+        url = f"/rest/{self.list_uri}/{self.project.pk}"
+        response = self.client.get(url, format="json")
+        assertResponse(self, response, status.HTTP_200_OK)
+        Membership.objects.filter(user=self.user, project=self.project).delete()
+        response = self.client.get(url, format="json")
+        assertResponse(self, response, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(f"/rest/{self.list_uri}/{self.project.pk + 1000}")
+        assertResponse(self, response, status.HTTP_404_NOT_FOUND)
+
+    def test_permission_cache_versions(self):
+        cache = TatorCache()
+        user_id, project_id = self.user.pk, self.project.pk
+        # Values left in the cred hash by earlier releases are ignored.
+        cache.rds.hset(f"creds_{project_id}", f"creds_{project_id}_{user_id}", "True")
+        self.assertEqual(membership_permission(user_id, project_id), Permission.FULL_CONTROL)
+        # A level read before an invalidation is not served after it.
+        version = cache.get_cred_version(project_id)
+        cache.invalidate_cred_cache(project_id, user_id)
+        cache.set_cred_cache(user_id, project_id, Permission.VIEW_ONLY.value, version)
+        self.assertEqual(cache.get_cred_cache(user_id, project_id), None)
+        self.assertEqual(membership_permission(user_id, project_id), Permission.FULL_CONTROL)
+
 
 class ProjectTestCase(TatorTransactionTest):
     def setUp(self):
@@ -4208,6 +4751,23 @@ class BucketTestCase(
         assertResponse(self, response, status.HTTP_403_FORBIDDEN)
         self.affiliation.save()
 
+    def test_store_pool(self):
+        bucket = self.entities[0]
+        store = get_tator_store(bucket)
+        stats = get_store_pool_stats()
+        self.assertIs(get_tator_store(Bucket.objects.get(pk=bucket.pk)), store)
+        self.assertEqual(get_store_pool_stats()["hits"], stats["hits"] + 1)
+        self.assertIsNot(get_tator_store(bucket, read_timeout=10), store)
+
+        # Edits in this process drop the pooled store, edits elsewhere change its key.
+        bucket.config = {**bucket.config, "region_name": "us-west-1"}
+        bucket.save()
+        other = get_tator_store(bucket)
+        self.assertIsNot(other, store)
+        self.assertEqual(other.client.meta.region_name, "us-west-1")
+        Bucket.objects.filter(pk=bucket.pk).update(config=self.create_json["config"])
+        self.assertIsNot(get_tator_store(Bucket.objects.get(pk=bucket.pk)), other)
+
 
 class ImageFileTestCase(TatorTransactionTest, FileMixin):
     def setUp(self):
@@ -4567,6 +5127,91 @@ class ResourceTestCase(TatorTransactionTest):
             self.assertFalse(self._store_obj_exists(patch_keys[role]))
         self.assertFalse(self._store_obj_exists(patch_segment_key))
 
+    def test_local_presign(self):
+        presigner = _get_local_presigner(self.store.client, self.store.bucket_name)
+        if presigner is None:
+            return
+        key = f"{self.organization.pk}/{self.project.pk}/a b+c~é.mp4"
+        url = self.store.client.generate_presigned_url(
+            ClientMethod="get_object",
+            Params={"Bucket": self.store.bucket_name, "Key": key},
+            ExpiresIn=3600,
+        )
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        if "X-Amz-Date" in query:
+            now = datetime.datetime.strptime(query["X-Amz-Date"][0], SIGV4_TIMESTAMP)
+        else:
+            now = int(query["Expires"][0]) - 3600
+        self.assertEqual(presigner.presign(key, 3600, now), url)
+
+    def test_get_sizes(self):
+        prefix = f"{self.organization.pk}/{self.project.pk}/{uuid1()}"
+        paths = [f"{prefix}/a.txt", f"{prefix}/b.txt", f"{prefix}/c.txt"]
+        self.store.put_string(paths[0], "a")
+        self.store.put_string(paths[1], "bb")
+        self.assertEqual(self.store.get_sizes(paths), {paths[0]: 1, paths[1]: 2, paths[2]: -1})
+
+        # Listing errors fall back to checking each object.
+        def _fail(*args, **kwargs):
+            raise RuntimeError("listing failed")
+
+        self.store._list_objects_v2 = _fail
+        self.assertEqual(self.store.get_sizes(paths), {paths[0]: 1, paths[1]: 2, paths[2]: -1})
+        del self.store._list_objects_v2
+        for path in paths[:2]:
+            self.store.delete_object(path)
+
+    def test_presigned(self):
+        media = create_test_video(self.user, f"asdf", self.entity_type, self.project)
+        keys, segment_key = self._generate_keys(media)
+        for role, endpoint in ResourceTestCase.MEDIA_ROLES.items():
+            media_def = self._get_media_def(role, keys, segment_key)
+            response = self.client.post(
+                f"/rest/{endpoint}/{media.id}?role={role}", media_def, format="json"
+            )
+            assertResponse(self, response, status.HTTP_201_CREATED)
+
+        # The second request is served from the presigned url cache.
+        for _ in range(2):
+            response = self.client.get(f"/rest/Media/{media.id}?presigned=7200")
+            assertResponse(self, response, status.HTTP_200_OK)
+            for role in ResourceTestCase.MEDIA_ROLES:
+                url = response.data["media_files"][role][0]["path"]
+                self.assertIn(keys[role], url)
+            url = response.data["media_files"]["streaming"][0]["segment_info"]
+            self.assertIn(segment_key, url)
+        cached = TatorCache().get_presigned_many(self.user.pk, [segment_key, "not_cached"])
+        self.assertEqual(cached, {segment_key: url, "not_cached": None})
+
+    def test_clone_status(self):
+        # Small clones finish before the response, larger ones report a job group.
+        media = create_test_video(self.user, "asdf", self.entity_type, self.project)
+        body = {"dest_project": self.project.pk, "dest_type": self.entity_type.pk}
+        response = self.client.post(
+            f"/rest/CloneMedia/{self.project.pk}?media_id={media.id}", body, format="json"
+        )
+        assertResponse(self, response, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["job_group"])
+
+        group = f"clone_media_{self.project.pk}_{uuid1()}"
+        get_redis().hset(f"job_group_{group}", mapping={"total": 2, "finished": 1})
+        url = f"/rest/CloneMediaStatus/{self.project.pk}"
+        response = self.client.get(f"{url}?job_group={group}")
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {"job_group": group, "total": 2, "finished": 1, "failed": 0, "complete": False},
+        )
+        get_redis().hincrby(f"job_group_{group}", "failed", 1)
+        response = self.client.get(f"{url}?job_group={group}")
+        self.assertTrue(response.data["complete"])
+        self.assertEqual(response.data["failed"], 1)
+        # Unknown groups and groups of other projects are not found.
+        response = self.client.get(f"{url}?job_group=clone_media_{self.project.pk}_missing")
+        assertResponse(self, response, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f"/rest/CloneMediaStatus/{self.project.pk}?job_group=other")
+        assertResponse(self, response, status.HTTP_404_NOT_FOUND)
+
     def test_clones(self):
         media = create_test_video(self.user, f"asdf", self.entity_type, self.project)
 
@@ -5002,6 +5647,28 @@ class AttributeTestCase(TatorTransactionTest):
             "name": "Int Test",
         }
 
+    def test_search_after_schema_change(self):
+        def _search(name):
+            search_blob = base64.b64encode(
+                json.dumps({"attribute": name, "operation": "gte", "value": -100}).encode()
+            )
+            response = self.client.get(
+                f"/rest/Localizations/{self.project.pk}?encoded_search={search_blob.decode()}",
+                format="json",
+            )
+            assertResponse(self, response, status.HTTP_200_OK)
+            return len(response.data)
+
+        self.assertEqual(_search("Int Test"), len(self.entities))
+        # Repeat the search to exercise the compiled query cache.
+        self.assertEqual(_search("Int Test"), len(self.entities))
+        response = self.client.patch(
+            f"/rest/{self.list_uri}/{self.entity_type.pk}", self.patch_json, format="json"
+        )
+        assertResponse(self, response, status.HTTP_200_OK)
+        self.assertEqual(_search("Int Test"), 0)
+        self.assertEqual(_search("Renamed Int Test"), len(self.entities))
+
     def test_patch_permissions(self):
         permission_index = permission_levels.index(self.edit_permission)
         for index, level in enumerate(permission_levels):
@@ -5053,6 +5720,24 @@ class AttributeTestCase(TatorTransactionTest):
         self.membership.permission = Permission.FULL_CONTROL
         self.membership.save()
 
+    def test_bulk_mutate_attributes(self):
+        qs = Localization.objects.filter(pk__in=[entity.pk for entity in self.entities])
+        old = {obj.pk: obj.attributes for obj in qs}
+        bulk_mutate_attributes(
+            qs,
+            patch={"String Test": 'it\'s "quoted"', "Bool Test": False},
+            rename={"Int Test": "Renamed Int", "Missing Test": "Renamed Missing"},
+            delete=["Float Test"],
+            chunk_size=2,
+        )
+        for obj in qs:
+            self.assertEqual(obj.attributes["String Test"], 'it\'s "quoted"')
+            self.assertEqual(obj.attributes["Bool Test"], False)
+            self.assertEqual(obj.attributes["Renamed Int"], old[obj.pk]["Int Test"])
+            self.assertNotIn("Int Test", obj.attributes)
+            self.assertNotIn("Renamed Missing", obj.attributes)
+            self.assertNotIn("Float Test", obj.attributes)
+
 
 class MutateAliasTestCase(TatorTransactionTest):
     """Tests alias mutation."""
@@ -5222,6 +5907,45 @@ class MutateAliasTestCase(TatorTransactionTest):
     # TODO: write totally different test for geopos mutations (not supported in query string queries)
 
 
+class JobGroupTestCase(TatorTransactionTest):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        logging.disable(logging.CRITICAL)
+        # No worker listens on this queue, job completion is simulated.
+        self.queue = Queue(f"test_{uuid1()}", connection=get_redis())
+
+    def tearDown(self):
+        self.queue.delete(delete_jobs=True)
+
+    def test_job_group(self):
+        group = f"test_{uuid1()}"
+        jobs = push_jobs(
+            self.queue.name,
+            [{"func": print, "args": (idx,), "result_ttl": 0} for idx in range(5)],
+            group,
+        )
+        self.assertEqual(len(jobs), 5)
+        self.assertEqual(get_job_group(group), {"total": 5, "finished": 0, "failed": 0})
+        for job, status in zip(jobs, ["finished"] * 4 + ["failed"]):
+            self.assertEqual(job.meta["job_group"], group)
+            _update_job_group(job, get_redis(), status)
+        self.assertEqual(get_job_group(group), {"total": 5, "finished": 4, "failed": 1})
+        self.assertIsNone(get_job_group(f"test_{uuid1()}"))
+
+
+class ThrottleTestCase(TatorTransactionTest):
+    def setUp(self):
+        print(f"\n{self.__class__.__name__}=", end="", flush=True)
+        logging.disable(logging.CRITICAL)
+
+    def test_throttle_token_bucket(self):
+        key = f"throttle_test_{uuid1()}"
+        results = [_take_token(key, 3, 60) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertGreater(results[-1][1], 0)
+        self.assertLessEqual(results[-1][1], 20)
+
+
 class JobClusterTestCase(TatorTransactionTest):
     @staticmethod
     def _random_job_cluster_spec():
@@ -1,7 +1,103 @@
-from rest_framework.throttling import UserRateThrottle
+import logging
 
+from redis.exceptions import RedisError
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 
-class BurstableThrottle(UserRateThrottle):
+from .worker import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Token bucket holding up to ARGV[1] tokens that refill at ARGV[2] tokens per second. Takes a
+# token if one is available and returns whether it did, along with the seconds until the next
+# token. Time is taken from redis so all workers share one clock.
+_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / refill
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / refill * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_script = None
+
+
+def _take_token(key, num_requests, duration):
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(_TOKEN_BUCKET)
+    allowed, wait = _script(keys=[key], args=[num_requests, num_requests / duration])
+    return bool(allowed), float(wait)
+
+
+class RedisThrottleMixin:
+    """Keeps the request budget of a throttle in a redis token bucket shared by all workers,
+    in place of the request history that `SimpleRateThrottle` keeps in the Django cache.
+
+    The rate may be overridden in the `DEFAULT_THROTTLE_RATES` setting for a project, an
+    endpoint or both, with keys of the form `<scope>:<endpoint>`, `<scope>:project:<id>` and
+    `<scope>:project:<id>:<endpoint>`, where the endpoint is the url name, e.g.
+    `user:Localizations`. The most specific key wins and gets a budget of its own.
+    """
+
+    def _get_rule(self, request, view):
+        """Returns the most specific configured rate rule for the request and its rate."""
+        project = getattr(view, "kwargs", {}).get("project")
+        match = getattr(request, "resolver_match", None)
+        endpoint = match.url_name if match else None
+        rules = []
+        if project is not None:
+            if endpoint:
+                rules.append(f"{self.scope}:project:{project}:{endpoint}")
+            rules.append(f"{self.scope}:project:{project}")
+        if endpoint:
+            rules.append(f"{self.scope}:{endpoint}")
+        for rule in rules:
+            if rule in self.THROTTLE_RATES:
+                return rule, self.THROTTLE_RATES[rule]
+        return None, self.rate
+
+    def allow_request(self, request, view):
+        rule, rate = self._get_rule(request, view)
+        if rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        if rule is not None:
+            self.key = f"{self.key}_{rule}"
+        num_requests, duration = self.parse_rate(rate)
+        try:
+            allowed, self._wait = _take_token(self.key, num_requests, duration)
+        except RedisError:
+            logger.warning("Falling back to per-process throttling", exc_info=True)
+            return super().allow_request(request, view)
+        return allowed
+
+    def wait(self):
+        if hasattr(self, "_wait"):
+            return self._wait
+        return super().wait()
+
+
+class AnonThrottle(RedisThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class BurstableThrottle(RedisThrottleMixin, UserRateThrottle):
     rate = "100/second"
 
     def apply_monkey_patching_for_test():
@@ -145,6 +145,10 @@ urlpatterns += [
         "rest/CloneMedia/<int:project>",
         CloneMediaListAPI.as_view(),
     ),
+    path(
+        "rest/CloneMediaStatus/<int:project>",
+        CloneMediaStatusAPI.as_view(),
+    ),
     path(
         "rest/GetClonedMedia/<int:id>",
         GetClonedMediaAPI.as_view(),
@@ -19,6 +19,7 @@ from main.models import *
 from main.search import TatorSearch
 from main.store import get_tator_store
 from main.backup import TatorBackupManager
+from main.worker import push_jobs
 
 from django.conf import settings
 
@@ -134,21 +135,14 @@ def buildSearchIndices(project_ids=None, flush=False, concurrent=True):
     logger.info(f"Building search indices for projects: {projects.values('name')}")
 
     # Create mappings
-    logger.info("Building mappings for media types...")
-    for type_ in list(MediaType.objects.filter(project__in=projects)):
-        TatorSearch().create_mapping(type_, flush, concurrent)
-    logger.info("Building mappings for localization types...")
-    for type_ in list(LocalizationType.objects.filter(project__in=projects)):
-        TatorSearch().create_mapping(type_, flush, concurrent)
-    logger.info("Building mappings for state types...")
-    for type_ in list(StateType.objects.filter(project__in=projects)):
-        TatorSearch().create_mapping(type_, flush, concurrent)
-    logger.info("Building mappings for leaf types...")
-    for type_ in list(LeafType.objects.filter(project__in=projects)):
-        TatorSearch().create_mapping(type_, flush, concurrent)
-    logger.info("Building mappings for file types...")
-    for type_ in list(FileType.objects.filter(project__in=projects)):
-        TatorSearch().create_mapping(type_, flush, concurrent)
+    jobs = []
+    for model in [MediaType, LocalizationType, StateType, LeafType, FileType]:
+        logger.info(f"Building mappings for {model._meta.verbose_name_plural}...")
+        for type_ in list(model.objects.filter(project__in=projects)):
+            TatorSearch().create_mapping(type_, flush, concurrent, jobs)
+    group = f"build_search_indices_{uuid.uuid1()}"
+    push_jobs("db_jobs", jobs, group=group)
+    logger.info(f"Dispatched {len(jobs)} index jobs as job group {group}.")
     logger.info("Dispatch complete!")
     logger.info(
         "To watch status, use `rq info` at the gunicorn shell OR the top-level rq-info make target"
@@ -296,6 +290,11 @@ def make_resources():
                     if key == "streaming":
                         try:
                             paths += [f["segment_info"] for f in media.media_files[key]]
+                            paths += [
+                                f["segment_index"]
+                                for f in media.media_files[key]
+                                if f.get("segment_index")
+                            ]
                         except:
                             logger.info(f"Media {media.id} does not have a segment file!")
         if media.original:
@@ -478,6 +477,8 @@ def fix_bad_archives(*, project_id_list=None, live_run=False, force_update=False
                 if key == "streaming":
                     try:
                         success = _update_tag(obj["segment_info"], store) and success
+                        if obj.get("segment_index"):
+                            success = _update_tag(obj["segment_index"], store) and success
                     except:
                         success = False
 
@@ -592,6 +593,8 @@ def fix_bad_restores(*, media_id_list, live_run=False, force_update=False, resto
         path_keys = ["path"]
         if has_segment_info:
             path_keys.append("segment_info")
+            if file_info.get("segment_index"):
+                path_keys.append("segment_index")
 
         for path_key in path_keys:
             try:
@@ -17,6 +17,7 @@ from .models import Project
 from .models import Membership
 from .notify import Notify
 from .cache import TatorCache
+from .rest._permissions import membership_permission
 
 import logging
 
@@ -86,25 +87,9 @@ class StreamSaverMITMLocal(ProjectBase, TemplateView):
 
 
 def validate_project(user, project):
-    # We only cache 'True' effectively with this logic
-    granted = TatorCache().get_cred_cache(user.id, project.id)
-    if granted:
-        return granted
-
     if isinstance(user, AnonymousUser):
-        granted = False
-    else:
-        # Find membership for this user and project
-        membership = Membership.objects.filter(user=user, project=project)
-
-        # If user is not part of project, deny access
-        if membership.count() == 0:
-            granted = False
-        else:
-            # Only cache granted attempts
-            granted = True
-            TatorCache().set_cred_cache(user.id, project.id, granted)
-    return granted
+        return False
+    return membership_permission(user.id, project.id) is not None
 
 
 class AuthProjectView(View):
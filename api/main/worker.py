@@ -1,10 +1,26 @@
-from redis import Redis
+from redis import ConnectionPool, Redis
 from rq import Queue, Worker
 
+import logging
 import os
 import sys
 import argparse
 
+logger = logging.getLogger(__name__)
+
+# Job group status is kept in redis for this many seconds after the last update.
+JOB_GROUP_EXPIRE_TIME = 60 * 60 * 24 * 7
+
+_pool = None
+
+
+def get_redis():
+    """Returns a redis client backed by a connection pool shared within the process."""
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(host=os.getenv("REDIS_HOST"), health_check_interval=30)
+    return Redis(connection_pool=_pool)
+
 
 def push_job(queue, function, *args, **kwargs):
     """Example:
@@ -13,9 +29,90 @@ def push_job(queue, function, *args, **kwargs):
     push_job('async_jobs', print, 'Hello')
     See [https://python-rq.org/docs/] for information on available kwargs
     """
-    redis = Redis(host=os.getenv("REDIS_HOST"))
+    queue = Queue(queue, connection=get_redis())
+    return queue.enqueue(function, *args, **kwargs)
+
+
+def push_jobs(queue, jobs, group=None):
+    """Enqueues many jobs in one round trip to redis.
+
+    Example:
+    push_jobs('db_jobs', [{'func': print, 'args': ('Hello',), 'result_ttl': 0}], group='hello')
+
+    :param queue: Name of the queue.
+    :param jobs: List of dicts of arguments to `Queue.prepare_data`, at least `func`.
+    :param group: Optional name of a job group. Completion of the jobs in a group is counted
+                  and logged once every job in it has finished or failed, see `get_job_group`.
+    :returns: List of enqueued jobs.
+    """
+    if not jobs:
+        return []
+    redis = get_redis()
     queue = Queue(queue, connection=redis)
-    queue.enqueue(function, *args, **kwargs)
+    job_datas = []
+    for job in jobs:
+        if group is not None:
+            job = {
+                **job,
+                "meta": {**job.get("meta", {}), "job_group": group},
+                "on_success": _job_group_succeeded,
+                "on_failure": _job_group_failed,
+            }
+        job_datas.append(Queue.prepare_data(**job))
+    pipe = redis.pipeline()
+    if group is not None:
+        key = f"job_group_{group}"
+        pipe.hincrby(key, "total", len(job_datas))
+        pipe.expire(key, JOB_GROUP_EXPIRE_TIME)
+    enqueued = queue.enqueue_many(job_datas, pipeline=pipe)
+    pipe.execute()
+    if group is not None:
+        logger.info(f"Enqueued {len(enqueued)} jobs in group {group} on {queue.name}")
+    return enqueued
+
+
+def _group_counts(counts):
+    counts = {key.decode(): int(value) for key, value in counts.items()}
+    return {status: counts.get(status, 0) for status in ["total", "finished", "failed"]}
+
+
+def get_job_group(group):
+    """Returns counts of total, finished and failed jobs in a job group, or None if the group
+    does not exist or has expired.
+    """
+    counts = get_redis().hgetall(f"job_group_{group}")
+    if not counts:
+        return None
+    return _group_counts(counts)
+
+
+def _update_job_group(job, connection, status):
+    group = job.meta.get("job_group")
+    if group is None:
+        return
+    key = f"job_group_{group}"
+    pipe = connection.pipeline()
+    pipe.hincrby(key, status, 1)
+    pipe.expire(key, JOB_GROUP_EXPIRE_TIME)
+    pipe.hgetall(key)
+    counts = _group_counts(pipe.execute()[-1])
+
+    # Only the job that completes the group sees its counts add up.
+    if counts["finished"] + counts["failed"] == counts["total"]:
+        if counts["failed"]:
+            logger.warning(
+                f"Job group {group} completed, {counts['failed']} of {counts['total']} jobs failed!"
+            )
+        else:
+            logger.info(f"Job group {group} completed, all {counts['total']} jobs finished.")
+
+
+def _job_group_succeeded(job, connection, result, *args, **kwargs):
+    _update_job_group(job, connection, "finished")
+
+
+def _job_group_failed(job, connection, *exc_info):
+    _update_job_group(job, connection, "failed")
 
 
 if __name__ == "__main__":
@@ -23,7 +120,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Processes a python-rq queue.")
     parser.add_argument("queue", help="Name of queue to process.")
     args = parser.parse_args()
-    redis = Redis(host=os.getenv("REDIS_HOST"))
+    redis = get_redis()
     queue = Queue(args.queue, connection=redis)
 
     # Do some imports here for libraries jobs will need
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
+import json
 import os
 from django.contrib.messages import constants as messages
 import yaml
@@ -151,6 +152,17 @@ else:
         }
     }
 
+# Connections are reused across requests for up to POSTGRES_CONN_MAX_AGE seconds (0 closes them
+# after each request) and checked before each request by `main.connections`. Set
+# POSTGRES_PGBOUNCER to TRUE if POSTGRES_HOST is pgbouncer in transaction pooling mode, where
+# consecutive transactions may run on different server connections. Server-side cursors are
+# then disabled since they outlive the transaction that declared them.
+POSTGRES_PGBOUNCER = os.getenv("POSTGRES_PGBOUNCER") == "TRUE"
+for database in DATABASES.values():
+    database["CONN_MAX_AGE"] = int(os.getenv("POSTGRES_CONN_MAX_AGE", 60))
+    database["CONN_HEALTH_CHECKS"] = os.getenv("POSTGRES_CONN_HEALTH_CHECKS", "TRUE") == "TRUE"
+    database["DISABLE_SERVER_SIDE_CURSORS"] = POSTGRES_PGBOUNCER
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -263,11 +275,15 @@ REST_FRAMEWORK = {
     ),
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
+        "main.throttles.AnonThrottle",
         "main.throttles.BurstableThrottle",
     ],
+    # Rates may be overridden per endpoint and project with THROTTLE_RATES, a JSON object such
+    # as {"user:Localizations": "20/second", "user:project:1": "500/second"}. See
+    # `main.throttles.RedisThrottleMixin`.
     "DEFAULT_THROTTLE_RATES": {
         "anon": "10/second",
+        **json.loads(os.getenv("THROTTLE_RATES", "{}")),
     },
     "TEST_REQUEST_RENDERER_CLASSES": [
         "main.renderers.TatorRenderer",